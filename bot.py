@@ -72,7 +72,7 @@ def easter_egg():
     print(rainbow_text)
 
 
-async def graceful_shutdown():  # sourcery skip: use-named-expression
+async def graceful_shutdown(main_system: MainSystem):  # sourcery skip: use-named-expression
     try:
         logger.info("正在优雅关闭麦麦...")
 
@@ -105,6 +105,9 @@ async def graceful_shutdown():  # sourcery skip: use-named-expression
             except Exception as e:
                 logger.error(f"等待任务取消时发生异常: {e}")
 
+        # 写入尚未落盘的数据库记录
+        main_system.shutdown()
+
         logger.info("麦麦优雅关闭完成")
 
         # 关闭日志系统，释放文件句柄
@@ -229,7 +232,7 @@ if __name__ == "__main__":
             logger.warning("收到中断信号，正在优雅关闭...")
             if loop and not loop.is_closed():
                 try:
-                    loop.run_until_complete(graceful_shutdown())
+                    loop.run_until_complete(graceful_shutdown(main_system))
                 except Exception as ge:  # 捕捉优雅关闭时可能发生的错误
                     logger.error(f"优雅关闭时发生错误: {ge}")
         # 新增：检测外部请求关闭
@@ -0,0 +1,128 @@
+"""
+KG 构建性能基准
+
+用合成的三元组数据测试 KGManager.build_kg 各阶段的耗时，不调用任何模型、不读写 data 目录。
+每个规模分两批导入：第一批构建新图，第二批增量导入到已有的图中（与多次运行 import_openie 的情况相同）。
+
+用法：
+    python scripts/benchmark_kg_build.py --sizes 10000 100000 1000000
+    python scripts/benchmark_kg_build.py --sizes 10000 --synonym   # 同时测试同义词连接（需要构建向量索引，较慢）
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from src.config.config import global_config
+
+# 合成数据只需要很小的向量维度，必须在创建嵌入库之前设置
+BENCHMARK_EMBEDDING_DIM = 16
+global_config.lpmm_knowledge.embedding_dimension = BENCHMARK_EMBEDDING_DIM
+
+from src.chat.knowledge.embedding_store import EmbeddingManager, EmbeddingStoreItem  # noqa: E402
+from src.chat.knowledge.kg_manager import KGManager, entity_hash_key  # noqa: E402
+
+TRIPLES_PER_PARAGRAPH = 5
+ENTITIES_PER_TRIPLE = 3
+"""实体词表大小 = 三元组数 / ENTITIES_PER_TRIPLE"""
+
+
+def make_triples(num_triples: int, zipf: float, seed: int, pg_offset: int = 0) -> dict[str, list[list[str]]]:
+    """生成合成三元组：实体按 Zipf 分布抽取（少数实体出现很多次，与真实数据类似）"""
+    rng = np.random.default_rng(seed)
+    vocab = max(2, num_triples // ENTITIES_PER_TRIPLE)
+    subjects = (rng.zipf(zipf, num_triples) - 1) % vocab
+    objects = (rng.zipf(zipf, num_triples) - 1) % vocab
+    triple_list_data: dict[str, list[list[str]]] = {}
+    for i, (s, o) in enumerate(zip(subjects.tolist(), objects.tolist(), strict=True)):
+        pg_hash = f"{pg_offset + i // TRIPLES_PER_PARAGRAPH:016x}"
+        triple_list_data.setdefault(pg_hash, []).append([f"实体{s}", "关联", f"实体{o}"])
+    return triple_list_data
+
+
+def fill_embedding_stores(embed_manager: EmbeddingManager, triple_list_data: dict[str, list[list[str]]]) -> None:
+    """为合成数据中的实体与段落写入随机向量（_update_graph 会从嵌入库读取节点内容）"""
+    rng = np.random.default_rng(0)
+    entity_store = embed_manager.entities_embedding_store.store
+    paragraph_store = embed_manager.paragraphs_embedding_store.store
+    for pg_hash, triples in triple_list_data.items():
+        key = f"paragraph-{pg_hash}"
+        if key not in paragraph_store:
+            paragraph_store[key] = EmbeddingStoreItem(key, rng.standard_normal(BENCHMARK_EMBEDDING_DIM), key)
+        for triple in triples:
+            for ent in (triple[0], triple[2]):
+                key = entity_hash_key(ent)
+                if key not in entity_store:
+                    entity_store[key] = EmbeddingStoreItem(key, rng.standard_normal(BENCHMARK_EMBEDDING_DIM), ent)
+
+
+def run_batch(
+    kg_manager: KGManager,
+    embed_manager: EmbeddingManager,
+    triple_list_data: dict[str, list[list[str]]],
+    synonym: bool,
+) -> dict[str, float]:
+    """按 build_kg 的步骤逐一计时"""
+    timings: dict[str, float] = {}
+    node_to_node: dict[tuple[str, str], float] = {}
+
+    start = time.perf_counter()
+    kg_manager._build_edges_between_ent(node_to_node, triple_list_data)
+    timings["实体边"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kg_manager._build_edges_between_ent_pg(node_to_node, triple_list_data)
+    timings["实体-段落边"] = time.perf_counter() - start
+
+    if synonym:
+        embed_manager.entities_embedding_store.update_faiss_index()
+        start = time.perf_counter()
+        kg_manager._synonym_connect(node_to_node, triple_list_data, embed_manager)
+        timings["同义词连接"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kg_manager._update_graph(node_to_node, embed_manager)
+    timings["更新图"] = time.perf_counter() - start
+    kg_manager.stored_paragraph_hashes.update(triple_list_data.keys())
+    return timings
+
+
+def benchmark(num_triples: int, zipf: float, synonym: bool) -> None:
+    embed_manager = EmbeddingManager()
+    kg_manager = KGManager()
+    half = num_triples // 2
+    batches = [
+        ("新建", make_triples(half, zipf, seed=1)),
+        ("增量", make_triples(num_triples - half, zipf, seed=2, pg_offset=half)),
+    ]
+    print(f"=== {num_triples} 个三元组 ===")
+    for name, triple_list_data in batches:
+        fill_embedding_stores(embed_manager, triple_list_data)
+        total_start = time.perf_counter()
+        timings = run_batch(kg_manager, embed_manager, triple_list_data, synonym)
+        total = time.perf_counter() - total_start
+        detail = "，".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items())
+        print(
+            f"[{name}] {sum(len(v) for v in triple_list_data.values())} 个三元组，耗时 {total:.2f}s（{detail}）"
+            f"，图中共 {len(kg_manager.graph.get_node_list())} 个节点、{len(kg_manager.graph.get_edge_list())} 条边"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KG 构建性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="三元组数量")
+    parser.add_argument(
+        "--zipf", type=float, default=1.3, help="实体分布的 Zipf 参数，越接近 1 高频实体（出边很多的节点）越集中"
+    )
+    parser.add_argument("--synonym", action="store_true", help="同时测试同义词连接")
+    args = parser.parse_args()
+    for num_triples in args.sizes:
+        benchmark(num_triples, args.zipf, args.synonym)
+
+
+if __name__ == "__main__":
+    main()
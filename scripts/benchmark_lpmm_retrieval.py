@@ -0,0 +1,296 @@
+"""
+LPMM 检索性能基准
+
+用合成数据（段落、三元组、随机向量）测试知识检索各阶段的延迟，不调用任何模型、不读写 data 目录。
+每条查询按 QAManager.process_query 的顺序执行（问题Embedding除外）：
+关系检索 -> 文段检索 -> 关系动态TopK -> KG检索（PPR）-> 结果动态TopK，
+输出每个阶段的 p50 / p95 / p99 延迟与内存占用，便于比较索引类型、PPR 算法等改动前后的差异。
+
+查询向量由随机选取的关系向量加噪声得到，因此大部分查询会命中关系并走KG检索。
+
+用法：
+    python scripts/benchmark_lpmm_retrieval.py --triples 100000 --queries 500
+    python scripts/benchmark_lpmm_retrieval.py --index-type hnsw --ppr-method push
+    python scripts/benchmark_lpmm_retrieval.py --data-dir /tmp/lpmm-bench   # 首次生成并保存，之后直接加载
+    python scripts/benchmark_lpmm_retrieval.py --json result.json           # 同时把结果写入JSON文件
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# benchmark_kg_build 导入时会把嵌入维度设为它自己的值，之后再按参数覆盖
+from benchmark_kg_build import make_triples, run_batch
+from import_openie import peak_rss_mb
+from src.chat.knowledge.embedding_store import EmbeddingManager, EmbeddingStore, EmbeddingStoreItem
+from src.chat.knowledge.kg_manager import KGManager, entity_hash_key
+from src.chat.knowledge.utils.dyn_topk import dyn_select_top_k
+from src.chat.knowledge.utils.hash import get_sha256
+from src.config.config import global_config
+
+BENCHMARK_META_FILE = "benchmark-meta.json"
+"""--data-dir 中记录合成数据参数的文件，存在时直接加载数据而不重新生成"""
+
+STAGES = ["关系检索", "文段检索", "关系动态TopK", "KG检索", "结果动态TopK", "总计"]
+PERCENTILES = [50, 95, 99]
+
+
+def fill_embedding_stores(
+    embed_manager: EmbeddingManager, triple_list_data: Dict[str, List[List[str]]], dim: int, seed: int
+) -> None:
+    """为段落、实体、关系写入随机向量（键与字符串格式与真实导入相同）"""
+    rng = np.random.default_rng(seed)
+
+    def fill(store: EmbeddingStore, items: Dict[str, str]) -> None:
+        vectors = rng.standard_normal((len(items), dim)).astype(np.float32)
+        for (key, content), vector in zip(items.items(), vectors, strict=True):
+            store.store[key] = EmbeddingStoreItem(key, vector, content)
+
+    paragraphs: Dict[str, str] = {}
+    entities: Dict[str, str] = {}
+    relations: Dict[str, str] = {}
+    for pg_hash, triples in triple_list_data.items():
+        paragraphs[f"paragraph-{pg_hash}"] = f"段落{pg_hash}：" + "，".join("".join(t) for t in triples)
+        for triple in triples:
+            entities[entity_hash_key(triple[0])] = triple[0]
+            entities[entity_hash_key(triple[2])] = triple[2]
+            relation = str(tuple(triple))
+            relations[f"relation-{get_sha256(relation)}"] = relation
+    fill(embed_manager.paragraphs_embedding_store, paragraphs)
+    fill(embed_manager.entities_embedding_store, entities)
+    fill(embed_manager.relation_embedding_store, relations)
+    embed_manager.stored_pg_hashes = set(paragraphs)
+
+
+def build_corpus(args, data_dir: Optional[str]):
+    """生成合成数据，指定 data_dir 时保存到该目录"""
+    embed_manager = EmbeddingManager(dir_path=data_dir) if data_dir else EmbeddingManager()
+    kg_manager = KGManager(dir_path=data_dir)
+    start = time.perf_counter()
+    triple_list_data = make_triples(args.triples, args.zipf, seed=args.seed)
+    fill_embedding_stores(embed_manager, triple_list_data, args.dim, args.seed)
+    print(
+        f"生成合成数据：{len(triple_list_data)} 个段落、{args.triples} 个三元组，耗时 {time.perf_counter() - start:.2f}s"
+    )
+
+    start = time.perf_counter()
+    embed_manager.rebuild_faiss_index()
+    print(f"构建向量索引耗时 {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    run_batch(kg_manager, embed_manager, triple_list_data, args.synonym)
+    print(f"构建KG耗时 {time.perf_counter() - start:.2f}s")
+
+    if data_dir:
+        embed_manager.save_to_file()
+        kg_manager.save_to_file()
+        meta = {"triples": args.triples, "zipf": args.zipf, "seed": args.seed, "dim": args.dim, "synonym": args.synonym}
+        with open(os.path.join(data_dir, BENCHMARK_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=4)
+        print(f"合成数据已保存到 {data_dir}")
+    return embed_manager, kg_manager
+
+
+def load_corpus(data_dir: str):
+    """从 data_dir 加载之前保存的合成数据"""
+    with open(os.path.join(data_dir, BENCHMARK_META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    global_config.lpmm_knowledge.embedding_dimension = meta["dim"]
+    start = time.perf_counter()
+    embed_manager = EmbeddingManager(dir_path=data_dir)
+    embed_manager.load_from_file()
+    kg_manager = KGManager(dir_path=data_dir)
+    kg_manager.load_from_file()
+    print(f"从 {data_dir} 加载合成数据（{meta}），耗时 {time.perf_counter() - start:.2f}s")
+    return embed_manager, kg_manager
+
+
+def make_queries(embed_manager: EmbeddingManager, num_queries: int, noise: float, seed: int) -> np.ndarray:
+    """以随机选取的关系向量加噪声作为查询向量"""
+    rng = np.random.default_rng(seed + 1)
+    relation_columns = embed_manager.relation_embedding_store.store
+    rows = rng.choice(relation_columns.live_rows(), size=num_queries)
+    base = relation_columns.matrix[rows]
+    base = base / np.linalg.norm(base, axis=1, keepdims=True)
+    perturb = rng.standard_normal(base.shape).astype(np.float32)
+    perturb /= np.linalg.norm(perturb, axis=1, keepdims=True)
+    return (base + noise * perturb).astype(np.float32)
+
+
+def run_queries(embed_manager: EmbeddingManager, kg_manager: KGManager, queries: np.ndarray) -> Dict[str, List[float]]:
+    """逐条执行查询，记录每个阶段的耗时（秒）"""
+    lpmm_config = global_config.lpmm_knowledge
+    relation_store = embed_manager.relation_embedding_store
+    paragraph_store = embed_manager.paragraphs_embedding_store
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    kg_queries = 0
+
+    for query in queries:
+        query_start = time.perf_counter()
+        start = query_start
+        relation_search_res = relation_store.search_top_k(query, lpmm_config.qa_relation_search_top_k)
+        timings["关系检索"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        paragraph_search_res = paragraph_store.search_top_k(query, lpmm_config.qa_paragraph_search_top_k)
+        timings["文段检索"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        relation_search_res = dyn_select_top_k(relation_search_res, 0.5, 1.0)
+        if not relation_search_res or relation_search_res[0][1] < lpmm_config.qa_relation_threshold:
+            relation_search_res = []
+        timings["关系动态TopK"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        if relation_search_res:
+            result, _ = kg_manager.kg_search(relation_search_res, paragraph_search_res, embed_manager)
+            kg_queries += 1
+        else:
+            result = paragraph_search_res
+        timings["KG检索"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        dyn_select_top_k(result, 0.5, 1.0)
+        end = time.perf_counter()
+        timings["结果动态TopK"].append(end - start)
+        timings["总计"].append(end - query_start)
+
+    print(f"{len(queries)} 条查询中 {kg_queries} 条命中关系并进行了KG检索，其余只使用文段检索结果")
+    return timings
+
+
+def run_batch_search(embed_manager: EmbeddingManager, queries: np.ndarray, batch_size: int) -> List[float]:
+    """按批调用 search_top_k_batch（关系 + 文段），返回每批中平均每条查询的耗时（秒）"""
+    lpmm_config = global_config.lpmm_knowledge
+    per_query: List[float] = []
+    for i in range(0, len(queries), batch_size):
+        batch = queries[i : i + batch_size]
+        start = time.perf_counter()
+        embed_manager.relation_embedding_store.search_top_k_batch(batch, lpmm_config.qa_relation_search_top_k)
+        embed_manager.paragraphs_embedding_store.search_top_k_batch(batch, lpmm_config.qa_paragraph_search_top_k)
+        per_query.append((time.perf_counter() - start) / len(batch))
+    return per_query
+
+
+def memory_footprint(embed_manager: EmbeddingManager, kg_manager: KGManager) -> Dict[str, float]:
+    """各部分的内存占用（MB）"""
+    footprint: Dict[str, float] = {}
+    for store in (
+        embed_manager.paragraphs_embedding_store,
+        embed_manager.entities_embedding_store,
+        embed_manager.relation_embedding_store,
+    ):
+        footprint[f"{store.namespace}向量"] = store.store.matrix.nbytes / 1024 / 1024
+        if store.faiss_index is not None:
+            footprint[f"{store.namespace}索引"] = faiss.serialize_index(store.faiss_index).nbytes / 1024 / 1024
+    snapshot = kg_manager.get_snapshot()
+    footprint["KG快照数组"] = (
+        sum(
+            array.nbytes
+            for array in (
+                snapshot.out_indptr,
+                snapshot.out_dst,
+                snapshot.out_prob,
+                snapshot.in_src,
+                snapshot.in_dst,
+                snapshot.in_prob,
+                snapshot.paragraph_nodes,
+                snapshot.is_paragraph,
+            )
+        )
+        / 1024
+        / 1024
+    )
+    return footprint
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """耗时样本的百分位数（毫秒）"""
+    values = np.asarray(samples) * 1000
+    summary = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary["mean"] = float(values.mean())
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LPMM 检索性能基准")
+    parser.add_argument("--triples", type=int, default=100_000, help="合成三元组数量")
+    parser.add_argument("--zipf", type=float, default=1.3, help="实体分布的 Zipf 参数")
+    parser.add_argument("--dim", type=int, default=256, help="合成向量维度")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    parser.add_argument("--synonym", action="store_true", help="构建KG时进行同义词连接（较慢）")
+    parser.add_argument("--data-dir", help="合成数据目录：已有数据时直接加载，否则生成后保存到该目录")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--noise", type=float, default=0.5, help="查询向量相对关系向量的噪声大小")
+    parser.add_argument("--batch-size", type=int, default=32, help="批量检索时每批的查询数")
+    parser.add_argument(
+        "--index-type",
+        choices=["auto", "flat", "ivf_flat", "hnsw", "ivf_pq"],
+        help="覆盖 lpmm_knowledge.faiss_index_type",
+    )
+    parser.add_argument("--ppr-method", choices=["power", "push"], help="覆盖 lpmm_knowledge.qa_ppr_method")
+    parser.add_argument("--json", help="把结果写入该JSON文件")
+    args = parser.parse_args()
+
+    lpmm_config = global_config.lpmm_knowledge
+    lpmm_config.embedding_dimension = args.dim
+    if args.index_type:
+        lpmm_config.faiss_index_type = args.index_type
+    if args.ppr_method:
+        lpmm_config.qa_ppr_method = args.ppr_method
+
+    if args.data_dir and os.path.exists(os.path.join(args.data_dir, BENCHMARK_META_FILE)):
+        embed_manager, kg_manager = load_corpus(args.data_dir)
+    else:
+        embed_manager, kg_manager = build_corpus(args, args.data_dir)
+
+    start = time.perf_counter()
+    kg_manager.get_snapshot()
+    snapshot_time = time.perf_counter() - start
+    print(
+        f"KG：{kg_manager.num_nodes} 个节点、{kg_manager.num_edges} 条边，构建检索快照耗时 {snapshot_time:.2f}s；"
+        f"索引类型 {embed_manager.paragraphs_embedding_store.index_params.index_type}，PPR算法 {lpmm_config.qa_ppr_method}"
+    )
+
+    queries = make_queries(embed_manager, args.queries, args.noise, args.seed)
+    timings = run_queries(embed_manager, kg_manager, queries)
+    batch_timings = run_batch_search(embed_manager, queries, args.batch_size)
+
+    results = {stage: summarize(samples) for stage, samples in timings.items()}
+    results[f"批量检索（每批{args.batch_size}条，每条平均）"] = summarize(batch_timings)
+    print(f"\n{'阶段':<24}" + "".join(f"{f'p{p}(ms)':>12}" for p in PERCENTILES) + f"{'mean(ms)':>12}")
+    for stage, summary in results.items():
+        print(f"{stage:<24}" + "".join(f"{summary[f'p{p}']:>12.3f}" for p in PERCENTILES) + f"{summary['mean']:>12.3f}")
+
+    footprint = memory_footprint(embed_manager, kg_manager)
+    rss = peak_rss_mb()
+    print("\n内存占用：" + "，".join(f"{name} {size:.1f}MB" for name, size in footprint.items()))
+    print(f"进程峰值内存：{f'{rss:.0f}MB' if rss is not None else '当前平台不支持统计'}")
+
+    if args.json:
+        output = {
+            "args": vars(args),
+            "index_type": embed_manager.paragraphs_embedding_store.index_params.index_type,
+            "ppr_method": lpmm_config.qa_ppr_method,
+            "num_nodes": kg_manager.num_nodes,
+            "num_edges": kg_manager.num_edges,
+            "snapshot_time": snapshot_time,
+            "latency_ms": results,
+            "memory_mb": footprint,
+            "peak_rss_mb": rss,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=4)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
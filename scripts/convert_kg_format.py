@@ -0,0 +1,61 @@
+"""
+KG 存储格式转换
+
+KG 默认保存为二进制格式（data/rag/rag-graph.*.arrow），需要 GraphML 的工具可以用本脚本互相转换：
+    python scripts/convert_kg_format.py to-graphml [--output data/rag/rag-graph.graphml]
+    python scripts/convert_kg_format.py from-graphml [--input data/rag/rag-graph.graphml]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from quick_algo import di_graph
+
+from src.chat.knowledge.kg_manager import KGManager
+from src.common.logger import get_logger
+
+logger = get_logger("KG格式转换")
+
+
+def to_graphml(output: str | None) -> None:
+    kg_manager = KGManager()
+    kg_manager.load_from_file()
+    path = kg_manager.export_graphml(output)
+    logger.info(f"已导出GraphML：{path}（{kg_manager.num_nodes}个节点，{kg_manager.num_edges}条边）")
+
+
+def from_graphml(input_path: str | None) -> None:
+    kg_manager = KGManager()
+    input_path = input_path or kg_manager.graph_data_path
+    if not os.path.exists(input_path):
+        logger.error(f"GraphML文件{input_path}不存在")
+        sys.exit(1)
+    try:
+        # 段落hash与实体计数沿用现有文件
+        kg_manager.load_from_file()
+    except FileNotFoundError as e:
+        logger.warning(f"{e}，只转换图结构")
+    kg_manager.graph = di_graph.load_from_file(input_path)
+    kg_manager.save_to_file()
+    logger.info(f"已从{input_path}导入KG并保存为二进制格式（{kg_manager.num_nodes}个节点，{kg_manager.num_edges}条边）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KG 存储格式转换")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("to-graphml", help="把二进制格式的KG导出为GraphML")
+    export_parser.add_argument("--output", help="输出文件路径，默认为 data/rag/rag-graph.graphml")
+    import_parser = subparsers.add_parser("from-graphml", help="从GraphML导入KG并保存为二进制格式")
+    import_parser.add_argument("--input", help="GraphML文件路径，默认为 data/rag/rag-graph.graphml")
+    args = parser.parse_args()
+
+    if args.command == "to-graphml":
+        to_graphml(args.output)
+    else:
+        from_graphml(args.input)
+
+
+if __name__ == "__main__":
+    main()
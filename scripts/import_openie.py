@@ -4,10 +4,19 @@
 #     print("未找到quick_algo库，无法使用quick_algo算法")
 #     print("请安装quick_algo库 - 在lib.quick_algo中，执行命令：python setup.py build_ext --inplace")
 
+import argparse
 import sys
 import os
 import asyncio
+import time
+from dataclasses import dataclass, field
 from time import sleep
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.chat.knowledge.embedding_store import EmbeddingManager
@@ -23,6 +32,9 @@ OPENIE_DIR = os.path.join(ROOT_PATH, "data", "openie")
 
 logger = get_logger("OpenIE导入")
 
+CHECKPOINT_INTERVAL = 300.0
+"""分块导入时两次保存之间的最短间隔（秒）：保存会重写整个嵌入库与KG，每块都保存会使导入总耗时随数据量平方增长"""
+
 
 def ensure_openie_dir():
     """确保OpenIE数据目录存在"""
@@ -71,7 +83,197 @@ def hash_deduplicate(
     return new_raw_paragraphs, new_triple_list_data
 
 
-def handle_import_openie(openie_data: OpenIE, embed_manager: EmbeddingManager, kg_manager: KGManager) -> bool:
+def peak_rss_mb() -> Optional[float]:
+    """进程的峰值常驻内存（MB），平台不支持时返回None"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 的单位是字节，Linux 是KB
+    return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+
+
+def embedding_count(embed_manager: EmbeddingManager) -> int:
+    return (
+        len(embed_manager.paragraphs_embedding_store.store)
+        + len(embed_manager.entities_embedding_store.store)
+        + len(embed_manager.relation_embedding_store.store)
+    )
+
+
+@dataclass
+class ImportStats:
+    """导入过程的吞吐量统计"""
+
+    docs: int = 0
+    """读取的文档数"""
+    invalid_docs: int = 0
+    """跳过的非法文档数"""
+    new_paragraphs: int = 0
+    """去重后实际导入的段落数"""
+    embeddings: int = 0
+    """新增的嵌入数（段落、实体、关系）"""
+    embedding_time: float = 0.0
+    kg_time: float = 0.0
+    save_time: float = 0.0
+    saves: int = 0
+    start_time: float = field(default_factory=time.perf_counter)
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.start_time
+        rss = peak_rss_mb()
+        logger.info("----导入统计----")
+        logger.info(
+            f"文档：读取{self.docs}条，跳过非法{self.invalid_docs}条，新导入段落{self.new_paragraphs}条，"
+            f"总耗时{elapsed:.1f}秒，{self.docs / elapsed if elapsed else 0:.2f} docs/s"
+        )
+        logger.info(
+            f"嵌入：新增{self.embeddings}条，耗时{self.embedding_time:.1f}秒（含索引更新），"
+            f"{self.embeddings / self.embedding_time if self.embedding_time else 0:.2f} embeddings/s"
+        )
+        logger.info(f"KG构建耗时{self.kg_time:.1f}秒")
+        logger.info(f"保存{self.saves}次，耗时{self.save_time:.1f}秒")
+        logger.info(f"峰值内存占用：{f'{rss:.0f} MB' if rss is not None else '当前平台不支持统计'}")
+
+
+def find_missing_fields(doc: Dict[str, Any]) -> List[str]:
+    """检查文档的字段是否完整，返回缺失原因列表"""
+    missing = []
+    # 检查字段是否存在且非空
+    if "passage" not in doc or not doc.get("passage"):
+        missing.append("passage")
+    if "extracted_entities" not in doc or not isinstance(doc.get("extracted_entities"), list):
+        missing.append("名词列表缺失")
+    elif len(doc.get("extracted_entities", [])) == 0:
+        missing.append("名词列表为空")
+    if "extracted_triples" not in doc or not isinstance(doc.get("extracted_triples"), list):
+        missing.append("主谓宾三元组缺失")
+    elif len(doc.get("extracted_triples", [])) == 0:
+        missing.append("主谓宾三元组为空")
+    return missing
+
+
+def log_invalid_doc(doc: Dict[str, Any], missing: List[str]) -> None:
+    logger.error("\n")
+    logger.error("数据缺失：")
+    logger.error(f"对应哈希值：{doc.get('idx', '<无idx>')}")
+    logger.error(f"对应文段内容内容：{doc.get('passage', '<无passage>')}")
+    logger.error(f"非法原因：{', '.join(missing)}")
+
+
+async def import_paragraphs(
+    raw_paragraphs: dict[str, str],
+    triple_list_data: dict[str, list[list[str]]],
+    embed_manager: EmbeddingManager,
+    kg_manager: KGManager,
+    stats: ImportStats,
+) -> int:
+    """去重后为新段落获取嵌入、更新向量索引与KG（不保存到文件，见 save_import），返回新导入的段落数"""
+    # 将索引换为对应段落的hash值
+    logger.info("正在进行段落去重与重索引")
+    raw_paragraphs, triple_list_data = hash_deduplicate(
+        raw_paragraphs,
+        triple_list_data,
+        embed_manager.stored_pg_hashes,
+        kg_manager.stored_paragraph_hashes,
+    )
+    if len(raw_paragraphs) == 0:
+        logger.info("无新段落需要处理")
+        return 0
+    # 获取嵌入并保存
+    logger.info(f"段落去重完成，剩余待处理的段落数量：{len(raw_paragraphs)}")
+    logger.info("开始Embedding")
+    start_time = time.perf_counter()
+    embeddings_before = embedding_count(embed_manager)
+    await embed_manager.store_new_data_set_async(raw_paragraphs, triple_list_data)
+    # Embedding-Faiss重索引
+    logger.info("正在更新向量索引")
+    embed_manager.update_faiss_index()
+    logger.info("向量索引更新完成")
+    stats.embeddings += embedding_count(embed_manager) - embeddings_before
+    stats.embedding_time += time.perf_counter() - start_time
+    logger.info("Embedding完成")
+    # 构建新段落的RAG
+    logger.info("开始构建RAG")
+    start_time = time.perf_counter()
+    kg_manager.build_kg(triple_list_data, embed_manager)
+    stats.kg_time += time.perf_counter() - start_time
+    stats.new_paragraphs += len(raw_paragraphs)
+    logger.info("RAG构建完成")
+    return len(raw_paragraphs)
+
+
+def save_import(embed_manager: EmbeddingManager, kg_manager: KGManager, stats: ImportStats) -> None:
+    """保存嵌入库与KG（先保存嵌入库，KG中的段落总能在嵌入库中找到）"""
+    start_time = time.perf_counter()
+    embed_manager.save_to_file()
+    kg_manager.save_to_file()
+    stats.save_time += time.perf_counter() - start_time
+    stats.saves += 1
+
+
+def iter_doc_chunks(chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """按块读取OpenIE文档"""
+    chunk = []
+    for doc in OpenIE.iter_docs():
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def handle_import_openie_chunked(
+    embed_manager: EmbeddingManager, kg_manager: KGManager, chunk_size: int, stats: ImportStats
+) -> bool:
+    """分块导入：每次读取 chunk_size 条文档，完成嵌入、索引更新与KG构建后再读取下一块
+
+    内存中只保留当前块的段落与三元组。嵌入库与KG每隔 CHECKPOINT_INTERVAL 秒保存一次，全部导入后再保存一次；
+    中断后重新运行时，最近一次保存前已导入的段落会被去重跳过。非法文档会被跳过并输出原因，不会中断导入。
+    """
+    last_save_time = time.perf_counter()
+    unsaved_paragraphs = 0
+    for chunk_idx, docs in enumerate(iter_doc_chunks(chunk_size), 1):
+        stats.docs += len(docs)
+        # 构造 OpenIE 对象以过滤无效实体与三元组
+        openie_data = OpenIE(docs, 0, 0)
+        valid_docs = []
+        for doc in openie_data.docs:
+            if missing := find_missing_fields(doc):
+                log_invalid_doc(doc, missing)
+                stats.invalid_docs += 1
+            else:
+                valid_docs.append(doc)
+        openie_data.docs = valid_docs
+        logger.info(f"----第{chunk_idx}块：{len(docs)}条文档，其中非法{len(docs) - len(valid_docs)}条----")
+        unsaved_paragraphs += await import_paragraphs(
+            openie_data.extract_raw_paragraph_dict(),
+            openie_data.extract_triple_dict(),
+            embed_manager,
+            kg_manager,
+            stats,
+        )
+        if unsaved_paragraphs and time.perf_counter() - last_save_time >= CHECKPOINT_INTERVAL:
+            logger.info(f"保存检查点：{unsaved_paragraphs}条新段落")
+            save_import(embed_manager, kg_manager, stats)
+            last_save_time = time.perf_counter()
+            unsaved_paragraphs = 0
+        elapsed = time.perf_counter() - stats.start_time
+        logger.info(
+            f"已处理{stats.docs}条文档（{stats.docs / elapsed:.2f} docs/s），新导入段落{stats.new_paragraphs}条，"
+            f"KG节点{kg_manager.num_nodes}个、边{kg_manager.num_edges}条"
+        )
+    if unsaved_paragraphs:
+        save_import(embed_manager, kg_manager, stats)
+    if stats.docs == 0:
+        logger.error(f"未在 {OPENIE_DIR} 找到任何OpenIE数据")
+        return False
+    return True
+
+
+async def handle_import_openie(
+    openie_data: OpenIE, embed_manager: EmbeddingManager, kg_manager: KGManager, stats: Optional[ImportStats] = None
+) -> bool:
     # sourcery skip: extract-method
     # 从OpenIE数据中提取段落原文与三元组列表
     # 索引的段落原文
@@ -96,29 +298,12 @@ def handle_import_openie(openie_data: OpenIE, embed_manager: EmbeddingManager, k
         missing_idxs = []
         for doc in getattr(openie_data, "docs", []):
             idx = doc.get("idx", "<无idx>")
-            passage = doc.get("passage", "<无passage>")
-            missing = []
-            # 检查字段是否存在且非空
-            if "passage" not in doc or not doc.get("passage"):
-                missing.append("passage")
-            if "extracted_entities" not in doc or not isinstance(doc.get("extracted_entities"), list):
-                missing.append("名词列表缺失")
-            elif len(doc.get("extracted_entities", [])) == 0:
-                missing.append("名词列表为空")
-            if "extracted_triples" not in doc or not isinstance(doc.get("extracted_triples"), list):
-                missing.append("主谓宾三元组缺失")
-            elif len(doc.get("extracted_triples", [])) == 0:
-                missing.append("主谓宾三元组为空")
             # 输出所有doc的idx
             # print(f"检查: idx={idx}")
-            if missing:
+            if missing := find_missing_fields(doc):
                 found_missing = True
                 missing_idxs.append(idx)
-                logger.error("\n")
-                logger.error("数据缺失：")
-                logger.error(f"对应哈希值：{idx}")
-                logger.error(f"对应文段内容内容：{passage}")
-                logger.error(f"非法原因：{', '.join(missing)}")
+                log_invalid_doc(doc, missing)
         # 确保提示在所有非法数据输出后再输出
         if not found_missing:
             logger.info("所有数据均完整，没有发现缺失字段。")
@@ -145,36 +330,15 @@ def handle_import_openie(openie_data: OpenIE, embed_manager: EmbeddingManager, k
     if len(raw_paragraphs) != len(entity_list_data) or len(raw_paragraphs) != len(triple_list_data):
         logger.error("删除非法文段后，数据仍不一致，程序终止。")
         sys.exit(1)
-    # 将索引换为对应段落的hash值
-    logger.info("正在进行段落去重与重索引")
-    raw_paragraphs, triple_list_data = hash_deduplicate(
-        raw_paragraphs,
-        triple_list_data,
-        embed_manager.stored_pg_hashes,
-        kg_manager.stored_paragraph_hashes,
-    )
-    if len(raw_paragraphs) != 0:
-        # 获取嵌入并保存
-        logger.info(f"段落去重完成，剩余待处理的段落数量：{len(raw_paragraphs)}")
-        logger.info("开始Embedding")
-        embed_manager.store_new_data_set(raw_paragraphs, triple_list_data)
-        # Embedding-Faiss重索引
-        logger.info("正在重新构建向量索引")
-        embed_manager.rebuild_faiss_index()
-        logger.info("向量索引构建完成")
-        embed_manager.save_to_file()
-        logger.info("Embedding完成")
-        # 构建新段落的RAG
-        logger.info("开始构建RAG")
-        kg_manager.build_kg(triple_list_data, embed_manager)
-        kg_manager.save_to_file()
-        logger.info("RAG构建完成")
-    else:
-        logger.info("无新段落需要处理")
+    if stats is None:
+        stats = ImportStats()
+    stats.docs += len(openie_data.docs)
+    if await import_paragraphs(raw_paragraphs, triple_list_data, embed_manager, kg_manager, stats):
+        save_import(embed_manager, kg_manager, stats)
     return True
 
 
-async def main_async():  # sourcery skip: dict-comprehension
+async def main_async(chunk_size: int = 0):  # sourcery skip: dict-comprehension
     # 新增确认提示
     print("=== 重要操作确认 ===")
     print("OpenIE导入时会大量发送请求，可能会撞到请求速度上限，请注意选用的模型")
@@ -183,6 +347,7 @@ async def main_async():  # sourcery skip: dict-comprehension
     print("每百万Token费用为0.7元")
     print("知识导入时，会消耗大量系统资源，建议在较好配置电脑上运行")
     print("同上样例，导入时10700K几乎跑满，14900HX占用80%，峰值内存占用约3G")
+    print("数据量很大时可以加上 --chunk-size 1000 分块导入，内存占用不随数据总量增长，导入过程中定期保存")
     confirm = input("确认继续执行？(y/n): ").strip().lower()
     if confirm != "y":
         logger.info("用户取消操作")
@@ -219,8 +384,8 @@ async def main_async():  # sourcery skip: dict-comprehension
         logger.error("如果你是第一次导入知识，请忽略此错误")
     logger.info("KG加载完成")
 
-    logger.info(f"KG节点数量：{len(kg_manager.graph.get_node_list())}")
-    logger.info(f"KG边数量：{len(kg_manager.graph.get_edge_list())}")
+    logger.info(f"KG节点数量：{kg_manager.num_nodes}")
+    logger.info(f"KG边数量：{kg_manager.num_edges}")
 
     # 数据比对：Embedding库与KG的段落hash集合
     for pg_hash in kg_manager.stored_paragraph_hashes:
@@ -229,20 +394,44 @@ async def main_async():  # sourcery skip: dict-comprehension
         if key not in embed_manager.stored_pg_hashes:
             logger.warning(f"KG中存在Embedding库中不存在的段落：{key}")
 
-    logger.info("正在导入OpenIE数据文件")
-    try:
-        openie_data = OpenIE.load()
-    except Exception as e:
-        logger.error(f"导入OpenIE数据文件时发生错误：{e}")
-        return False
-    if handle_import_openie(openie_data, embed_manager, kg_manager) is False:
+    stats = ImportStats()
+    if chunk_size > 0:
+        logger.info(f"正在分块导入OpenIE数据文件，每块{chunk_size}条文档")
+        try:
+            success = await handle_import_openie_chunked(embed_manager, kg_manager, chunk_size, stats)
+        except Exception as e:
+            logger.error(f"导入OpenIE数据文件时发生错误：{e}")
+            stats.report()
+            return False
+    else:
+        logger.info("正在导入OpenIE数据文件")
+        try:
+            openie_data = OpenIE.load()
+        except Exception as e:
+            logger.error(f"导入OpenIE数据文件时发生错误：{e}")
+            return False
+        success = await handle_import_openie(openie_data, embed_manager, kg_manager, stats)
+    stats.report()
+    if success is False:
         logger.error("处理OpenIE数据时发生错误")
         return False
     return None
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="导入OpenIE数据到LPMM知识库")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=0,
+        help="分块导入，每次处理的文档数（内存占用与数据总量无关，导入过程中定期保存）；默认0为一次性导入全部数据",
+    )
+    return parser.parse_args()
+
+
 def main():
     """主函数 - 设置新的事件循环并运行异步主函数"""
+    args = parse_args()
     # 检查是否有现有的事件循环
     try:
         loop = asyncio.get_running_loop()
@@ -257,7 +446,7 @@ def main():
 
     try:
         # 在新的事件循环中运行异步主函数
-        loop.run_until_complete(main_async())
+        loop.run_until_complete(main_async(args.chunk_size))
     finally:
         # 确保事件循环被正确关闭
         if not loop.is_closed():
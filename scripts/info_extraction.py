@@ -1,10 +1,9 @@
+import asyncio
 import json
 import os
-import signal
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock, Event
 import sys
 import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 # 添加项目根目录到 sys.path
@@ -14,8 +13,8 @@ from rich.progress import Progress  # 替换为 rich 进度条
 from src.common.logger import get_logger
 
 # from src.chat.knowledge.lpmmconfig import global_config
-from src.chat.knowledge.ie_process import info_extract_from_str
-from src.chat.knowledge.open_ie import OpenIE
+from src.chat.knowledge.ie_pipeline import InfoExtractionPipeline
+from src.chat.knowledge.open_ie import OpenIE, OpenIEJsonlWriter
 from rich.progress import (
     BarColumn,
     TimeElapsedColumn,
@@ -25,24 +24,21 @@ from rich.progress import (
     SpinnerColumn,
     TextColumn,
 )
-from raw_data_preprocessor import RAW_DATA_PATH, load_raw_data
+from raw_data_preprocessor import RAW_DATA_PATH, iter_raw_data
 from src.config.config import global_config, model_config
-from src.llm_models.utils_model import LLMRequest
 
 logger = get_logger("LPMM知识库-信息提取")
 
 
 ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# 旧版本逐段落保存提取结果的缓存目录，其中的结果仍会被复用
 TEMP_DIR = os.path.join(ROOT_PATH, "temp")
 # IMPORTED_DATA_PATH = os.path.join(ROOT_PATH, "data", "imported_lpmm_data")
 OPENIE_OUTPUT_DIR = os.path.join(ROOT_PATH, "data", "openie")
 
 
 def ensure_dirs():
-    """确保临时目录和输出目录存在"""
-    if not os.path.exists(TEMP_DIR):
-        os.makedirs(TEMP_DIR)
-        logger.info(f"已创建临时目录: {TEMP_DIR}")
+    """确保输出目录存在"""
     if not os.path.exists(OPENIE_OUTPUT_DIR):
         os.makedirs(OPENIE_OUTPUT_DIR)
         logger.info(f"已创建输出目录: {OPENIE_OUTPUT_DIR}")
@@ -51,73 +47,76 @@ def ensure_dirs():
         logger.info(f"已创建原始数据目录: {RAW_DATA_PATH}")
 
 
-# 创建一个线程安全的锁，用于保护文件操作和共享数据
-file_lock = Lock()
-open_ie_doc_lock = Lock()
-
-# 创建一个事件标志，用于控制程序终止
-shutdown_event = Event()
-
-lpmm_entity_extract_llm = LLMRequest(
-    model_set=model_config.model_task_config.lpmm_entity_extract, request_type="lpmm.entity_extract"
-)
-lpmm_rdf_build_llm = LLMRequest(model_set=model_config.model_task_config.lpmm_rdf_build, request_type="lpmm.rdf_build")
-
-
-def process_single_text(pg_hash, raw_data):
-    """处理单个文本的函数，用于线程池"""
-    temp_file_path = f"{TEMP_DIR}/{pg_hash}.json"
-
-    # 使用文件锁检查和读取缓存文件
-    with file_lock:
-        if os.path.exists(temp_file_path):
-            try:
-                # 存在对应的提取结果
-                logger.info(f"找到缓存的提取结果：{pg_hash}")
-                with open(temp_file_path, "r", encoding="utf-8") as f:
-                    return json.load(f), None
-            except json.JSONDecodeError:
-                # 如果JSON文件损坏，删除它并重新处理
-                logger.warning(f"缓存文件损坏，重新处理：{pg_hash}")
-                os.remove(temp_file_path)
-
-    entity_list, rdf_triple_list = info_extract_from_str(
-        lpmm_entity_extract_llm,
-        lpmm_rdf_build_llm,
-        raw_data,
+def load_done_hashes() -> Set[str]:
+    """已有OpenIE数据文件中的段落hash（这些段落已经提取过，不再重复提取）"""
+    done_hashes = set()
+    for doc in OpenIE.iter_docs(OPENIE_OUTPUT_DIR):
+        if idx := doc.get("idx"):
+            done_hashes.add(idx)
+    return done_hashes
+
+
+def load_legacy_cache(pg_hash: str) -> Optional[Dict]:
+    """读取旧版本缓存目录中的提取结果"""
+    temp_file_path = os.path.join(TEMP_DIR, f"{pg_hash}.json")
+    if not os.path.exists(temp_file_path):
+        return None
+    try:
+        with open(temp_file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        logger.warning(f"缓存文件损坏，重新处理：{pg_hash}")
+        return None
+
+
+async def run_extraction(writer: OpenIEJsonlWriter, done_hashes: Set[str], total: int) -> List[str]:
+    """流式提取全部未完成的段落，结果逐条追加到 writer，返回提取失败的段落hash"""
+    failed_sha256: List[str] = []
+    pipeline = InfoExtractionPipeline(
+        model_config.model_task_config.lpmm_entity_extract,
+        model_config.model_task_config.lpmm_rdf_build,
+        global_config.lpmm_knowledge.info_extraction_workers,
     )
-    if entity_list is None or rdf_triple_list is None:
-        return None, pg_hash
-    doc_item = {
-        "idx": pg_hash,
-        "passage": raw_data,
-        "extracted_entities": entity_list,
-        "extracted_triples": rdf_triple_list,
-    }
-    # 保存临时提取结果
-    with file_lock:
-        try:
-            with open(temp_file_path, "w", encoding="utf-8") as f:
-                json.dump(doc_item, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            logger.error(f"保存缓存文件失败：{pg_hash}, 错误：{e}")
-            # 如果保存失败，确保不会留下损坏的文件
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-            sys.exit(0)
-            return None, pg_hash
-    return doc_item, None
 
-
-def signal_handler(_signum, _frame):
-    """处理Ctrl+C信号"""
-    logger.info("\n接收到中断信号，正在优雅地关闭程序...")
-    sys.exit(0)
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        MofNCompleteColumn(),
+        "•",
+        TimeElapsedColumn(),
+        "<",
+        TimeRemainingColumn(),
+        transient=False,
+    ) as progress:
+        task = progress.add_task("正在进行提取：", total=total)
+
+        def todo_paragraphs() -> Iterator[Tuple[str, str]]:
+            for pg_hash, raw_data in iter_raw_data():
+                if pg_hash in done_hashes:
+                    continue
+                if (doc_item := load_legacy_cache(pg_hash)) is not None:
+                    logger.info(f"找到缓存的提取结果：{pg_hash}")
+                    on_result(doc_item)
+                    continue
+                yield pg_hash, raw_data
+
+        def on_result(doc_item: Dict) -> None:
+            writer.write(doc_item)
+            logger.info('已处理"%s"', doc_item.get("passage", ""))
+            progress.update(task, advance=1)
+
+        def on_failure(pg_hash: str) -> None:
+            failed_sha256.append(pg_hash)
+            logger.error(f"提取失败：{pg_hash}")
+            progress.update(task, advance=1)
+
+        await pipeline.run(todo_paragraphs(), on_result, on_failure)
+    return failed_sha256
 
 
 def main():  # sourcery skip: comprehension-to-generator, extract-method
-    # 设置信号处理器
-    signal.signal(signal.SIGINT, signal_handler)
     ensure_dirs()  # 确保目录存在
     # 新增用户确认提示
     print("=== 重要操作确认，请认真阅读以下内容哦 ===")
@@ -126,90 +125,38 @@ def main():  # sourcery skip: comprehension-to-generator, extract-method
     print("建议使用硅基流动的非Pro模型")
     print("或者使用可以用赠金抵扣的Pro模型")
     print("请确保账户余额充足，并且在执行前确认无误。")
+    print("提取结果会逐条写入 data/openie 下的 .jsonl 文件，中断后重新运行会跳过已提取的段落。")
     confirm = input("确认继续执行？(y/n): ").strip().lower()
     if confirm != "y":
         logger.info("用户取消操作")
         print("操作已取消")
         sys.exit(1)
     print("\n" + "=" * 40 + "\n")
-    ensure_dirs()  # 确保目录存在
     logger.info("--------进行信息提取--------\n")
 
-    # 加载原始数据
+    # 统计需要提取的段落（只保留hash，段落原文在提取时逐个文件读取）
     logger.info("正在加载原始数据")
-    all_sha256_list, all_raw_datas = load_raw_data()
-
-    failed_sha256 = []
-    open_ie_doc = []
-
-    workers = global_config.lpmm_knowledge.info_extraction_workers
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_to_hash = {
-            executor.submit(process_single_text, pg_hash, raw_data): pg_hash
-            for pg_hash, raw_data in zip(all_sha256_list, all_raw_datas, strict=False)
-        }
-
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            MofNCompleteColumn(),
-            "•",
-            TimeElapsedColumn(),
-            "<",
-            TimeRemainingColumn(),
-            transient=False,
-        ) as progress:
-            task = progress.add_task("正在进行提取：", total=len(future_to_hash))
-            try:
-                for future in as_completed(future_to_hash):
-                    if shutdown_event.is_set():
-                        for f in future_to_hash:
-                            if not f.done():
-                                f.cancel()
-                        break
-
-                    doc_item, failed_hash = future.result()
-                    if failed_hash:
-                        failed_sha256.append(failed_hash)
-                        logger.error(f"提取失败：{failed_hash}")
-                    elif doc_item:
-                        with open_ie_doc_lock:
-                            open_ie_doc.append(doc_item)
-                        logger.info('已处理"%s"', doc_item.get("passage", ""))
-                    progress.update(task, advance=1)
-            except KeyboardInterrupt:
-                logger.info("\n接收到中断信号，正在优雅地关闭程序...")
-                shutdown_event.set()
-                for f in future_to_hash:
-                    if not f.done():
-                        f.cancel()
-
-    # 合并所有文件的提取结果并保存
-    if open_ie_doc:
-        sum_phrase_chars = sum([len(e) for chunk in open_ie_doc for e in chunk["extracted_entities"]])
-        sum_phrase_words = sum([len(e.split()) for chunk in open_ie_doc for e in chunk["extracted_entities"]])
-        num_phrases = sum([len(chunk["extracted_entities"]) for chunk in open_ie_doc])
-        openie_obj = OpenIE(
-            open_ie_doc,
-            round(sum_phrase_chars / num_phrases, 4) if num_phrases else 0,
-            round(sum_phrase_words / num_phrases, 4) if num_phrases else 0,
-        )
-        # 输出文件名格式：MM-DD-HH-ss-openie.json
-        now = datetime.datetime.now()
-        filename = now.strftime("%m-%d-%H-%S-openie.json")
-        output_path = os.path.join(OPENIE_OUTPUT_DIR, filename)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(
-                openie_obj.to_dict() if hasattr(openie_obj, "to_dict") else openie_obj.__dict__,
-                f,
-                ensure_ascii=False,
-                indent=4,
-            )
-        logger.info(f"信息提取结果已保存到: {output_path}")
-    else:
-        logger.warning("没有可保存的信息提取结果")
+    done_hashes = load_done_hashes()
+    all_hashes = [pg_hash for pg_hash, _ in iter_raw_data()]
+    total = sum(pg_hash not in done_hashes for pg_hash in all_hashes)
+    logger.info(f"共读取到{len(all_hashes)}条数据，其中{len(all_hashes) - total}条已提取过，本次提取{total}条")
+    if total == 0:
+        logger.info("没有需要提取的段落")
+        return
+
+    # 输出文件名格式：MM-DD-HH-MM-SS-openie.jsonl
+    now = datetime.datetime.now()
+    output_path = os.path.join(OPENIE_OUTPUT_DIR, now.strftime("%m-%d-%H-%M-%S-openie.jsonl"))
+    failed_sha256: List[str] = []
+    with OpenIEJsonlWriter(output_path) as writer:
+        try:
+            failed_sha256 = asyncio.run(run_extraction(writer, done_hashes, total))
+        except KeyboardInterrupt:
+            logger.info("\n接收到中断信号，已停止提取，重新运行会从中断处继续")
+        if writer.count:
+            logger.info(f"本次共提取{writer.count}条，结果已保存到: {output_path}")
+        else:
+            logger.warning("没有可保存的信息提取结果")
 
     logger.info("--------信息提取完成--------")
     logger.info(f"提取失败的文段SHA256：{failed_sha256}")
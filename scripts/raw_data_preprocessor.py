@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Iterator
 import sys  # 新增系统模块导入
 from src.chat.knowledge.utils.hash import get_sha256
 
@@ -33,18 +34,32 @@ def _process_text_file(file_path):
     return paragraphs
 
 
-def _process_multi_files() -> list:
-    raw_files = list(Path(RAW_DATA_PATH).glob("*.txt"))
+def _list_raw_files() -> list[Path]:
+    raw_files = sorted(Path(RAW_DATA_PATH).glob("*.txt"))
     if not raw_files:
         logger.warning("警告: data/lpmm_raw_data 中没有找到任何 .txt 文件")
         sys.exit(1)
-    # 处理所有文件
-    all_paragraphs = []
-    for file in raw_files:
+    return raw_files
+
+
+def iter_raw_data() -> Iterator[tuple[str, str]]:
+    """逐个文件读取原始数据
+
+    每次只读入一个文件，按SHA256去重后逐条返回，供流式处理使用。
+
+    Returns:
+        Iterator[tuple[str, str]]: (SHA256, 段落) 的迭代器
+    """
+    sha256_set = set()
+    for file in _list_raw_files():
         logger.info(f"正在处理文件: {file.name}")
-        paragraphs = _process_text_file(file)
-        all_paragraphs.extend(paragraphs)
-    return all_paragraphs
+        for item in _process_text_file(file):
+            pg_hash = get_sha256(item)
+            if pg_hash in sha256_set:
+                logger.warning(f"重复数据：{item}")
+                continue
+            sha256_set.add(pg_hash)
+            yield pg_hash, item
 
 
 def load_raw_data() -> tuple[list[str], list[str]]:
@@ -52,25 +67,13 @@ def load_raw_data() -> tuple[list[str], list[str]]:
 
     读取原始数据文件，将原始数据加载到内存中
 
-    Args:
-        path: 可选，指定要读取的json文件绝对路径
-
     Returns:
+        - sha256_list: 原始数据的SHA256列表
         - raw_data: 原始数据列表
-        - sha256_list: 原始数据的SHA256集合
     """
-    raw_data = _process_multi_files()
     sha256_list = []
-    sha256_set = set()
-    for item in raw_data:
-        if not isinstance(item, str):
-            logger.warning(f"数据类型错误：{item}")
-            continue
-        pg_hash = get_sha256(item)
-        if pg_hash in sha256_set:
-            logger.warning(f"重复数据：{item}")
-            continue
-        sha256_set.add(pg_hash)
+    raw_data = []
+    for pg_hash, item in iter_raw_data():
         sha256_list.append(pg_hash)
         raw_data.append(item)
     logger.info(f"共读取到{len(raw_data)}条数据")
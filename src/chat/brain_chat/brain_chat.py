@@ -15,7 +15,7 @@ from src.chat.utils.timer_calculator import Timer
 from src.chat.brain_chat.brain_planner import BrainPlanner
 from src.chat.planner_actions.action_modifier import ActionModifier
 from src.chat.planner_actions.action_manager import ActionManager
-from src.chat.heart_flow.hfc_utils import CycleDetail
+from src.chat.heart_flow.hfc_utils import CycleDetail, NEW_MESSAGE_WAIT_TIMEOUT, new_message_notifier
 from src.express.expression_learner import expression_learner_manager
 from src.person_info.person_info import Person
 from src.plugin_system.base.component_types import EventType, ActionInfo
@@ -25,6 +25,7 @@ from src.memory_system.Memory_chest import global_memory_chest
 from src.chat.utils.chat_message_builder import (
     build_readable_messages_with_id,
     get_raw_msg_before_timestamp_with_chat,
+    get_raw_msg_by_timestamp_with_chat_async,
 )
 
 if TYPE_CHECKING:
@@ -158,13 +159,15 @@ class BrainChatting:
         )
 
     async def _loopbody(self):  # sourcery skip: hoist-if-from-if
-        recent_messages_list = message_api.get_messages_by_time_in_chat(
+        # 先清除通知标记再查询，查询之后到达的消息会重新置位通知
+        new_message_notifier.clear(self.stream_id)
+        recent_messages_list = await get_raw_msg_by_timestamp_with_chat_async(
             chat_id=self.stream_id,
-            start_time=self.last_read_time,
-            end_time=time.time(),
+            timestamp_start=self.last_read_time,
+            timestamp_end=time.time(),
             limit=20,
             limit_mode="latest",
-            filter_mai=True,
+            filter_bot=True,
             filter_command=True,
         )
 
@@ -173,8 +176,8 @@ class BrainChatting:
             await self._observe(recent_messages_list=recent_messages_list)
 
         else:
-            # Normal模式：消息数量不足，等待
-            await asyncio.sleep(0.2)
+            # Normal模式：消息数量不足，等待新消息通知（超时后兜底查询）
+            await new_message_notifier.wait(self.stream_id, timeout=NEW_MESSAGE_WAIT_TIMEOUT)
             return True
         return True
 
@@ -15,6 +15,7 @@ from rich.traceback import install
 
 from src.common.database.database_model import Emoji
 from src.common.database.database import db as peewee_db
+from src.common.database.db_executor import db_executor
 from src.common.logger import get_logger
 from src.config.config import global_config, model_config
 from src.chat.utils.utils_image import image_path_to_base64, get_image_manager
@@ -408,7 +409,11 @@ class EmojiManager:
             raise RuntimeError("EmojiManager not initialized")
 
     def record_usage(self, emoji_hash: str) -> None:
-        """记录表情使用次数"""
+        """记录表情使用次数，写入提交给数据库写线程，不等待完成"""
+        db_executor.submit_write(self._record_usage_sync, emoji_hash, call_site="EmojiManager.record_usage")
+
+    @staticmethod
+    def _record_usage_sync(emoji_hash: str) -> None:
         try:
             emoji_update = Emoji.get(Emoji.emoji_hash == emoji_hash)
             emoji_update.usage_count += 1
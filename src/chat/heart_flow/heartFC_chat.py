@@ -16,7 +16,7 @@ from src.chat.utils.timer_calculator import Timer
 from src.chat.planner_actions.planner import ActionPlanner
 from src.chat.planner_actions.action_modifier import ActionModifier
 from src.chat.planner_actions.action_manager import ActionManager
-from src.chat.heart_flow.hfc_utils import CycleDetail
+from src.chat.heart_flow.hfc_utils import CycleDetail, NEW_MESSAGE_WAIT_TIMEOUT, new_message_notifier
 from src.chat.heart_flow.hfc_utils import send_typing, stop_typing
 from src.express.expression_learner import expression_learner_manager
 from src.chat.frequency_control.frequency_control import frequency_control_manager
@@ -31,6 +31,7 @@ from src.memory_system.Memory_chest import global_memory_chest
 from src.chat.utils.chat_message_builder import (
     build_readable_messages_with_id,
     get_raw_msg_before_timestamp_with_chat,
+    get_raw_msg_by_timestamp_with_chat_async,
 )
 
 if TYPE_CHECKING:
@@ -59,6 +60,9 @@ install(extra_lines=3)
 
 # 注释：原来的动作修改超时常量已移除，因为改为顺序执行
 
+# 主动提问概率按该间隔（秒）为一次判定进行折算，与原先轮询节奏保持一致
+QUESTION_CHECK_INTERVAL = 0.3
+
 logger = get_logger("hfc")  # Logger Name Changed
 
 
@@ -108,7 +112,8 @@ class HeartFChatting:
         self.last_active_time = time.time() # 记录上一次非noreply时间
 
         self.questioned = False
-        
+        self.last_question_check_time = time.time()
+
 
     async def start(self):
         """检查是否需要启动主循环，如果未激活则启动。"""
@@ -173,14 +178,16 @@ class HeartFChatting:
             + (f"详情: {'; '.join(timer_strings)}" if timer_strings else "")
         )
 
-    async def _loopbody(self):  
-        recent_messages_list = message_api.get_messages_by_time_in_chat(
+    async def _loopbody(self):
+        # 先清除通知标记再查询，查询之后到达的消息会重新置位通知
+        new_message_notifier.clear(self.stream_id)
+        recent_messages_list = await get_raw_msg_by_timestamp_with_chat_async(
             chat_id=self.stream_id,
-            start_time=self.last_read_time,
-            end_time=time.time(),
+            timestamp_start=self.last_read_time,
+            timestamp_end=time.time(),
             limit=20,
             limit_mode="latest",
-            filter_mai=True,
+            filter_bot=True,
             filter_command=True,
         )
 
@@ -193,6 +200,13 @@ class HeartFChatting:
             question_probability = 0.00003
 
         question_probability = question_probability * global_config.chat.get_auto_chat_value(self.stream_id)
+
+        # 循环改为等待消息通知后，两次判定的间隔不再固定，按经过的时间折算概率
+        now = time.time()
+        check_count = max(now - self.last_question_check_time, 0) / QUESTION_CHECK_INTERVAL
+        self.last_question_check_time = now
+        if question_probability > 0:
+            question_probability = 1 - (1 - min(question_probability, 1.0)) ** check_count
         
         # print(f"{self.log_prefix}  questioned: {self.questioned},len: {len(global_conflict_tracker.get_questions_by_chat_id(self.stream_id))}")
         if question_probability > 0 and not self.questioned and len(global_conflict_tracker.get_questions_by_chat_id(self.stream_id)) == 0: #长久没有回复，可以试试主动发言，提问概率随着时间增加
@@ -263,7 +277,8 @@ class HeartFChatting:
                 await asyncio.sleep(10)
                 return True
         else:
-            await asyncio.sleep(0.2)
+            # 没有新消息时挂起，直到有新消息入库或兜底超时
+            await new_message_notifier.wait(self.stream_id, timeout=NEW_MESSAGE_WAIT_TIMEOUT)
             return True
         return True
 
@@ -283,6 +298,13 @@ class HeartFChatting:
                 selected_expressions=selected_expressions,
             )
 
+        loop_info = await self._store_reply(reply_text, action_message, thinking_id, actions)
+        return loop_info, reply_text, cycle_timers
+
+    async def _store_reply(
+        self, reply_text: str, action_message: "DatabaseMessages", thinking_id, actions
+    ) -> Dict[str, Any]:
+        """记录已发送的回复动作，返回循环信息"""
         # 获取 platform，如果不存在则从 chat_stream 获取，如果还是 None 则使用默认值
         platform = action_message.chat_info.platform
         if platform is None:
@@ -315,7 +337,7 @@ class HeartFChatting:
             },
         }
 
-        return loop_info, reply_text, cycle_timers
+        return loop_info
 
     async def _observe(
         self,  # interest_value: float = 0.0,
@@ -625,12 +647,8 @@ class HeartFChatting:
         }
 
 
-    async def _send_response(
-        self,
-        reply_set: "ReplySetModel",
-        message_data: "DatabaseMessages",
-        selected_expressions: Optional[List[int]] = None,
-    ) -> str:
+    def _need_quote_reply(self) -> bool:
+        """从思考到回复期间新消息较多时，使用引用回复"""
         new_message_count = message_api.count_new_messages(
             chat_id=self.chat_stream.stream_id, start_time=self.last_read_time, end_time=time.time()
         )
@@ -639,6 +657,15 @@ class HeartFChatting:
 
         if need_reply:
             logger.info(f"{self.log_prefix} 从思考到回复，共有{new_message_count}条新消息，使用引用回复")
+        return need_reply
+
+    async def _send_response(
+        self,
+        reply_set: "ReplySetModel",
+        message_data: "DatabaseMessages",
+        selected_expressions: Optional[List[int]] = None,
+    ) -> str:
+        need_reply = self._need_quote_reply()
 
         reply_text = ""
         first_replied = False
@@ -669,6 +696,47 @@ class HeartFChatting:
 
         return reply_text
 
+    async def _send_response_stream(
+        self,
+        segment_queue: "asyncio.Queue[Optional[str]]",
+        message_data: "DatabaseMessages",
+    ) -> str:
+        """流式回复：回复生成过程中每生成一条消息就立即发送，直到从队列中取到 None
+
+        与 _send_response 一致，第一条消息不模拟打字；之后每条消息的打字等待从上一条发出时算起，
+        等待模型生成这句话的时间计入打字等待。
+        某条消息发送失败时记录错误并继续发送后续消息，返回实际发出的内容。
+        """
+        reply_text = ""
+        typing_since: Optional[float] = None
+        while (data := await segment_queue.get()) is not None:
+            try:
+                if typing_since is None:
+                    sent = await send_api.text_to_stream(
+                        text=data,
+                        stream_id=self.chat_stream.stream_id,
+                        reply_message=message_data,
+                        set_reply=self._need_quote_reply(),
+                        typing=False,
+                    )
+                else:
+                    sent = await send_api.text_to_stream(
+                        text=data,
+                        stream_id=self.chat_stream.stream_id,
+                        reply_message=message_data,
+                        set_reply=False,
+                        typing=True,
+                        typing_since=typing_since,
+                    )
+            except Exception as e:
+                logger.error(f"{self.log_prefix} 流式回复发送消息失败: {e}")
+                sent = False
+            if sent:
+                typing_since = time.time()
+                reply_text += data
+
+        return reply_text
+
     async def _execute_action(
         self,
         action_planner_info: ActionPlannerInfo,
@@ -735,17 +803,41 @@ class HeartFChatting:
                         action_reasoning=reason,
                     )
 
-                    success, llm_response = await generator_api.generate_reply(
-                        chat_stream=self.chat_stream,
-                        reply_message=action_planner_info.action_message,
-                        available_actions=available_actions,
-                        chosen_actions=chosen_action_plan_infos,
-                        reply_reason=reason,
-                        enable_tool=global_config.tool.enable_tool,
-                        request_type="replyer",
-                        from_plugin=False,
-                        reply_time_point = action_planner_info.action_data.get("loop_start_time", time.time()),
-                    )
+                    # 流式回复：生成过程中每生成完一句就由发送任务立即发出
+                    segment_queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+                    stream_send_task: Optional[asyncio.Task[str]] = None
+                    if global_config.response_splitter.enable_stream_reply and action_planner_info.action_message:
+                        stream_send_task = asyncio.create_task(
+                            self._send_response_stream(segment_queue, action_planner_info.action_message)
+                        )
+                    try:
+                        success, llm_response = await generator_api.generate_reply(
+                            chat_stream=self.chat_stream,
+                            reply_message=action_planner_info.action_message,
+                            available_actions=available_actions,
+                            chosen_actions=chosen_action_plan_infos,
+                            reply_reason=reason,
+                            enable_tool=global_config.tool.enable_tool,
+                            request_type="replyer",
+                            from_plugin=False,
+                            reply_time_point = action_planner_info.action_data.get("loop_start_time", time.time()),
+                            reply_segment_callback=segment_queue.put_nowait if stream_send_task else None,
+                        )
+                    except BaseException:
+                        # 生成异常退出（含被取消）时不再发送后续消息，也不留下未等待的发送任务
+                        if stream_send_task:
+                            stream_send_task.cancel()
+                            await asyncio.gather(stream_send_task, return_exceptions=True)
+                        raise
+                    finally:
+                        segment_queue.put_nowait(None)
+
+                    reply_text = ""
+                    if stream_send_task:
+                        with Timer("回复发送", cycle_timers):
+                            reply_text = await stream_send_task
+                        # 已经发出的消息无法撤回：生成中途失败时同样记录已发出的部分
+                        success = bool(reply_text)
 
                     if not success or not llm_response or not llm_response.reply_set:
                         if action_planner_info.action_message:
@@ -757,16 +849,24 @@ class HeartFChatting:
                         return {"action_type": "reply", "success": False, "result": "回复生成失败", "loop_info": None}
 
 
-                    response_set = llm_response.reply_set
-                    selected_expressions = llm_response.selected_expressions
-                    loop_info, reply_text, _ = await self._send_and_store_reply(
-                        response_set=response_set,
-                        action_message=action_planner_info.action_message,  # type: ignore
-                        cycle_timers=cycle_timers,
-                        thinking_id=thinking_id,
-                        actions=chosen_action_plan_infos,
-                        selected_expressions=selected_expressions,
-                    )
+                    if stream_send_task:
+                        loop_info = await self._store_reply(
+                            reply_text,
+                            action_planner_info.action_message,  # type: ignore
+                            thinking_id,
+                            chosen_action_plan_infos,
+                        )
+                    else:
+                        response_set = llm_response.reply_set
+                        selected_expressions = llm_response.selected_expressions
+                        loop_info, reply_text, _ = await self._send_and_store_reply(
+                            response_set=response_set,
+                            action_message=action_planner_info.action_message,  # type: ignore
+                            cycle_timers=cycle_timers,
+                            thinking_id=thinking_id,
+                            actions=chosen_action_plan_infos,
+                            selected_expressions=selected_expressions,
+                        )
                     self.last_active_time = time.time()
                     return {
                         "action_type": "reply",
@@ -1,22 +1,30 @@
 import re
 import traceback
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, List
 
 from src.chat.message_receive.message import MessageRecv
 from src.chat.message_receive.storage import MessageStorage
 from src.chat.heart_flow.heartflow import heartflow
+from src.chat.heart_flow.hfc_utils import new_message_notifier
 from src.chat.utils.utils import is_mentioned_bot_in_message
 from src.chat.utils.chat_message_builder import replace_user_references
 from src.common.logger import get_logger
 from src.person_info.person_info import Person
 from src.common.database.database_model import Images
+from src.common.database.db_executor import db_read, db_write
 
 if TYPE_CHECKING:
     from src.chat.heart_flow.heartFC_chat import HeartFChatting
 
 logger = get_logger("chat")
 
+
+def _get_images_by_ids(image_ids: List[str]) -> Dict[str, Images]:
+    """按 image_id 批量查询图片记录"""
+    return {image.image_id: image for image in Images.select().where(Images.image_id.in_(image_ids))}
+
+
 class HeartFCMessageReceiver:
     """心流处理器，负责处理接收到的消息并计算兴趣度"""
 
@@ -50,6 +58,7 @@ class HeartFCMessageReceiver:
             message.reply_probability_boost = reply_probability_boost
 
             await self.storage.store_message(message, chat)
+            new_message_notifier.notify(chat.stream_id)
 
             await heartflow.get_or_create_heartflow_chat(chat.stream_id)  # type: ignore
 
@@ -63,8 +72,9 @@ class HeartFCMessageReceiver:
             # 创建替换后的文本
             processed_text = message.processed_plain_text
             if picid_list:
+                images = await db_read(_get_images_by_ids, picid_list)
                 for picid in picid_list:
-                    image = Images.get_or_none(Images.image_id == picid)
+                    image = images.get(picid)
                     if image and image.description:
                         # 将[picid:xxxx]替换成图片描述
                         processed_text = processed_text.replace(f"[picid:{picid}]", f"[图片：{image.description}]")
@@ -83,10 +93,12 @@ class HeartFCMessageReceiver:
 
             logger.info(f"[{mes_name}]{userinfo.user_nickname}:{processed_plain_text}")  # type: ignore
 
-            _ = Person.register_person(
+            _ = await db_write(
+                Person.register_person,
                 platform=message.message_info.platform,  # type: ignore
                 user_id=message.message_info.user_info.user_id,  # type: ignore
                 nickname=userinfo.user_nickname,  # type: ignore
+                call_site="Person.register_person",
             )
 
         except Exception as e:
@@ -1,3 +1,4 @@
+import asyncio
 import time
 from typing import Optional, Dict, Any
 
@@ -11,6 +12,9 @@ from src.common.message_repository import count_messages
 
 logger = get_logger(__name__)
 
+# 聊天循环在没有新消息通知时的兜底检查间隔（秒）
+NEW_MESSAGE_WAIT_TIMEOUT = 5.0
+
 
 class CycleDetail:
     """循环信息记录类"""
@@ -84,6 +88,51 @@ class CycleDetail:
         self.loop_action_info = loop_info["loop_action_info"]
 
 
+class NewMessageNotifier:
+    """按聊天流分发新消息到达通知
+
+    消息入库后由消息处理器调用 notify，聊天循环通过 wait 挂起直到有新消息，
+    从而不必持续轮询数据库；wait 的超时仅作为兜底检查。
+    """
+
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+
+    def _get_event(self, stream_id: str) -> asyncio.Event:
+        event = self._events.get(stream_id)
+        if event is None:
+            event = asyncio.Event()
+            self._events[stream_id] = event
+        return event
+
+    def notify(self, stream_id: str) -> None:
+        """通知指定聊天流有新消息到达"""
+        self._get_event(stream_id).set()
+
+    def clear(self, stream_id: str) -> None:
+        """清除通知标记，应在查询新消息之前调用，避免查询与等待之间到达的消息被漏掉"""
+        self._get_event(stream_id).clear()
+
+    async def wait(self, stream_id: str, timeout: float) -> bool:
+        """等待新消息通知
+
+        Args:
+            stream_id: 聊天流ID
+            timeout: 最长等待时间（秒），超时后返回以便调用方兜底查询
+
+        Returns:
+            bool: 是否收到了新消息通知
+        """
+        try:
+            await asyncio.wait_for(self._get_event(stream_id).wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+new_message_notifier = NewMessageNotifier()
+
+
 def get_recent_message_stats(minutes: float = 30, chat_id: Optional[str] = None) -> dict:
     """
     Args:
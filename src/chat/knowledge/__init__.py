@@ -56,8 +56,8 @@ def lpmm_start_up():  # sourcery skip: extract-duplicate-method
             # logger.warning("如果你是第一次导入知识，或者还未导入知识，请忽略此错误")
         logger.info("KG加载完成")
 
-        logger.info(f"KG节点数量：{len(kg_manager.graph.get_node_list())}")
-        logger.info(f"KG边数量：{len(kg_manager.graph.get_edge_list())}")
+        logger.info(f"KG节点数量：{kg_manager.num_nodes}")
+        logger.info(f"KG边数量：{kg_manager.num_edges}")
 
         # 数据比对：Embedding库与KG的段落hash集合
         for pg_hash in kg_manager.stored_paragraph_hashes:
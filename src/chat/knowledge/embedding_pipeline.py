@@ -0,0 +1,294 @@
+"""
+异步批量嵌入流水线
+
+导入知识时需要为成千上万条段落、实体、关系获取嵌入。这里在单个事件循环中完成全部请求：
+- 每个批次是一次多输入的嵌入请求，同时进行的请求数由信号量限制
+- 令牌桶限速，避免撞上服务商的请求速率上限
+- 批次失败后指数退避重试，重试耗尽后拆成单条请求，隔离个别无法嵌入的字符串
+- 结果与输入顺序一致
+- 每个成功的批次立即追加写入检查点文件，导入中断后重新运行会跳过已完成的部分
+"""
+
+import asyncio
+import json
+import os
+import random
+import struct
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from .global_logger import logger
+from .utils.hash import get_sha256
+from src.config.config import global_config, model_config
+
+RETRY_BACKOFF_BASE = 1.0
+"""首次重试前的等待时间（秒），之后每次翻倍"""
+
+RETRY_BACKOFF_MAX = 30.0
+"""单次重试等待时间上限（秒）"""
+
+_RECORD_HEADER = struct.Struct("<I")
+
+T = TypeVar("T")
+
+
+class AsyncRateLimiter:
+    """令牌桶限速器，rate 为每秒补充的令牌数，rate <= 0 表示不限速"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class EmbeddingCheckpoint:
+    """嵌入检查点文件
+
+    追加写入的二进制文件，每个成功的批次一条记录：
+    4 字节小端记录头长度 + JSON 记录头（模型名、维度、字符串hash列表）+ float32 向量数据。
+    进程在写入途中崩溃时，末尾不完整的记录会在读取时被丢弃。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _iter_records(self, with_data: bool = True) -> Iterator[Tuple[dict, bytes]]:
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            while True:
+                raw_len = f.read(_RECORD_HEADER.size)
+                if len(raw_len) < _RECORD_HEADER.size:
+                    return
+                (header_len,) = _RECORD_HEADER.unpack(raw_len)
+                raw_header = f.read(header_len)
+                if len(raw_header) < header_len:
+                    return
+                try:
+                    header = json.loads(raw_header)
+                except json.JSONDecodeError:
+                    return
+                data_len = len(header["hashes"]) * header["dim"] * 4
+                if not with_data:
+                    if f.tell() + data_len > size:
+                        return
+                    f.seek(data_len, os.SEEK_CUR)
+                    yield header, b""
+                    continue
+                data = f.read(data_len)
+                if len(data) < data_len:
+                    return
+                yield header, data
+
+    def load(self, model_names: Optional[List[str]] = None) -> Dict[str, List[float]]:
+        """读取检查点中的全部嵌入
+
+        Args:
+            model_names: 允许的模型名称，其他模型生成的记录会被忽略（嵌入模型变更后不能混用）
+        Returns:
+            Dict[str, List[float]]: 字符串hash -> 嵌入向量
+        """
+        if not self.exists():
+            return {}
+        result: Dict[str, List[float]] = {}
+        skipped = 0
+        for header, data in self._iter_records():
+            if model_names is not None and header.get("model") not in model_names:
+                skipped += len(header["hashes"])
+                continue
+            vectors = np.frombuffer(data, dtype="<f4").reshape(len(header["hashes"]), header["dim"])
+            for item_hash, vector in zip(header["hashes"], vectors, strict=True):
+                result[item_hash] = vector.tolist()
+        if skipped:
+            logger.warning(f"检查点 {self.path} 中有 {skipped} 条嵌入来自其他模型，已忽略")
+        return result
+
+    def append(self, model_name: str, items: List[Tuple[str, List[float]]]) -> None:
+        """追加一个批次的嵌入"""
+        if not items:
+            return
+        dim = len(items[0][1])
+        header = json.dumps({"model": model_name, "dim": dim, "hashes": [h for h, _ in items]}).encode("utf-8")
+        data = np.asarray([e for _, e in items], dtype="<f4").tobytes()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(_RECORD_HEADER.pack(len(header)) + header + data)
+
+    def hashes(self) -> List[str]:
+        """检查点中已完成的字符串hash（不读取向量数据）"""
+        if not self.exists():
+            return []
+        return [h for header, _ in self._iter_records(with_data=False) for h in header["hashes"]]
+
+    def remove(self) -> None:
+        if self.exists():
+            os.remove(self.path)
+
+
+class EmbeddingPipeline:
+    """批量嵌入流水线"""
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_concurrency: int,
+        requests_per_second: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        checkpoint: Optional[EmbeddingCheckpoint] = None,
+        request_type: str = "embedding",
+    ):
+        """
+        Args:
+            batch_size: 每次嵌入请求包含的字符串数
+            max_concurrency: 同时进行的请求数上限
+            requests_per_second: 每秒请求数上限，默认读取 lpmm_knowledge.embedding_requests_per_second
+            max_retries: 批次失败后的重试次数，默认读取 lpmm_knowledge.embedding_max_retries
+            checkpoint: 检查点文件，为 None 时不保存进度
+            request_type: 记录用量时使用的请求类型
+        """
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_second = (
+            requests_per_second
+            if requests_per_second is not None
+            else global_config.lpmm_knowledge.embedding_requests_per_second
+        )
+        self.max_retries = (
+            max_retries if max_retries is not None else global_config.lpmm_knowledge.embedding_max_retries
+        )
+        self.checkpoint = checkpoint
+        self.request_type = request_type
+
+    async def _request_batch(self, batch: List[str], limiter: AsyncRateLimiter) -> Tuple[List[List[float]], str]:
+        """发送一个批次的嵌入请求，失败时指数退避重试"""
+        from src.chat.utils.utils import get_embedding_request
+
+        llm = get_embedding_request(self.request_type)
+        attempt = 0
+        while True:
+            await limiter.acquire()
+            try:
+                return await llm.get_embeddings(batch)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2**attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                logger.warning(f"批量获取嵌入失败（第{attempt}次重试，{delay:.1f}秒后）：{e}")
+                await asyncio.sleep(delay)
+
+    async def _request_each(self, batch: List[str], limiter: AsyncRateLimiter) -> Tuple[List[List[float]], str]:
+        """逐条获取嵌入，单条失败时返回空向量"""
+        from src.chat.utils.utils import get_embedding_request
+
+        llm = get_embedding_request(self.request_type)
+        embeddings: List[List[float]] = []
+        model_name = ""
+        for s in batch:
+            await limiter.acquire()
+            try:
+                embedding, model_name = await llm.get_embedding(s)
+            except Exception as e:
+                logger.error(f"获取嵌入时发生异常: {s[:50]}, 错误: {e}")
+                embedding = []
+            embeddings.append(embedding or [])
+        return embeddings, model_name
+
+    async def embed(
+        self, strs: List[str], progress_callback: Optional[Callable[[int], None]] = None
+    ) -> List[Tuple[str, List[float]]]:
+        """获取一组字符串的嵌入
+
+        Args:
+            strs: 要获取嵌入的字符串列表
+            progress_callback: 进度回调函数，参数为本次完成的字符串数量
+        Returns:
+            List[Tuple[str, List[float]]]: 与输入顺序一致的(字符串, 嵌入向量)列表，获取失败的向量为空列表
+        """
+        if not strs:
+            return []
+
+        hashes = [get_sha256(s) for s in strs]
+        done: Dict[str, List[float]] = {}
+        if self.checkpoint is not None:
+            done = self.checkpoint.load(model_config.model_task_config.embedding.model_list)
+            done = {h: e for h, e in done.items() if len(e) == global_config.lpmm_knowledge.embedding_dimension}
+
+        # 相同字符串只请求一次
+        todo: Dict[str, str] = {}
+        for s, h in zip(strs, hashes, strict=True):
+            if h not in done and h not in todo:
+                todo[h] = s
+        occurrences = Counter(hashes)
+        resumed = sum(h in done for h in hashes)
+        if resumed:
+            logger.info(f"从检查点恢复 {resumed} 条嵌入，剩余 {len(strs) - resumed} 条")
+            if progress_callback:
+                progress_callback(resumed)
+
+        todo_items = list(todo.items())
+        batches = [todo_items[i : i + self.batch_size] for i in range(0, len(todo_items), self.batch_size)]
+        limiter = AsyncRateLimiter(self.requests_per_second, burst=self.max_concurrency)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_batch(batch: List[Tuple[str, str]]) -> None:
+            batch_strs = [s for _, s in batch]
+            async with semaphore:
+                try:
+                    embeddings, model_name = await self._request_batch(batch_strs, limiter)
+                except Exception as e:
+                    if len(batch) == 1:
+                        logger.error(f"获取嵌入失败: {batch_strs[0][:50]}, 错误: {e}")
+                        embeddings, model_name = [[]], ""
+                    else:
+                        logger.warning(f"批量获取嵌入重试耗尽，改为逐条获取: {e}")
+                        embeddings, model_name = await self._request_each(batch_strs, limiter)
+            succeeded = []
+            for (h, _), embedding in zip(batch, embeddings, strict=True):
+                if embedding:
+                    done[h] = embedding
+                    succeeded.append((h, embedding))
+            if self.checkpoint is not None and succeeded and model_name:
+                self.checkpoint.append(model_name, succeeded)
+            if progress_callback:
+                progress_callback(sum(occurrences[h] for h, _ in batch))
+
+        await asyncio.gather(*(run_batch(batch) for batch in batches))
+
+        return [(s, done.get(h, [])) for s, h in zip(strs, hashes, strict=True)]
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """在同步代码中运行协程
+
+    当前线程没有运行中的事件循环时直接运行；否则（例如在协程中调用了同步接口）在独立线程的事件循环中运行，
+    避免在已运行的事件循环中嵌套 run_until_complete。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-pipeline") as executor:
+        return executor.submit(asyncio.run, coro).result()
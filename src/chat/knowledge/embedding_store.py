@@ -1,17 +1,32 @@
-from dataclasses import dataclass
 import json
 import os
 import math
+import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List, Tuple
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import numpy as np
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 # import tqdm
 import faiss
 
+from .embedding_pipeline import EmbeddingCheckpoint, EmbeddingPipeline, run_sync
+from .faiss_index import (
+    RECALL_TEST_K,
+    IndexParams,
+    apply_search_params,
+    build_index,
+    evaluate_recall,
+    add_to_index,
+    needs_rebuild,
+    remove_from_index,
+    resolve_index_type,
+    search_index,
+)
 from .utils.hash import get_sha256
 from .global_logger import logger
 from rich.traceback import install
@@ -30,13 +45,13 @@ from src.config.config import global_config
 
 install(extra_lines=3)
 
-# 多线程embedding配置常量
-DEFAULT_MAX_WORKERS = 10  # 默认最大线程数
-DEFAULT_CHUNK_SIZE = 10  # 默认每个线程处理的数据块大小
+# 批量embedding配置常量
+DEFAULT_MAX_WORKERS = 10  # 默认最大并发请求数
+DEFAULT_CHUNK_SIZE = 32  # 默认每个嵌入请求包含的字符串数
 MIN_CHUNK_SIZE = 1  # 最小分块大小
 MAX_CHUNK_SIZE = 50  # 最大分块大小
-MIN_WORKERS = 1  # 最小线程数
-MAX_WORKERS = 20  # 最大线程数
+MIN_WORKERS = 1  # 最小并发请求数
+MAX_WORKERS = 20  # 最大并发请求数
 
 ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 EMBEDDING_DATA_DIR = os.path.join(ROOT_PATH, "data", "embedding")
@@ -60,6 +75,11 @@ EMBEDDING_TEST_STRINGS = [
     "我也在纠结晚饭，铁锅炒鸡听着就香！",
     "test你妈喵",
 ]
+PARQUET_BATCH_ROWS = 8192  # 嵌入库 parquet 文件的行组大小，也是加载时每批读取的行数
+MAX_SEGMENT_FILES = 16  # 分段文件达到该数量时合并回主文件
+MATRIX_GROWTH = 1.5  # 向量矩阵容量不足时按该倍数扩容
+TOMBSTONE_REBUILD_RATIO = 0.1  # 已删除的行超过存活行的该比例时，增量更新改为完整重建索引
+
 EMBEDDING_TEST_FILE = os.path.join(ROOT_PATH, "data", "embedding_model_test.json")
 EMBEDDING_SIM_THRESHOLD = 0.99
 
@@ -74,24 +94,222 @@ def cosine_similarity(a, b):
     return dot / (norm_a * norm_b)
 
 
-@dataclass
 class EmbeddingStoreItem:
-    """嵌入库中的项"""
+    """嵌入库中的项
+
+    从嵌入库中取出的项只是指向 EmbeddingColumns 中某一行的轻量视图，
+    embedding 为矩阵中该行的 float32 数组，str 在访问时才从 Arrow 字符串列中取出。
+    """
+
+    __slots__ = ("hash", "_columns", "_row", "_embedding", "_str")
 
     def __init__(self, item_hash: str, embedding: List[float], content: str):
         self.hash = item_hash
-        self.embedding = embedding
-        self.str = content
+        self._columns: Optional["EmbeddingColumns"] = None
+        self._row = -1
+        self._embedding = embedding
+        self._str = content
+
+    @classmethod
+    def _view(cls, columns: "EmbeddingColumns", row: int, item_hash: str) -> "EmbeddingStoreItem":
+        item = cls.__new__(cls)
+        item.hash = item_hash
+        item._columns = columns
+        item._row = row
+        return item
+
+    @property
+    def embedding(self) -> Union[np.ndarray, List[float]]:
+        if self._columns is None:
+            return self._embedding
+        return self._columns.matrix[self._row]
+
+    @property
+    def str(self) -> str:
+        if self._columns is None:
+            return self._str
+        return self._columns.get_str(self._row)
 
     def to_dict(self) -> dict:
         """转为dict"""
         return {
             "hash": self.hash,
-            "embedding": self.embedding,
+            "embedding": list(self.embedding),
             "str": self.str,
         }
 
 
+class EmbeddingColumns(Mapping):
+    """列式存储的嵌入数据，以 hash -> EmbeddingStoreItem 的映射形式访问
+
+    - 所有向量保存在一个连续的 float32 矩阵中，行号即插入顺序，也是该行在 Faiss 索引中的 id
+    - hash -> 行号的索引
+    - 从文件加载的字符串保留为 Arrow 字符串列，访问时才转换为 Python 字符串
+    - 删除只记录墓碑（行号），行号不会因删除而改变，直到 compact() 重新编号
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.hashes: List[str] = []
+        """所有行的hash（包括已删除的行），下标即行号"""
+        self.index: Dict[str, int] = {}
+        self.deleted: Set[int] = set()
+        """已删除（墓碑）的行号"""
+        self._buffer = np.empty((0, dim), dtype=np.float32)
+        """矩阵的底层缓冲区，容量按倍数增长，追加时不必每次复制整个矩阵"""
+        self._matrix = self._buffer
+        self._pending_vectors: List[np.ndarray] = []
+        """新插入但尚未合并进矩阵的向量"""
+        self._arrow_strs: Optional[pa.Array] = None
+        self._extra_strs: List[str] = []
+        """从文件加载之后新插入的字符串"""
+        self._str_overrides: Dict[int, str] = {}
+
+        self.saved_rows = 0
+        """已保存到文件的行数，之后的行在下次保存时写入新的分段文件"""
+        self.rewrite_needed = False
+        """已保存的行被修改过，下次保存需要重写全部数据"""
+        self.changed_rows: Set[int] = set()
+        """自上次同步索引以来被覆盖写入的行"""
+        self.removed_rows: Set[int] = set()
+        """自上次同步索引以来被删除的行"""
+
+    @classmethod
+    def from_parquet(cls, paths: List[str], dim: int) -> "EmbeddingColumns":
+        """从若干个 (hash, embedding, str) 三列的 parquet 文件依次加载
+
+        按批读取并直接写入预先分配的矩阵，不逐行转换 Python 对象，峰值内存约为矩阵大小加一个批次。
+        """
+        parquet_files = [pq.ParquetFile(path, memory_map=True) for path in paths]
+        num_rows = sum(parquet_file.metadata.num_rows for parquet_file in parquet_files)
+        columns = cls(dim)
+        matrix = np.empty((num_rows, dim), dtype=np.float32)
+        str_chunks: List[pa.Array] = []
+        row = 0
+        for parquet_file in parquet_files:
+            for batch in parquet_file.iter_batches(batch_size=PARQUET_BATCH_ROWS, columns=["hash", "embedding", "str"]):
+                embedding_col = batch.column("embedding")
+                lengths = pc.list_value_length(embedding_col)
+                if pc.min(lengths).as_py() != dim or pc.max(lengths).as_py() != dim:
+                    raise ValueError(f"嵌入向量维度与配置的 embedding_dimension={dim} 不一致")
+                # 旧版本保存的是 list<double>，在 Arrow 中转换为 float32 后再转为 numpy
+                values = pc.cast(embedding_col.flatten(), pa.float32()).to_numpy(zero_copy_only=False)
+                matrix[row : row + batch.num_rows] = values.reshape(batch.num_rows, dim)
+                columns.hashes.extend(batch.column("hash").to_pylist())
+                str_chunks.append(pc.cast(batch.column("str"), pa.string()))
+                row += batch.num_rows
+        columns._buffer = matrix
+        columns._matrix = matrix[:row]
+        columns.index = dict(zip(columns.hashes, range(len(columns.hashes)), strict=True))
+        if len(columns.index) < row:
+            # 合并分段时中断可能留下重复的行，以最后写入的为准
+            columns.deleted = {r for r, h in enumerate(columns.hashes) if columns.index[h] != r}
+        columns._arrow_strs = pa.concat_arrays(str_chunks) if str_chunks else None
+        columns.saved_rows = row
+        return columns
+
+    def _str_array(self, start: int = 0) -> pa.Array:
+        """第 start 行起的字符串列"""
+        if self._str_overrides:
+            return pa.array([self.get_str(row) for row in range(start, len(self.hashes))], type=pa.string())
+        loaded = len(self._arrow_strs) if self._arrow_strs is not None else 0
+        parts = []
+        if start < loaded:
+            parts.append(self._arrow_strs.slice(start))  # type: ignore
+        parts.append(pa.array(self._extra_strs[max(0, start - loaded) :], type=pa.string()))
+        return pa.concat_arrays(parts)
+
+    def to_arrow(self, start: int = 0) -> pa.Table:
+        """第 start 行起的数据转为 (hash, embedding, str) 三列的 Arrow 表，embedding 列为 list<float32>"""
+        matrix = self.matrix[start:]
+        flat = pa.array(matrix.reshape(-1), type=pa.float32())
+        offsets = pa.array(np.arange(0, matrix.size + 1, self.dim, dtype=np.int32))
+        return pa.table(
+            {
+                "hash": pa.array(self.hashes[start:], type=pa.string()),
+                "embedding": pa.ListArray.from_arrays(offsets, flat),
+                "str": self._str_array(start),
+            }
+        )
+
+    def compact(self) -> None:
+        """丢弃已删除的行并重新编号（行号改变后索引需要重建）"""
+        if not self.deleted:
+            return
+        live_rows = self.live_rows()
+        strs = self._str_array().take(pa.array(live_rows))
+        self._buffer = self._matrix = np.ascontiguousarray(self.matrix[live_rows])
+        self.hashes = [self.hashes[row] for row in live_rows]
+        self.index = dict(zip(self.hashes, range(len(self.hashes)), strict=True))
+        self._arrow_strs = strs
+        self._extra_strs = []
+        self._str_overrides = {}
+        self.deleted = set()
+        self.changed_rows = set()
+        self.removed_rows = set()
+        self.rewrite_needed = True
+
+    def live_rows(self) -> np.ndarray:
+        """未删除的行号（升序）"""
+        return np.fromiter(sorted(self.index.values()), dtype=np.int64, count=len(self.index))
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """全部行（包括已删除的行）的向量组成的 (行数, 维度) float32 矩阵"""
+        if self._pending_vectors:
+            rows = len(self._matrix)
+            needed = rows + len(self._pending_vectors)
+            if needed > len(self._buffer):
+                buffer = np.empty((max(needed, int(len(self._buffer) * MATRIX_GROWTH)), self.dim), dtype=np.float32)
+                buffer[:rows] = self._matrix
+                self._buffer = buffer
+            self._buffer[rows:needed] = np.vstack(self._pending_vectors)
+            self._matrix = self._buffer[:needed]
+            self._pending_vectors = []
+        return self._matrix
+
+    def get_str(self, row: int) -> str:
+        if row in self._str_overrides:
+            return self._str_overrides[row]
+        loaded = len(self._arrow_strs) if self._arrow_strs is not None else 0
+        if row < loaded:
+            return self._arrow_strs[row].as_py()  # type: ignore
+        return self._extra_strs[row - loaded]
+
+    def __getitem__(self, item_hash: str) -> EmbeddingStoreItem:
+        return EmbeddingStoreItem._view(self, self.index[item_hash], item_hash)
+
+    def __setitem__(self, item_hash: str, item: EmbeddingStoreItem) -> None:
+        vector = np.asarray(item.embedding, dtype=np.float32).reshape(1, self.dim)
+        if item_hash in self.index:
+            row = self.index[item_hash]
+            self.matrix[row] = vector[0]
+            self._str_overrides[row] = item.str
+            self.changed_rows.add(row)
+            if row < self.saved_rows:
+                self.rewrite_needed = True
+            return
+        self.index[item_hash] = len(self.hashes)
+        self.hashes.append(item_hash)
+        self._pending_vectors.append(vector)
+        self._extra_strs.append(item.str)
+
+    def __delitem__(self, item_hash: str) -> None:
+        row = self.index.pop(item_hash)
+        self.deleted.add(row)
+        self.removed_rows.add(row)
+        self.changed_rows.discard(row)
+
+    def __contains__(self, item_hash: object) -> bool:
+        return item_hash in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
 class EmbeddingStore:
     def __init__(
         self,
@@ -104,9 +322,13 @@ class EmbeddingStore:
         self.dir = dir_path
         self.embedding_file_path = f"{dir_path}/{namespace}.parquet"
         self.index_file_path = f"{dir_path}/{namespace}.index"
+        self.index_params_file_path = f"{dir_path}/{namespace}.index.json"
+        self.deleted_file_path = f"{dir_path}/{namespace}.deleted.npy"
+        # 旧版本保存的 idx2hash 映射，现在索引 id 即嵌入库行号，不再需要
         self.idx2hash_file_path = dir_path + "/" + namespace + "_i2h.json"
+        self.checkpoint_file_path = f"{dir_path}/{namespace}.ckpt"
 
-        # 多线程配置参数验证和设置
+        # 批量嵌入配置参数验证和设置
         self.max_workers = max(MIN_WORKERS, min(MAX_WORKERS, max_workers))
         self.chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, chunk_size))
 
@@ -120,10 +342,12 @@ class EmbeddingStore:
                 f"chunk_size 已从 {chunk_size} 调整为 {self.chunk_size} (范围: {MIN_CHUNK_SIZE}-{MAX_CHUNK_SIZE})"
             )
 
-        self.store = {}
+        self.store = EmbeddingColumns(global_config.lpmm_knowledge.embedding_dimension)
+        # 加载、重建或增量更新索引、删除项时递增，QAManager 据此使查询缓存失效
+        self.version = 0
 
         self.faiss_index = None
-        self.idx2hash = None
+        self.index_params: Optional[IndexParams] = None
 
     def _get_embedding(self, s: str) -> List[float]:
         """获取字符串的嵌入向量，使用完全同步的方式避免事件循环问题"""
@@ -132,11 +356,9 @@ class EmbeddingStore:
         asyncio.set_event_loop(loop)
 
         try:
-            # 创建新的LLMRequest实例
-            from src.llm_models.utils_model import LLMRequest
-            from src.config.config import model_config
+            from src.chat.utils.utils import get_embedding_request
 
-            llm = LLMRequest(model_set=model_config.model_task_config.embedding, request_type="embedding")
+            llm = get_embedding_request()
 
             # 使用新的事件循环运行异步方法
             embedding, _ = loop.run_until_complete(llm.get_embedding(s))
@@ -157,15 +379,22 @@ class EmbeddingStore:
             except Exception:
                 pass
 
-    def _get_embeddings_batch_threaded(
-        self, strs: List[str], chunk_size: int = 10, max_workers: int = 10, progress_callback=None
-    ) -> List[Tuple[str, List[float]]]:
-        """使用多线程批量获取嵌入向量
+    def _make_pipeline(self, strs_count: int, checkpoint: bool = False) -> EmbeddingPipeline:
+        """按实例配置创建嵌入流水线，数据量较少时相应减少并发"""
+        batch_size = min(self.chunk_size, strs_count)
+        max_concurrency = min(self.max_workers, max(MIN_WORKERS, math.ceil(strs_count / batch_size)))
+        logger.debug(f"嵌入流水线参数: batch_size={batch_size}, max_concurrency={max_concurrency}")
+        return EmbeddingPipeline(
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+            checkpoint=EmbeddingCheckpoint(self.checkpoint_file_path) if checkpoint else None,
+        )
+
+    def _get_embeddings_batch(self, strs: List[str], progress_callback=None) -> List[Tuple[str, List[float]]]:
+        """批量获取嵌入向量（同步接口）
 
         Args:
             strs: 要获取嵌入的字符串列表
-            chunk_size: 每个线程处理的数据块大小
-            max_workers: 最大线程数
             progress_callback: 进度回调函数，接收一个参数表示完成的数量
 
         Returns:
@@ -173,111 +402,16 @@ class EmbeddingStore:
         """
         if not strs:
             return []
-
-        # 分块
-        chunks = []
-        for i in range(0, len(strs), chunk_size):
-            chunk = strs[i : i + chunk_size]
-            chunks.append((i, chunk))  # 保存起始索引以维持顺序
-
-        # 结果存储，使用字典按索引存储以保证顺序
-        results = {}
-
-        def process_chunk(chunk_data):
-            """处理单个数据块的函数"""
-            start_idx, chunk_strs = chunk_data
-            chunk_results = []
-
-            # 为每个线程创建独立的LLMRequest实例
-            from src.llm_models.utils_model import LLMRequest
-            from src.config.config import model_config
-
-            try:
-                # 创建线程专用的LLM实例
-                llm = LLMRequest(model_set=model_config.model_task_config.embedding, request_type="embedding")
-
-                for i, s in enumerate(chunk_strs):
-                    try:
-                        # 在线程中创建独立的事件循环
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        try:
-                            embedding = loop.run_until_complete(llm.get_embedding(s))
-                        finally:
-                            loop.close()
-
-                        if embedding and len(embedding) > 0:
-                            chunk_results.append((start_idx + i, s, embedding[0]))  # embedding[0] 是实际的向量
-                        else:
-                            logger.error(f"获取嵌入失败: {s}")
-                            chunk_results.append((start_idx + i, s, []))
-
-                        # 每完成一个嵌入立即更新进度
-                        if progress_callback:
-                            progress_callback(1)
-
-                    except Exception as e:
-                        logger.error(f"获取嵌入时发生异常: {s}, 错误: {e}")
-                        chunk_results.append((start_idx + i, s, []))
-
-                        # 即使失败也要更新进度
-                        if progress_callback:
-                            progress_callback(1)
-
-            except Exception as e:
-                logger.error(f"创建LLM实例失败: {e}")
-                # 如果创建LLM实例失败，返回空结果
-                for i, s in enumerate(chunk_strs):
-                    chunk_results.append((start_idx + i, s, []))
-                    # 即使失败也要更新进度
-                    if progress_callback:
-                        progress_callback(1)
-
-            return chunk_results
-
-        # 使用线程池处理
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_chunk = {executor.submit(process_chunk, chunk): chunk for chunk in chunks}
-
-            # 收集结果（进度已在process_chunk中实时更新）
-            for future in as_completed(future_to_chunk):
-                try:
-                    chunk_results = future.result()
-                    for idx, s, embedding in chunk_results:
-                        results[idx] = (s, embedding)
-                except Exception as e:
-                    chunk = future_to_chunk[future]
-                    logger.error(f"处理数据块时发生异常: {chunk}, 错误: {e}")
-                    # 为失败的块添加空结果
-                    start_idx, chunk_strs = chunk
-                    for i, s in enumerate(chunk_strs):
-                        results[start_idx + i] = (s, [])
-
-        # 按原始顺序返回结果
-        ordered_results = []
-        for i in range(len(strs)):
-            if i in results:
-                ordered_results.append(results[i])
-            else:
-                # 防止遗漏
-                ordered_results.append((strs[i], []))
-
-        return ordered_results
+        return run_sync(self._make_pipeline(len(strs)).embed(strs, progress_callback))
 
     def get_test_file_path(self):
         return EMBEDDING_TEST_FILE
 
     def save_embedding_test_vectors(self):
-        """保存测试字符串的嵌入到本地（使用多线程优化）"""
+        """保存测试字符串的嵌入到本地"""
         logger.info("开始保存测试字符串的嵌入向量...")
 
-        # 使用多线程批量获取测试字符串的嵌入
-        embedding_results = self._get_embeddings_batch_threaded(
-            EMBEDDING_TEST_STRINGS,
-            chunk_size=min(self.chunk_size, len(EMBEDDING_TEST_STRINGS)),
-            max_workers=min(self.max_workers, len(EMBEDDING_TEST_STRINGS)),
-        )
+        embedding_results = self._get_embeddings_batch(EMBEDDING_TEST_STRINGS)
 
         # 构建测试向量字典
         test_vectors = {}
@@ -303,7 +437,7 @@ class EmbeddingStore:
             return json.load(f)
 
     def check_embedding_model_consistency(self):
-        """校验当前模型与本地嵌入模型是否一致（使用多线程优化）"""
+        """校验当前模型与本地嵌入模型是否一致"""
         local_vectors = self.load_embedding_test_vectors()
         if local_vectors is None:
             logger.warning("未检测到本地嵌入模型测试文件，将保存当前模型的测试嵌入。")
@@ -319,12 +453,7 @@ class EmbeddingStore:
 
         logger.info("开始检验嵌入模型一致性...")
 
-        # 使用多线程批量获取当前模型的嵌入
-        embedding_results = self._get_embeddings_batch_threaded(
-            EMBEDDING_TEST_STRINGS,
-            chunk_size=min(self.chunk_size, len(EMBEDDING_TEST_STRINGS)),
-            max_workers=min(self.max_workers, len(EMBEDDING_TEST_STRINGS)),
-        )
+        embedding_results = self._get_embeddings_batch(EMBEDDING_TEST_STRINGS)
 
         # 检查一致性
         for idx, (s, new_emb) in enumerate(embedding_results):
@@ -342,7 +471,15 @@ class EmbeddingStore:
         return True
 
     def batch_insert_strs(self, strs: List[str], times: int) -> None:
-        """向库中存入字符串（使用多线程优化）"""
+        """向库中存入字符串（同步接口，见 batch_insert_strs_async）"""
+        run_sync(self.batch_insert_strs_async(strs, times))
+
+    async def batch_insert_strs_async(self, strs: List[str], times: int) -> None:
+        """向库中存入字符串
+
+        嵌入请求由 EmbeddingPipeline 在当前事件循环中并发发送，每完成一个批次写入一次检查点，
+        中断后重新导入会从检查点继续，检查点在嵌入库保存到文件后删除。
+        """
         if not strs:
             return
 
@@ -380,65 +517,91 @@ class EmbeddingStore:
             if already_processed > 0:
                 progress.update(task, advance=already_processed)
 
-            if new_strs:
-                # 使用实例配置的参数，智能调整分块和线程数
-                optimal_chunk_size = max(
-                    MIN_CHUNK_SIZE,
-                    min(
-                        self.chunk_size, len(new_strs) // self.max_workers if self.max_workers > 0 else self.chunk_size
-                    ),
-                )
-                optimal_max_workers = min(
-                    self.max_workers,
-                    max(MIN_WORKERS, len(new_strs) // optimal_chunk_size if optimal_chunk_size > 0 else 1),
-                )
-
-                logger.debug(f"使用多线程处理: chunk_size={optimal_chunk_size}, max_workers={optimal_max_workers}")
-
-                # 定义进度更新回调函数
-                def update_progress(count):
-                    progress.update(task, advance=count)
-
-                # 批量获取嵌入，并实时更新进度
-                embedding_results = self._get_embeddings_batch_threaded(
-                    new_strs,
-                    chunk_size=optimal_chunk_size,
-                    max_workers=optimal_max_workers,
-                    progress_callback=update_progress,
-                )
-
-                # 存入结果（不再需要在这里更新进度，因为已经在回调中更新了）
-                for s, embedding in embedding_results:
-                    item_hash = self.namespace + "-" + get_sha256(s)
-                    if embedding:  # 只有成功获取到嵌入才存入
-                        self.store[item_hash] = EmbeddingStoreItem(item_hash, embedding, s)
-                    else:
-                        logger.warning(f"跳过存储失败的嵌入: {s[:50]}...")
+            # 定义进度更新回调函数
+            def update_progress(count):
+                progress.update(task, advance=count)
+
+            pipeline = self._make_pipeline(len(new_strs), checkpoint=True)
+            embedding_results = await pipeline.embed(new_strs, progress_callback=update_progress)
+
+            for s, embedding in embedding_results:
+                item_hash = self.namespace + "-" + get_sha256(s)
+                if embedding:  # 只有成功获取到嵌入才存入
+                    self.store[item_hash] = EmbeddingStoreItem(item_hash, embedding, s)
+                else:
+                    logger.warning(f"跳过存储失败的嵌入: {s[:50]}...")
+
+    def _segment_file_path(self, segment: int) -> str:
+        return f"{self.dir}/{self.namespace}.seg{segment:04d}.parquet"
+
+    def _segment_file_paths(self) -> List[str]:
+        """已存在的分段文件，按写入顺序排列"""
+        paths = []
+        segment = 1
+        while os.path.exists(path := self._segment_file_path(segment)):
+            paths.append(path)
+            segment += 1
+        return paths
+
+    @staticmethod
+    def _write_parquet(table: pa.Table, path: str) -> None:
+        # 先写临时文件再替换，避免写入中断后留下损坏的文件
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, row_group_size=PARQUET_BATCH_ROWS)
+        os.replace(tmp_path, path)
 
     def save_to_file(self) -> None:
-        """保存到文件"""
-        data = []
+        """保存到文件
+
+        嵌入库由一个主文件和若干分段文件组成：新增的行追加写入一个新的分段文件，
+        只有已保存的行被修改、或分段文件过多时才重写主文件并合并分段。
+        """
         logger.info(f"正在保存{self.namespace}嵌入库到文件{self.embedding_file_path}")
-        for item in self.store.values():
-            data.append(item.to_dict())
-        data_frame = pd.DataFrame(data)
 
         if not os.path.exists(self.dir):
             os.makedirs(self.dir, exist_ok=True)
-        if not os.path.exists(self.embedding_file_path):
-            open(self.embedding_file_path, "w").close()
 
-        data_frame.to_parquet(self.embedding_file_path, engine="pyarrow", index=False)
+        segment_paths = self._segment_file_paths()
+        if (
+            self.store.rewrite_needed
+            or not os.path.exists(self.embedding_file_path)
+            or len(segment_paths) >= MAX_SEGMENT_FILES
+        ):
+            self._write_parquet(self.store.to_arrow(), self.embedding_file_path)
+            for path in segment_paths:
+                os.remove(path)
+        elif self.store.saved_rows < len(self.store.hashes):
+            new_segment = self._segment_file_path(len(segment_paths) + 1)
+            self._write_parquet(self.store.to_arrow(self.store.saved_rows), new_segment)
+            logger.debug(f"新增{len(self.store.hashes) - self.store.saved_rows}行写入分段文件{new_segment}")
+        self.store.saved_rows = len(self.store.hashes)
+        self.store.rewrite_needed = False
+
+        if self.store.deleted:
+            np.save(self.deleted_file_path, np.fromiter(self.store.deleted, dtype=np.int64))
+        elif os.path.exists(self.deleted_file_path):
+            os.remove(self.deleted_file_path)
         logger.info(f"{self.namespace}嵌入库保存成功")
+        self._discard_checkpoint()
 
-        if self.faiss_index is not None and self.idx2hash is not None:
+        if self.faiss_index is not None and self.index_params is not None:
             logger.info(f"正在保存{self.namespace}嵌入库的FaissIndex到文件{self.index_file_path}")
-            faiss.write_index(self.faiss_index, self.index_file_path)
+            faiss.write_index(self.faiss_index, self.index_file_path + ".tmp")
+            os.replace(self.index_file_path + ".tmp", self.index_file_path)
+            self.index_params.save(self.index_params_file_path)
             logger.info(f"{self.namespace}嵌入库的FaissIndex保存成功")
-            logger.info(f"正在保存{self.namespace}嵌入库的idx2hash映射到文件{self.idx2hash_file_path}")
-            with open(self.idx2hash_file_path, "w", encoding="utf-8") as f:
-                f.write(json.dumps(self.idx2hash, ensure_ascii=False, indent=4))
-            logger.info(f"{self.namespace}嵌入库的idx2hash映射保存成功")
+            if os.path.exists(self.idx2hash_file_path):
+                os.remove(self.idx2hash_file_path)
+
+    def _discard_checkpoint(self) -> None:
+        """嵌入库已包含检查点中的全部嵌入时删除检查点"""
+        checkpoint = EmbeddingCheckpoint(self.checkpoint_file_path)
+        if not checkpoint.exists():
+            return
+        if all(f"{self.namespace}-{h}" in self.store for h in checkpoint.hashes()):
+            checkpoint.remove()
+        else:
+            logger.info(f"{self.namespace}嵌入库检查点中仍有未存入的嵌入，保留检查点文件")
 
     def load_from_file(self) -> None:
         """从文件中加载"""
@@ -446,42 +609,31 @@ class EmbeddingStore:
             raise Exception(f"文件{self.embedding_file_path}不存在")
         logger.info("正在加载嵌入库...")
         logger.debug(f"正在从文件{self.embedding_file_path}中加载{self.namespace}嵌入库")
-        data_frame = pd.read_parquet(self.embedding_file_path, engine="pyarrow")
-        total = len(data_frame)
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            MofNCompleteColumn(),
-            "•",
-            TimeElapsedColumn(),
-            "<",
-            TimeRemainingColumn(),
-            transient=False,
-        ) as progress:
-            task = progress.add_task("加载嵌入库", total=total)
-            for _, row in data_frame.iterrows():
-                self.store[row["hash"]] = EmbeddingStoreItem(row["hash"], row["embedding"], row["str"])
-                progress.update(task, advance=1)
-        logger.info(f"{self.namespace}嵌入库加载成功")
+        start_time = time.perf_counter()
+        self.store = EmbeddingColumns.from_parquet(
+            [self.embedding_file_path, *self._segment_file_paths()], global_config.lpmm_knowledge.embedding_dimension
+        )
+        if os.path.exists(self.deleted_file_path):
+            for row in np.load(self.deleted_file_path).tolist():
+                if row < len(self.store.hashes) and self.store.hashes[row] in self.store.index:
+                    del self.store[self.store.hashes[row]]
+            self.store.removed_rows = set()
+        # 解码 parquet 的临时缓冲区归还给系统
+        pa.default_memory_pool().release_unused()
+        self.version += 1
+        logger.info(
+            f"{self.namespace}嵌入库加载成功，共{len(self.store)}项，耗时{time.perf_counter() - start_time:.2f}秒"
+        )
 
         try:
             if os.path.exists(self.index_file_path):
                 logger.info(f"正在加载{self.namespace}嵌入库的FaissIndex...")
                 logger.debug(f"正在从文件{self.index_file_path}中加载{self.namespace}嵌入库的FaissIndex")
                 self.faiss_index = faiss.read_index(self.index_file_path)
+                self._load_index_params()
                 logger.info(f"{self.namespace}嵌入库的FaissIndex加载成功")
             else:
                 raise Exception(f"文件{self.index_file_path}不存在")
-            if os.path.exists(self.idx2hash_file_path):
-                logger.info(f"正在加载{self.namespace}嵌入库的idx2hash映射...")
-                logger.debug(f"正在从文件{self.idx2hash_file_path}中加载{self.namespace}嵌入库的idx2hash映射")
-                with open(self.idx2hash_file_path, "r") as f:
-                    self.idx2hash = json.load(f)
-                logger.info(f"{self.namespace}嵌入库的idx2hash映射加载成功")
-            else:
-                raise Exception(f"文件{self.idx2hash_file_path}不存在")
         except Exception as e:
             logger.error(f"加载{self.namespace}嵌入库的FaissIndex时发生错误：{e}")
             logger.warning("正在重建Faiss索引")
@@ -489,20 +641,112 @@ class EmbeddingStore:
             logger.info(f"{self.namespace}嵌入库的FaissIndex重建成功")
             self.save_to_file()
 
+    def _load_index_params(self) -> None:
+        """读取索引参数并应用当前配置的搜索参数，索引与嵌入库不匹配时抛出异常以触发重建"""
+        lpmm_config = global_config.lpmm_knowledge
+        params = IndexParams.load(self.index_params_file_path)
+        if params is None or params.indexed_rows < 0:
+            raise Exception("旧版本的索引（id 不是嵌入库行号）")
+        if params.indexed_rows > len(self.store.hashes):
+            raise Exception(f"索引包含{params.indexed_rows}行，但嵌入库只有{len(self.store.hashes)}行")
+        expected_type = resolve_index_type(lpmm_config.faiss_index_type, len(self.store), self.store.dim)
+        if params.index_type != expected_type:
+            raise Exception(f"索引类型由 {params.index_type} 变更为 {expected_type}")
+        apply_search_params(self.faiss_index, params, lpmm_config.faiss_nprobe, lpmm_config.faiss_hnsw_ef_search)
+        self.index_params = params
+
+    def _normalized_rows(self, rows: np.ndarray) -> np.ndarray:
+        embeddings = np.ascontiguousarray(self.store.matrix[rows])
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
     def build_faiss_index(self) -> None:
-        """重新构建Faiss索引，以余弦相似度为度量"""
-        # 获取所有的embedding
-        array = []
-        self.idx2hash = dict()
-        for key in self.store:
-            array.append(self.store[key].embedding)
-            self.idx2hash[str(len(array) - 1)] = key
-        embeddings = np.array(array, dtype=np.float32)
+        """重新构建Faiss索引，以余弦相似度为度量，索引类型由 lpmm_knowledge.faiss_index_type 决定
+
+        重建前会丢弃已删除的行（行号随之重新编号）。
+        """
+        lpmm_config = global_config.lpmm_knowledge
+        self.store.compact()
+        ids = self.store.live_rows()
         # L2归一化
-        faiss.normalize_L2(embeddings)
+        embeddings = self._normalized_rows(ids)
         # 构建索引
-        self.faiss_index = faiss.IndexFlatIP(global_config.lpmm_knowledge.embedding_dimension)
-        self.faiss_index.add(embeddings)
+        self.faiss_index, self.index_params = build_index(
+            embeddings, ids, lpmm_config.faiss_index_type, lpmm_config.faiss_nprobe, lpmm_config.faiss_hnsw_ef_search
+        )
+        params = self.index_params
+        params.indexed_rows = len(self.store.hashes)
+        self.store.changed_rows = set()
+        self.store.removed_rows = set()
+        self.version += 1
+        logger.info(
+            f"{self.namespace}嵌入库构建 {params.index_type} 索引完成，共{params.ntotal}项，耗时{params.build_time:.2f}秒"
+        )
+        if params.index_type != "flat" and lpmm_config.faiss_recall_test_queries > 0:
+            params.recall_at_k = evaluate_recall(
+                self.faiss_index, params, embeddings, ids, self.store.matrix, lpmm_config.faiss_recall_test_queries
+            )
+            logger.info(
+                f"{self.namespace}嵌入库 {params.index_type} 索引 recall@{RECALL_TEST_K}={params.recall_at_k:.3f}"
+                f"（nprobe={params.nprobe}, ef_search={params.ef_search}）"
+            )
+
+    def update_faiss_index(self) -> None:
+        """把上次同步以来新增、修改、删除的行增量同步到Faiss索引
+
+        只处理变化的行；索引不存在、类型应当改变、IVF 数据量增长过多或墓碑过多时改为完整重建。
+        """
+        lpmm_config = global_config.lpmm_knowledge
+        params = self.index_params
+        expected_type = resolve_index_type(lpmm_config.faiss_index_type, len(self.store), self.store.dim)
+        if (
+            self.faiss_index is None
+            or params is None
+            or needs_rebuild(params, expected_type, len(self.store))
+            or len(self.store.deleted) > len(self.store) * TOMBSTONE_REBUILD_RATIO
+        ):
+            self.build_faiss_index()
+            return
+
+        changed = np.fromiter(sorted(r for r in self.store.changed_rows if r < params.indexed_rows), dtype=np.int64)
+        removed = np.fromiter(sorted(r for r in self.store.removed_rows if r < params.indexed_rows), dtype=np.int64)
+        # 不支持移除的索引（hnsw）中，已删除的行留在索引里，搜索时按墓碑过滤；被覆盖的行则只能重建
+        if not remove_from_index(self.faiss_index, params, np.concatenate([changed, removed])) and len(changed):
+            self.build_faiss_index()
+            return
+
+        new_rows = np.arange(params.indexed_rows, len(self.store.hashes), dtype=np.int64)
+        new_rows = new_rows[~np.isin(new_rows, np.fromiter(self.store.deleted, dtype=np.int64))]
+        rows = np.concatenate([changed, new_rows])
+        add_to_index(self.faiss_index, params, self._normalized_rows(rows), rows)
+        params.indexed_rows = len(self.store.hashes)
+        self.store.changed_rows = set()
+        self.store.removed_rows = set()
+        self.version += 1
+        logger.info(
+            f"{self.namespace}嵌入库索引增量更新：新增{len(new_rows)}项，更新{len(changed)}项，删除{len(removed)}项"
+        )
+
+    def _indexed_tombstones(self) -> int:
+        """仍留在索引中的已删除行数：hnsw 不支持移除，其他索引只有尚未同步的删除"""
+        indexed_rows = self.index_params.indexed_rows
+        unindexed_live = sum(1 for row in range(indexed_rows, len(self.store.hashes)) if row not in self.store.deleted)
+        return max(0, self.faiss_index.ntotal - (len(self.store) - unindexed_live))
+
+    def delete_items(self, item_hashes: List[str]) -> int:
+        """删除嵌入库中的项（记录墓碑，调用 update_faiss_index 后同步到索引）
+
+        Returns:
+            int: 实际删除的数量
+        """
+        deleted = 0
+        for item_hash in item_hashes:
+            if item_hash in self.store:
+                del self.store[item_hash]
+                deleted += 1
+        if deleted:
+            self.version += 1
+        return deleted
 
     def search_top_k(self, query: List[float], k: int) -> List[Tuple[str, float]]:
         """搜索最相似的k个项，以余弦相似度为度量
@@ -512,53 +756,76 @@ class EmbeddingStore:
         Returns:
             result: 最相似的k个项的(hash, 余弦相似度)列表
         """
-        if self.faiss_index is None:
-            logger.debug("FaissIndex尚未构建,返回None")
-            return []
-        if self.idx2hash is None:
-            logger.warning("idx2hash尚未构建,返回None")
-            return []
+        return self.search_top_k_batch(np.asarray([query], dtype=np.float32), k)[0]
 
-        # L2归一化
-        faiss.normalize_L2(np.array([query], dtype=np.float32))
-        # 搜索
-        distances, indices = self.faiss_index.search(np.array([query]), k)
-        # 整理结果
-        indices = list(indices.flatten())
-        distances = list(distances.flatten())
-        result = [
-            (self.idx2hash[str(int(idx))], float(sim))
-            for (idx, sim) in zip(indices, distances, strict=False)
-            if idx in range(len(self.idx2hash))
-        ]
+    def search_top_k_batch(self, queries: np.ndarray, k: int) -> List[List[Tuple[str, float]]]:
+        """一次Faiss调用搜索多个查询，以余弦相似度为度量
 
-        return result
+        Args:
+            queries: (查询数, 维度) 的查询矩阵，无需归一化
+            k: 每个查询返回的最相似的k个项
+        Returns:
+            result: 与查询一一对应的(hash, 余弦相似度)列表
+        """
+        if self.faiss_index is None or self.index_params is None:
+            logger.debug("FaissIndex尚未构建,返回None")
+            return [[] for _ in range(len(queries))]
+
+        # L2归一化（复制一份，不修改调用方的数组）
+        query_array = np.array(queries, dtype=np.float32, ndmin=2)
+        faiss.normalize_L2(query_array)
+        # 索引中可能还留有已删除的行，按其数量多取一些候选再过滤
+        deleted = self.store.deleted
+        distances, indices = search_index(
+            self.faiss_index, self.index_params, query_array, k + self._indexed_tombstones(), self.store.matrix
+        )
+        # 整理结果（索引 id 即嵌入库行号）
+        hashes = self.store.hashes
+        results = []
+        for row_indices, row_distances in zip(indices.tolist(), distances.tolist(), strict=True):
+            result = [
+                (hashes[idx], float(sim))
+                for idx, sim in zip(row_indices, row_distances, strict=True)
+                if 0 <= idx < len(hashes) and idx not in deleted
+            ]
+            results.append(result[:k])
+        return results
+
+    async def search_top_k_async(self, query: List[float], k: int) -> List[Tuple[str, float]]:
+        """在线程池中执行 search_top_k（Faiss 搜索时释放 GIL），不阻塞事件循环"""
+        return await asyncio.to_thread(self.search_top_k, query, k)
 
 
 class EmbeddingManager:
-    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        dir_path: str = EMBEDDING_DATA_DIR_STR,
+    ):
         """
         初始化EmbeddingManager
 
         Args:
-            max_workers: 最大线程数
-            chunk_size: 每个线程处理的数据块大小
+            max_workers: 批量嵌入时的最大并发请求数
+            chunk_size: 每个嵌入请求包含的字符串数
+            dir_path: 嵌入库文件所在目录
         """
         self.paragraphs_embedding_store = EmbeddingStore(
             "paragraph",  # type: ignore
-            EMBEDDING_DATA_DIR_STR,
+            dir_path,
             max_workers=max_workers,
             chunk_size=chunk_size,
         )
         self.entities_embedding_store = EmbeddingStore(
             "entity",  # type: ignore
-            EMBEDDING_DATA_DIR_STR,
+            dir_path,
             max_workers=max_workers,
             chunk_size=chunk_size,
         )
         self.relation_embedding_store = EmbeddingStore(
             "relation",  # type: ignore
-            EMBEDDING_DATA_DIR_STR,
+            dir_path,
             max_workers=max_workers,
             chunk_size=chunk_size,
         )
@@ -568,26 +835,26 @@ class EmbeddingManager:
         """对所有嵌入库做模型一致性校验"""
         return self.paragraphs_embedding_store.check_embedding_model_consistency()
 
-    def _store_pg_into_embedding(self, raw_paragraphs: Dict[str, str]):
+    async def _store_pg_into_embedding(self, raw_paragraphs: Dict[str, str]):
         """将段落编码存入Embedding库"""
-        self.paragraphs_embedding_store.batch_insert_strs(list(raw_paragraphs.values()), times=1)
+        await self.paragraphs_embedding_store.batch_insert_strs_async(list(raw_paragraphs.values()), times=1)
 
-    def _store_ent_into_embedding(self, triple_list_data: Dict[str, List[List[str]]]):
+    async def _store_ent_into_embedding(self, triple_list_data: Dict[str, List[List[str]]]):
         """将实体编码存入Embedding库"""
         entities = set()
         for triple_list in triple_list_data.values():
             for triple in triple_list:
                 entities.add(triple[0])
                 entities.add(triple[2])
-        self.entities_embedding_store.batch_insert_strs(list(entities), times=2)
+        await self.entities_embedding_store.batch_insert_strs_async(list(entities), times=2)
 
-    def _store_rel_into_embedding(self, triple_list_data: Dict[str, List[List[str]]]):
+    async def _store_rel_into_embedding(self, triple_list_data: Dict[str, List[List[str]]]):
         """将关系编码存入Embedding库"""
         graph_triples = []  # a list of unique relation triple (in tuple) from all chunks
         for triples in triple_list_data.values():
             graph_triples.extend([tuple(t) for t in triples])
         graph_triples = list(set(graph_triples))
-        self.relation_embedding_store.batch_insert_strs([str(triple) for triple in graph_triples], times=3)
+        await self.relation_embedding_store.batch_insert_strs_async([str(triple) for triple in graph_triples], times=3)
 
     def load_from_file(self):
         """从文件加载"""
@@ -602,13 +869,23 @@ class EmbeddingManager:
         raw_paragraphs: Dict[str, str],
         triple_list_data: Dict[str, List[List[str]]],
     ):
-        if not self.check_all_embedding_model_consistency():
-            raise Exception("嵌入模型与本地存储不一致，请检查模型设置或清空嵌入库后重试。")
+        """存储新的数据集（同步接口，见 store_new_data_set_async）"""
+        run_sync(self.store_new_data_set_async(raw_paragraphs, triple_list_data))
+
+    async def store_new_data_set_async(
+        self,
+        raw_paragraphs: Dict[str, str],
+        triple_list_data: Dict[str, List[List[str]]],
+    ):
         """存储新的数据集"""
-        self._store_pg_into_embedding(raw_paragraphs)
-        self._store_ent_into_embedding(triple_list_data)
-        self._store_rel_into_embedding(triple_list_data)
-        self.stored_pg_hashes.update(raw_paragraphs.keys())
+        if not await asyncio.to_thread(self.check_all_embedding_model_consistency):
+            raise Exception("嵌入模型与本地存储不一致，请检查模型设置或清空嵌入库后重试。")
+        await self._store_pg_into_embedding(raw_paragraphs)
+        await self._store_ent_into_embedding(triple_list_data)
+        await self._store_rel_into_embedding(triple_list_data)
+        # 与加载时一致，记录带命名空间前缀的键
+        namespace = self.paragraphs_embedding_store.namespace
+        self.stored_pg_hashes.update(f"{namespace}-{pg_hash}" for pg_hash in raw_paragraphs)
 
     def save_to_file(self):
         """保存到文件"""
@@ -616,8 +893,23 @@ class EmbeddingManager:
         self.entities_embedding_store.save_to_file()
         self.relation_embedding_store.save_to_file()
 
+    @property
+    def version(self) -> Tuple[int, int, int]:
+        """三个嵌入库的版本号，任一嵌入库变化后改变"""
+        return (
+            self.paragraphs_embedding_store.version,
+            self.entities_embedding_store.version,
+            self.relation_embedding_store.version,
+        )
+
+    def update_faiss_index(self):
+        """增量更新Faiss索引（请在添加新数据后调用）"""
+        self.paragraphs_embedding_store.update_faiss_index()
+        self.entities_embedding_store.update_faiss_index()
+        self.relation_embedding_store.update_faiss_index()
+
     def rebuild_faiss_index(self):
-        """重建Faiss索引（请在添加新数据后调用）"""
+        """完整重建Faiss索引"""
         self.paragraphs_embedding_store.build_faiss_index()
         self.entities_embedding_store.build_faiss_index()
         self.relation_embedding_store.build_faiss_index()
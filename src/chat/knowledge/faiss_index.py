@@ -0,0 +1,246 @@
+"""
+Faiss 向量索引的构建与参数管理
+
+嵌入库默认使用精确的 IndexFlatIP（暴力扫描），数据量大时可以换用近似索引：
+- flat: 精确搜索，适合小规模数据
+- ivf_flat: 倒排索引，搜索时只扫描 nprobe 个聚类
+- hnsw: 图索引，无需训练，召回率高、内存占用略大
+- ivf_pq: 倒排 + 乘积量化，索引内的向量被压缩存储，搜索时多取候选并用原始向量重排
+
+auto 模式按向量数量自动选择。近似索引构建后会以精确搜索为基准做一次 recall@k 自检，
+构建参数与自检结果保存在 .index 文件旁的 .index.json 中。
+
+索引中向量的 id 是它在嵌入库中的行号（int64，追加写入后保持不变），
+因此新增数据只需 add_with_ids，删除时按 id 移除（hnsw 不支持移除，由调用方在搜索结果中过滤）。
+"""
+
+import json
+import os
+import time
+
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from .global_logger import logger
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+AUTO_FLAT_MAX = 50_000
+"""auto 模式下不超过该数量时使用 flat"""
+
+AUTO_HNSW_MAX = 1_000_000
+"""auto 模式下不超过该数量时使用 hnsw，更多时使用 ivf_pq"""
+
+TRAIN_POINTS_PER_CENTROID = 64
+"""IVF 训练时每个聚类中心使用的样本数"""
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+PQ_NBITS = 8
+PQ_SUB_DIM = 16
+"""IVF-PQ 每个子量化器负责的维度数"""
+
+PQ_RERANK_FACTOR = 4
+"""IVF-PQ 搜索时取 k 的多少倍候选，再用原始向量重新计算相似度并排序"""
+
+RECALL_TEST_K = 10
+
+IVF_REBUILD_GROWTH = 2.0
+"""IVF 索引的数据量增长到训练时的多少倍后，增量更新改为重建（聚类中心需要重新训练）"""
+
+
+@dataclass
+class IndexParams:
+    """索引参数，与索引文件一起保存"""
+
+    index_type: str
+    dim: int
+    ntotal: int = 0
+    nlist: int = 0
+    nprobe: int = 0
+    hnsw_m: int = 0
+    ef_search: int = 0
+    pq_m: int = 0
+    recall_at_k: Optional[float] = None
+    """构建时以精确搜索为基准测得的 recall@RECALL_TEST_K，flat 索引为 None"""
+    build_time: float = 0.0
+    built_rows: int = 0
+    """构建（训练）索引时的向量数量"""
+    indexed_rows: int = -1
+    """嵌入库中行号小于该值的行都已加入索引；-1 表示旧版本的索引（id 不是行号），需要重建"""
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=4)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IndexParams"]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except Exception as e:
+            logger.warning(f"读取索引参数文件{path}失败：{e}")
+            return None
+
+
+def resolve_index_type(index_type: str, ntotal: int, dim: int) -> str:
+    """将配置的索引类型解析为实际使用的类型，数据量不足以训练时退回更简单的索引"""
+    if index_type == "auto":
+        if ntotal <= AUTO_FLAT_MAX:
+            return "flat"
+        return "hnsw" if ntotal <= AUTO_HNSW_MAX else "ivf_pq"
+    if index_type not in INDEX_TYPES:
+        logger.warning(f"未知的索引类型 {index_type}，使用 flat")
+        return "flat"
+    if index_type == "ivf_pq" and (ntotal < (1 << PQ_NBITS) * TRAIN_POINTS_PER_CENTROID or dim % PQ_SUB_DIM):
+        logger.warning(f"向量数量({ntotal})或维度({dim})不适合 ivf_pq，改用 ivf_flat")
+        index_type = "ivf_flat"
+    if index_type == "ivf_flat" and ntotal < TRAIN_POINTS_PER_CENTROID * 4:
+        logger.warning(f"向量数量({ntotal})过少，无法训练 ivf 索引，改用 flat")
+        index_type = "flat"
+    return index_type
+
+
+def _nlist_for(ntotal: int) -> int:
+    # 常用经验值 4*sqrt(N)，同时保证每个聚类有足够的训练样本
+    return max(1, min(int(4 * np.sqrt(ntotal)), ntotal // TRAIN_POINTS_PER_CENTROID))
+
+
+def build_index(
+    embeddings: np.ndarray, ids: np.ndarray, index_type: str, nprobe: int, ef_search: int
+) -> tuple[faiss.Index, IndexParams]:
+    """构建索引
+
+    Args:
+        embeddings: 已做 L2 归一化的 (N, dim) float32 矩阵
+        ids: 每个向量的 int64 id
+        index_type: 配置的索引类型（可以为 auto）
+        nprobe: IVF 索引搜索时扫描的聚类数
+        ef_search: HNSW 索引搜索时的候选队列长度
+    """
+    ntotal, dim = embeddings.shape
+    resolved = resolve_index_type(index_type, ntotal, dim)
+    params = IndexParams(index_type=resolved, dim=dim, ntotal=ntotal, built_rows=ntotal)
+    start_time = time.perf_counter()
+
+    # flat 与 hnsw 本身不支持自定义 id，外面包一层 IndexIDMap
+    if resolved == "flat":
+        index = faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+    elif resolved == "hnsw":
+        hnsw_index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw_index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index = faiss.IndexIDMap(hnsw_index)
+        params.hnsw_m = HNSW_M
+    else:
+        params.nlist = _nlist_for(ntotal)
+        quantizer = faiss.IndexFlatIP(dim)
+        if resolved == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, params.nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            params.pq_m = dim // PQ_SUB_DIM
+            index = faiss.IndexIVFPQ(quantizer, dim, params.nlist, params.pq_m, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        # 在随机样本上训练聚类中心（及乘积量化码本）
+        train_size = min(ntotal, max(params.nlist, 1 << PQ_NBITS) * TRAIN_POINTS_PER_CENTROID)
+        sample = embeddings[np.random.default_rng(0).choice(ntotal, train_size, replace=False)]
+        index.train(sample)
+
+    if ntotal:
+        index.add_with_ids(embeddings, ids.astype(np.int64))
+    apply_search_params(index, params, nprobe, ef_search)
+    params.build_time = time.perf_counter() - start_time
+    return index, params
+
+
+def apply_search_params(index: faiss.Index, params: IndexParams, nprobe: int, ef_search: int) -> None:
+    """设置搜索参数（可以在不重建索引的情况下修改）"""
+    if params.index_type in ("ivf_flat", "ivf_pq"):
+        params.nprobe = max(1, min(nprobe, params.nlist))
+        faiss.extract_index_ivf(index).nprobe = params.nprobe
+    elif params.index_type == "hnsw":
+        params.ef_search = max(ef_search, RECALL_TEST_K)
+        faiss.downcast_index(faiss.downcast_index(index).index).hnsw.efSearch = params.ef_search
+
+
+def add_to_index(index: faiss.Index, params: IndexParams, embeddings: np.ndarray, ids: np.ndarray) -> None:
+    """向索引追加已做 L2 归一化的向量"""
+    if len(ids):
+        index.add_with_ids(embeddings, ids.astype(np.int64))
+    params.ntotal = index.ntotal
+
+
+def remove_from_index(index: faiss.Index, params: IndexParams, ids: np.ndarray) -> bool:
+    """从索引中移除向量，索引类型不支持移除（hnsw）时返回 False"""
+    if params.index_type == "hnsw":
+        return False
+    if len(ids):
+        index.remove_ids(ids.astype(np.int64))
+    params.ntotal = index.ntotal
+    return True
+
+
+def needs_rebuild(params: IndexParams, expected_type: str, live_rows: int) -> bool:
+    """增量更新是否不再合适：索引类型应当改变，或 IVF 索引的数据量已远超训练时"""
+    if params.indexed_rows < 0 or params.index_type != expected_type:
+        return True
+    return params.index_type in ("ivf_flat", "ivf_pq") and live_rows > params.built_rows * IVF_REBUILD_GROWTH
+
+
+def search_index(
+    index: faiss.Index, params: IndexParams, queries: np.ndarray, k: int, vectors: Optional[np.ndarray] = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """搜索索引，返回 (相似度, 行号)，与 faiss 的 search 相同
+
+    Args:
+        queries: 已做 L2 归一化的查询矩阵
+        vectors: 原始（可未归一化）向量矩阵，提供时 ivf_pq 索引会用它重新计算候选的精确余弦相似度
+    """
+    if params.index_type != "ivf_pq" or vectors is None:
+        return index.search(queries, k)
+    _, candidates = index.search(queries, k * PQ_RERANK_FACTOR)
+    sims = np.full(candidates.shape, -np.inf, dtype=np.float32)
+    for row, ids in enumerate(candidates):
+        valid = ids >= 0
+        cand = vectors[ids[valid]]
+        norms = np.linalg.norm(cand, axis=1)
+        norms[norms == 0] = 1.0
+        sims[row, valid] = cand @ queries[row] / norms
+    order = np.argsort(-sims, axis=1)[:, :k]
+    top_ids = np.take_along_axis(candidates, order, axis=1)
+    top_sims = np.take_along_axis(sims, order, axis=1)
+    top_ids[~np.isfinite(top_sims)] = -1
+    return top_sims, top_ids
+
+
+def evaluate_recall(
+    index: faiss.Index,
+    params: IndexParams,
+    embeddings: np.ndarray,
+    ids: np.ndarray,
+    vectors: np.ndarray,
+    num_queries: int,
+    k: int = RECALL_TEST_K,
+) -> float:
+    """以精确内积搜索为基准，随机抽取库中向量作为查询，计算索引的 recall@k
+
+    Args:
+        embeddings: 构建索引时使用的已归一化向量
+        ids: embeddings 每一行对应的 id
+        vectors: 按 id 索引的原始向量矩阵（ivf_pq 重排使用）
+    """
+    ntotal = embeddings.shape[0]
+    k = min(k, ntotal)
+    if ntotal == 0 or num_queries <= 0:
+        return 1.0
+    queries = embeddings[np.random.default_rng(1).choice(ntotal, min(num_queries, ntotal), replace=False)]
+    exact = faiss.IndexFlatIP(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth_pos = exact.search(queries, k)
+    truth = ids[truth_pos]
+    _, approx = search_index(index, params, queries, k, vectors)
+    hits = sum(len(set(t) & set(a)) for t, a in zip(truth.tolist(), approx.tolist(), strict=True))
+    return hits / (len(queries) * k)
@@ -0,0 +1,108 @@
+"""
+异步信息提取流水线
+
+每个段落需要两次串行的LLM请求（实体提取 -> RDF三元组提取）。这里在单个事件循环中处理全部段落：
+- 同时处理的段落数有上限，段落从迭代器中按需读取，提取结果交给回调后立即释放，内存占用与语料规模无关
+- 不同段落的两个步骤互相独立：一个段落在等待三元组提取时，其他段落可以进行实体提取
+- 并发请求数按API提供商限制：两个步骤使用相同提供商的模型时共用同一个并发上限
+"""
+
+import asyncio
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .global_logger import logger
+from .ie_process import info_extract_from_str_async
+from src.config.api_ada_configs import TaskConfig
+from src.config.config import model_config
+from src.llm_models.utils_model import LLMRequest
+
+IN_FLIGHT_PER_WORKER = 2
+"""同时处理的段落数 = 并发请求上限 * IN_FLIGHT_PER_WORKER，保证两个步骤都有段落可处理"""
+
+
+def _provider_key(task_config: TaskConfig) -> Tuple[str, ...]:
+    """任务使用的模型所属的API提供商（任务可能在多个提供商的模型间切换，按提供商集合分组）"""
+    return tuple(sorted({model_config.get_model_info(name).api_provider for name in task_config.model_list}))
+
+
+class InfoExtractionPipeline:
+    """信息提取流水线"""
+
+    def __init__(
+        self,
+        ner_task: TaskConfig,
+        rdf_task: TaskConfig,
+        max_concurrency_per_provider: int,
+    ):
+        """
+        Args:
+            ner_task: 实体提取的模型任务配置
+            rdf_task: RDF三元组提取的模型任务配置
+            max_concurrency_per_provider: 每组API提供商同时进行的请求数上限
+        """
+        self.ner_llm = LLMRequest(model_set=ner_task, request_type="lpmm.entity_extract")
+        self.rdf_llm = LLMRequest(model_set=rdf_task, request_type="lpmm.rdf_build")
+        self.max_concurrency = max(1, max_concurrency_per_provider)
+        self.ner_provider = _provider_key(ner_task)
+        self.rdf_provider = _provider_key(rdf_task)
+
+    async def run(
+        self,
+        paragraphs: Iterable[Tuple[str, str]],
+        on_result: Callable[[Dict], None],
+        on_failure: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        """提取全部段落
+
+        Args:
+            paragraphs: (段落hash, 段落原文) 的迭代器，按需读取
+            on_result: 每个段落提取成功后调用，参数为 OpenIE 格式的文档
+            on_failure: 段落提取失败（重试耗尽）后调用，参数为段落hash
+        """
+        semaphores: Dict[Tuple[str, ...], asyncio.Semaphore] = {}
+        ner_semaphore = semaphores.setdefault(self.ner_provider, asyncio.Semaphore(self.max_concurrency))
+        rdf_semaphore = semaphores.setdefault(self.rdf_provider, asyncio.Semaphore(self.max_concurrency))
+        if len(semaphores) > 1:
+            logger.info(
+                f"实体提取（{', '.join(self.ner_provider)}）与三元组提取（{', '.join(self.rdf_provider)}）"
+                f"使用不同的API提供商，各自最多{self.max_concurrency}个并发请求"
+            )
+        in_flight = asyncio.Semaphore(self.max_concurrency * len(semaphores) * IN_FLIGHT_PER_WORKER)
+        tasks: set[asyncio.Task] = set()
+
+        async def process(pg_hash: str, paragraph: str) -> None:
+            try:
+                entity_list, rdf_triple_list = await info_extract_from_str_async(
+                    self.ner_llm, self.rdf_llm, paragraph, ner_semaphore, rdf_semaphore
+                )
+                if entity_list is None or rdf_triple_list is None:
+                    if on_failure:
+                        on_failure(pg_hash)
+                    return
+                on_result(
+                    {
+                        "idx": pg_hash,
+                        "passage": paragraph,
+                        "extracted_entities": entity_list,
+                        "extracted_triples": rdf_triple_list,
+                    }
+                )
+            finally:
+                in_flight.release()
+
+        try:
+            for pg_hash, paragraph in paragraphs:
+                await in_flight.acquire()
+                task = asyncio.create_task(process(pg_hash, paragraph))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            # 中断时取消仍在进行的请求，已交给回调的结果不受影响
+            pending: List[asyncio.Task] = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
@@ -1,14 +1,19 @@
 import asyncio
 import json
-import time
-from typing import List, Union
+from typing import Awaitable, Callable, List, Optional, TypeVar, Union
 
 from .global_logger import logger
 from . import prompt_template
 from . import INVALID_ENTITY
+from .embedding_pipeline import run_sync
 from src.llm_models.utils_model import LLMRequest
 from json_repair import repair_json
 
+IE_MAX_ATTEMPTS = 3  # 每个提取步骤的最大尝试次数
+IE_RETRY_INTERVAL = 5  # 提取失败后重试前的等待时间（秒）
+
+T = TypeVar("T")
+
 
 def _extract_json_from_text(text: str):
     # sourcery skip: assign-if-exp, extract-method
@@ -46,20 +51,11 @@ def _extract_json_from_text(text: str):
         return []
 
 
-def _entity_extract(llm_req: LLMRequest, paragraph: str) -> List[str]:
+async def _entity_extract(llm_req: LLMRequest, paragraph: str) -> List[str]:
     # sourcery skip: reintroduce-else, swap-if-else-branches, use-named-expression
     """对段落进行实体提取，返回提取出的实体列表（JSON格式）"""
     entity_extract_context = prompt_template.build_entity_extract_context(paragraph)
-
-    # 使用 asyncio.run 来运行异步方法
-    try:
-        # 如果当前已有事件循环在运行，使用它
-        loop = asyncio.get_running_loop()
-        future = asyncio.run_coroutine_threadsafe(llm_req.generate_response_async(entity_extract_context), loop)
-        response, _ = future.result()
-    except RuntimeError:
-        # 如果没有运行中的事件循环，直接使用 asyncio.run
-        response, _ = asyncio.run(llm_req.generate_response_async(entity_extract_context))
+    response, _ = await llm_req.generate_response_async(entity_extract_context)
 
     # 添加调试日志
     logger.debug(f"LLM返回的原始响应: {response}")
@@ -92,21 +88,12 @@ def _entity_extract(llm_req: LLMRequest, paragraph: str) -> List[str]:
     return entity_extract_result
 
 
-def _rdf_triple_extract(llm_req: LLMRequest, paragraph: str, entities: list) -> List[List[str]]:
+async def _rdf_triple_extract(llm_req: LLMRequest, paragraph: str, entities: list) -> List[List[str]]:
     """对段落进行实体提取，返回提取出的实体列表（JSON格式）"""
     rdf_extract_context = prompt_template.build_rdf_triple_extract_context(
         paragraph, entities=json.dumps(entities, ensure_ascii=False)
     )
-
-    # 使用 asyncio.run 来运行异步方法
-    try:
-        # 如果当前已有事件循环在运行，使用它
-        loop = asyncio.get_running_loop()
-        future = asyncio.run_coroutine_threadsafe(llm_req.generate_response_async(rdf_extract_context), loop)
-        response, _ = future.result()
-    except RuntimeError:
-        # 如果没有运行中的事件循环，直接使用 asyncio.run
-        response, _ = asyncio.run(llm_req.generate_response_async(rdf_extract_context))
+    response, _ = await llm_req.generate_response_async(rdf_extract_context)
 
     # 添加调试日志
     logger.debug(f"RDF LLM返回的原始响应: {response}")
@@ -139,37 +126,62 @@ def _rdf_triple_extract(llm_req: LLMRequest, paragraph: str, entities: list) ->
     return rdf_triple_result
 
 
-def info_extract_from_str(
-    llm_client_for_ner: LLMRequest, llm_client_for_rdf: LLMRequest, paragraph: str
-) -> Union[tuple[None, None], tuple[list[str], list[list[str]]]]:
-    try_count = 0
-    while True:
-        try:
-            entity_extract_result = _entity_extract(llm_client_for_ner, paragraph)
-            break
-        except Exception as e:
-            logger.warning(f"实体提取失败，错误信息：{e}")
-            try_count += 1
-            if try_count < 3:
-                logger.warning("将于5秒后重试")
-                time.sleep(5)
-            else:
-                logger.error("实体提取失败，已达最大重试次数")
-                return None, None
-
-    try_count = 0
-    while True:
+async def _run_with_retry(
+    step_name: str, func: Callable[[], Awaitable[T]], semaphore: Optional[asyncio.Semaphore]
+) -> Optional[T]:
+    """执行一个提取步骤，失败时重试；只在请求期间占用信号量，等待重试时不占用"""
+    for attempt in range(1, IE_MAX_ATTEMPTS + 1):
         try:
-            rdf_triple_extract_result = _rdf_triple_extract(llm_client_for_rdf, paragraph, entity_extract_result)
-            break
+            if semaphore is None:
+                return await func()
+            async with semaphore:
+                return await func()
         except Exception as e:
-            logger.warning(f"实体提取失败，错误信息：{e}")
-            try_count += 1
-            if try_count < 3:
-                logger.warning("将于5秒后重试")
-                time.sleep(5)
-            else:
-                logger.error("实体提取失败，已达最大重试次数")
-                return None, None
+            logger.warning(f"{step_name}失败，错误信息：{e}")
+            if attempt < IE_MAX_ATTEMPTS:
+                logger.warning(f"将于{IE_RETRY_INTERVAL}秒后重试")
+                await asyncio.sleep(IE_RETRY_INTERVAL)
+    logger.error(f"{step_name}失败，已达最大重试次数")
+    return None
+
+
+async def info_extract_from_str_async(
+    llm_client_for_ner: LLMRequest,
+    llm_client_for_rdf: LLMRequest,
+    paragraph: str,
+    ner_semaphore: Optional[asyncio.Semaphore] = None,
+    rdf_semaphore: Optional[asyncio.Semaphore] = None,
+) -> Union[tuple[None, None], tuple[list[str], list[list[str]]]]:
+    """对段落依次进行实体提取与RDF三元组提取
+
+    Args:
+        llm_client_for_ner: 实体提取模型
+        llm_client_for_rdf: RDF三元组提取模型
+        paragraph: 段落原文
+        ner_semaphore: 实体提取请求占用的信号量，用于限制并发数
+        rdf_semaphore: RDF三元组提取请求占用的信号量
+    Returns:
+        (实体列表, 三元组列表)，任一步骤重试耗尽时返回 (None, None)
+    """
+    entity_extract_result = await _run_with_retry(
+        "实体提取", lambda: _entity_extract(llm_client_for_ner, paragraph), ner_semaphore
+    )
+    if entity_extract_result is None:
+        return None, None
+
+    rdf_triple_extract_result = await _run_with_retry(
+        "RDF三元组提取",
+        lambda: _rdf_triple_extract(llm_client_for_rdf, paragraph, entity_extract_result),
+        rdf_semaphore,
+    )
+    if rdf_triple_extract_result is None:
+        return None, None
 
     return entity_extract_result, rdf_triple_extract_result
+
+
+def info_extract_from_str(
+    llm_client_for_ner: LLMRequest, llm_client_for_rdf: LLMRequest, paragraph: str
+) -> Union[tuple[None, None], tuple[list[str], list[list[str]]]]:
+    """对段落进行信息提取（同步接口，见 info_extract_from_str_async）"""
+    return run_sync(info_extract_from_str_async(llm_client_for_ner, llm_client_for_rdf, paragraph))
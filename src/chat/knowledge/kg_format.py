@@ -0,0 +1,171 @@
+"""
+知识图谱的二进制存储格式
+
+GraphML 是文本格式，大型知识库每次启动都要完整解析一遍 XML。这里改为把图保存为列式的 Arrow IPC 文件：
+- {prefix}.nodes.arrow：每行一个节点，name 列为节点名，其余列为节点属性（缺失为 null）
+- {prefix}.edges.arrow：每行一条边，src / dst 为节点行号（int64），按 src 排序（即 CSR 的列下标数组），其余列为边属性
+- {prefix}.meta.json：格式版本与节点、边的数量，最后写入，作为完整保存的标志
+
+Arrow IPC 文件以内存映射方式打开，加载时不解析、不复制数据；检索用的 CSR 快照直接由这些数组构建，
+只有需要修改图（导入知识）或导出 GraphML 时才转换为 quick_algo 的 DiGraph。
+"""
+
+import json
+import os
+import time
+
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pyarrow as pa
+
+from quick_algo import di_graph
+
+from .global_logger import logger
+from .kg_ppr import KGSnapshot
+
+FORMAT_VERSION = 1
+"""二进制格式版本，格式变化时递增；版本不一致的文件不会被加载"""
+
+AttrValue = Union[str, int, float]
+
+
+def _attr_columns(attrs: List[Dict[str, AttrValue]]) -> Dict[str, pa.Array]:
+    """把属性字典列表转为按属性名分列的 Arrow 数组（类型与 GraphML 相同：str / int / float）"""
+    keys: Dict[str, None] = {}
+    for attr in attrs:
+        keys.update(dict.fromkeys(attr))
+    columns = {}
+    for key in keys:
+        values = [attr.get(key) for attr in attrs]
+        types = {type(v) for v in values if v is not None}
+        if types <= {int}:
+            arrow_type = pa.int64()
+        elif types <= {int, float}:
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+            values = [None if v is None else str(v) for v in values]
+        columns[key] = pa.array(values, type=arrow_type)
+    return columns
+
+
+def _row_attrs(table: pa.Table, skip: tuple) -> List[Dict[str, AttrValue]]:
+    """按行取出属性字典（跳过 null）"""
+    names = [name for name in table.column_names if name not in skip]
+    columns = [table.column(name).to_pylist() for name in names]
+    return [
+        {name: value for name, value in zip(names, row, strict=True) if value is not None}
+        for row in zip(*columns, strict=True)
+    ] or [{} for _ in range(table.num_rows)]
+
+
+class KGArrays:
+    """列式存储的知识图谱（只读）"""
+
+    def __init__(self, nodes: pa.Table, edges: pa.Table):
+        self.nodes = nodes
+        self.edges = edges
+
+    @property
+    def num_nodes(self) -> int:
+        return self.nodes.num_rows
+
+    @property
+    def num_edges(self) -> int:
+        return self.edges.num_rows
+
+    @classmethod
+    def from_digraph(cls, graph: di_graph.DiGraph) -> "KGArrays":
+        """从 DiGraph 转换"""
+        node_names = graph.get_node_list()
+        node_index = {name: idx for idx, name in enumerate(node_names)}
+        edge_list = graph.get_edge_list()
+        src = np.fromiter((node_index[s] for s, _ in edge_list), dtype=np.int64, count=len(edge_list))
+        dst = np.fromiter((node_index[d] for _, d in edge_list), dtype=np.int64, count=len(edge_list))
+        # 按起点排序，边表即 CSR 的列下标数组
+        order = np.lexsort((dst, src))
+
+        nodes = pa.table(
+            {"name": pa.array(node_names, type=pa.string())}
+            | _attr_columns([dict(graph[name].attr) for name in node_names])
+        )
+        edge_attrs = [dict(graph[edge_list[i]].attr) for i in order.tolist()]
+        edges = pa.table({"src": src[order], "dst": dst[order]} | _attr_columns(edge_attrs))
+        return cls(nodes, edges)
+
+    def to_digraph(self) -> di_graph.DiGraph:
+        """转换为 DiGraph（O(节点数 + 边数)，只在需要修改图或导出 GraphML 时调用）"""
+        start_time = time.perf_counter()
+        graph = di_graph.DiGraph()
+        node_names = self.nodes.column("name").to_pylist()
+        graph.add_nodes_from(
+            [
+                di_graph.DiNode(name, attr)
+                for name, attr in zip(node_names, _row_attrs(self.nodes, ("name",)), strict=True)
+            ]
+        )
+        src = self.edges.column("src").to_pylist()
+        dst = self.edges.column("dst").to_pylist()
+        for s, d, attr in zip(src, dst, _row_attrs(self.edges, ("src", "dst")), strict=True):
+            graph.add_edge(di_graph.DiEdge(node_names[s], node_names[d], attr))
+        logger.debug(f"KG转换为DiGraph完成，耗时{time.perf_counter() - start_time:.2f}秒")
+        return graph
+
+    def snapshot(self) -> KGSnapshot:
+        """直接由数组构建检索用的 CSR 快照，不经过 DiGraph"""
+        if "weight" in self.edges.column_names:
+            weights = self.edges.column("weight").to_numpy(zero_copy_only=False).astype(np.float64)
+            weights = np.nan_to_num(weights, nan=0.0)
+        else:
+            weights = np.ones(self.num_edges)
+        return KGSnapshot(
+            self.nodes.column("name").to_pylist(),
+            self.edges.column("src").to_numpy(),
+            self.edges.column("dst").to_numpy(),
+            weights,
+        )
+
+    @staticmethod
+    def _paths(dir_path: str, prefix: str) -> Dict[str, str]:
+        base = os.path.join(dir_path, prefix)
+        return {"nodes": f"{base}.nodes.arrow", "edges": f"{base}.edges.arrow", "meta": f"{base}.meta.json"}
+
+    @classmethod
+    def exists(cls, dir_path: str, prefix: str) -> bool:
+        return os.path.exists(cls._paths(dir_path, prefix)["meta"])
+
+    def save(self, dir_path: str, prefix: str) -> None:
+        """保存为 Arrow IPC 文件（先写临时文件再替换，元数据文件最后写入）"""
+        paths = self._paths(dir_path, prefix)
+        os.makedirs(dir_path, exist_ok=True)
+        for key, table in (("nodes", self.nodes), ("edges", self.edges)):
+            tmp_path = paths[key] + ".tmp"
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, paths[key])
+        meta = {"format_version": FORMAT_VERSION, "num_nodes": self.num_nodes, "num_edges": self.num_edges}
+        with open(paths["meta"] + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=4)
+        os.replace(paths["meta"] + ".tmp", paths["meta"])
+
+    @classmethod
+    def load(cls, dir_path: str, prefix: str) -> Optional["KGArrays"]:
+        """以内存映射方式加载，文件不存在、版本不一致或不完整时返回 None"""
+        paths = cls._paths(dir_path, prefix)
+        if not os.path.exists(paths["meta"]):
+            return None
+        with open(paths["meta"], "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            logger.warning(f"KG文件格式版本为{meta.get('format_version')}，当前版本为{FORMAT_VERSION}，忽略该文件")
+            return None
+        tables = {}
+        for key in ("nodes", "edges"):
+            with pa.memory_map(paths[key], "r") as source:
+                tables[key] = pa.ipc.open_file(source).read_all()
+        arrays = cls(tables["nodes"], tables["edges"])
+        if arrays.num_nodes != meta.get("num_nodes") or arrays.num_edges != meta.get("num_edges"):
+            logger.warning("KG文件与元数据中的数量不一致，忽略该文件")
+            return None
+        return arrays
@@ -1,10 +1,13 @@
 import json
 import os
+import threading
 import time
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 from rich.progress import (
     Progress,
     BarColumn,
@@ -15,15 +18,28 @@ from rich.progress import (
     SpinnerColumn,
     TextColumn,
 )
-from quick_algo import di_graph, pagerank
+from quick_algo import di_graph
 
 
 from .utils.hash import get_sha256
 from .embedding_store import EmbeddingManager, EmbeddingStoreItem
+from .kg_format import KGArrays
+from .kg_ppr import KGSnapshot
 from src.config.config import global_config
 
 from .global_logger import logger
 
+SYNONYM_SEARCH_BATCH_SIZE = 4096  # 同义词连接时每次Faiss搜索的实体数
+PPR_MAX_ITER = 100  # PPR幂迭代的最大迭代次数
+PPR_TOLERANCE = 1e-6  # PPR幂迭代的收敛阈值（两次迭代结果的L1距离）
+ENTITY_HASH_CACHE_SIZE = 1 << 20  # 实体hash键缓存的条目数
+
+
+@lru_cache(maxsize=ENTITY_HASH_CACHE_SIZE)
+def entity_hash_key(entity: str) -> str:
+    """实体节点的hash键（同一实体在三元组中反复出现，缓存sha256结果）"""
+    return "entity" + "-" + get_sha256(entity)
+
 
 def _get_kg_dir():
     """
@@ -43,60 +59,125 @@ def get_kg_dir_str():
 
 
 class KGManager:
-    def __init__(self):
+    def __init__(self, dir_path: Optional[str] = None):
+        """
+        Args:
+            dir_path: KG文件所在目录，默认为 data/rag
+        """
         # 会被保存的字段
         # 存储段落的hash值，用于去重
         self.stored_paragraph_hashes = set()
         # 实体出现次数
         self.ent_appear_cnt = {}
-        # KG
-        self.graph = di_graph.DiGraph()
+        # KG：从二进制文件加载时先保存为只读的列式数组，需要修改图时才转换为DiGraph
+        self._graph: Optional[di_graph.DiGraph] = di_graph.DiGraph()
+        self._arrays: Optional[KGArrays] = None
+        # 检索使用的CSR快照，图变化后置为None，下次检索时重新构建
+        self._snapshot: Optional[KGSnapshot] = None
+        # 检索在工作线程中进行，快照的重建与失效需互斥
+        self._snapshot_lock = threading.Lock()
+        # 图每次变化时递增，QAManager 据此使查询缓存失效
+        self.version = 0
 
         # 持久化相关 - 使用延迟初始化的路径
-        self.dir_path = get_kg_dir_str()
+        self.dir_path = dir_path or get_kg_dir_str()
+        self.graph_file_prefix = "rag-graph"
         self.graph_data_path = self.dir_path + "/" + "rag-graph" + ".graphml"
         self.ent_cnt_data_path = self.dir_path + "/" + "rag-ent-cnt" + ".parquet"
+        self.pg_hash_data_path = self.dir_path + "/" + "rag-pg-hash" + ".arrow"
+        # 旧版本的段落hash文件
         self.pg_hash_file_path = self.dir_path + "/" + "rag-pg-hash" + ".json"
 
+    @property
+    def graph(self) -> di_graph.DiGraph:
+        """KG的DiGraph（从二进制文件加载后第一次访问时才构建）"""
+        if self._graph is None:
+            logger.info("正在构建KG图结构...")
+            self._graph = self._arrays.to_digraph() if self._arrays is not None else di_graph.DiGraph()
+            self._arrays = None
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph: di_graph.DiGraph) -> None:
+        self._graph = graph
+        self._arrays = None
+        self._graph_changed()
+
+    @property
+    def num_nodes(self) -> int:
+        return self._arrays.num_nodes if self._graph is None else len(self._graph.get_node_list())
+
+    @property
+    def num_edges(self) -> int:
+        return self._arrays.num_edges if self._graph is None else len(self._graph.get_edge_list())
+
     def save_to_file(self):
         """将KG数据保存到文件"""
         # 确保目录存在
         if not os.path.exists(self.dir_path):
             os.makedirs(self.dir_path, exist_ok=True)
 
-        # 保存KG
-        di_graph.save_to_file(self.graph, self.graph_data_path)
+        # 保存KG（从二进制文件加载后未修改过的图无需重写）
+        if self._graph is not None:
+            KGArrays.from_digraph(self._graph).save(self.dir_path, self.graph_file_prefix)
 
         # 保存实体计数到文件
-        ent_cnt_df = pd.DataFrame([{"hash_key": k, "appear_cnt": v} for k, v in self.ent_appear_cnt.items()])
+        ent_cnt_df = pd.DataFrame(
+            {"hash_key": list(self.ent_appear_cnt.keys()), "appear_cnt": list(self.ent_appear_cnt.values())}
+        )
         ent_cnt_df.to_parquet(self.ent_cnt_data_path, engine="pyarrow", index=False)
 
         # 保存段落hash到文件
-        with open(self.pg_hash_file_path, "w", encoding="utf-8") as f:
-            data = {"stored_paragraph_hashes": list(self.stored_paragraph_hashes)}
-            f.write(json.dumps(data, ensure_ascii=False, indent=4))
+        pg_hash_table = pa.table({"hash": pa.array(list(self.stored_paragraph_hashes), type=pa.string())})
+        with pa.OSFile(self.pg_hash_data_path, "wb") as sink, pa.ipc.new_file(sink, pg_hash_table.schema) as writer:
+            writer.write_table(pg_hash_table)
 
     def load_from_file(self):
-        """从文件加载KG数据"""
-        # 确保文件存在
-        if not os.path.exists(self.pg_hash_file_path):
-            raise FileNotFoundError(f"KG段落hash文件{self.pg_hash_file_path}不存在")
-        if not os.path.exists(self.ent_cnt_data_path):
-            raise FileNotFoundError(f"KG实体计数文件{self.ent_cnt_data_path}不存在")
-        if not os.path.exists(self.graph_data_path):
-            raise FileNotFoundError(f"KG图文件{self.graph_data_path}不存在")
+        """从文件加载KG数据
+
+        优先加载二进制格式；只有旧版本的 GraphML / JSON 文件时从旧文件加载，并立即转存为二进制格式。
+        """
+        migrate = False
 
         # 加载段落hash
-        with open(self.pg_hash_file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            self.stored_paragraph_hashes = set(data["stored_paragraph_hashes"])
+        if os.path.exists(self.pg_hash_data_path):
+            with pa.memory_map(self.pg_hash_data_path, "r") as source:
+                self.stored_paragraph_hashes = set(pa.ipc.open_file(source).read_all().column("hash").to_pylist())
+        elif os.path.exists(self.pg_hash_file_path):
+            with open(self.pg_hash_file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                self.stored_paragraph_hashes = set(data["stored_paragraph_hashes"])
+            migrate = True
+        else:
+            raise FileNotFoundError(f"KG段落hash文件{self.pg_hash_data_path}不存在")
 
         # 加载实体计数
+        if not os.path.exists(self.ent_cnt_data_path):
+            raise FileNotFoundError(f"KG实体计数文件{self.ent_cnt_data_path}不存在")
         ent_cnt_df = pd.read_parquet(self.ent_cnt_data_path, engine="pyarrow")
-        self.ent_appear_cnt = dict({row["hash_key"]: row["appear_cnt"] for _, row in ent_cnt_df.iterrows()})
+        self.ent_appear_cnt = dict(zip(ent_cnt_df["hash_key"].tolist(), ent_cnt_df["appear_cnt"].tolist(), strict=True))
 
         # 加载KG
-        self.graph = di_graph.load_from_file(self.graph_data_path)
+        self._graph_changed()
+        arrays = KGArrays.load(self.dir_path, self.graph_file_prefix)
+        if arrays is not None:
+            self._arrays = arrays
+            self._graph = None
+        elif os.path.exists(self.graph_data_path):
+            logger.info("正在从GraphML文件加载KG，加载后将转存为二进制格式")
+            self.graph = di_graph.load_from_file(self.graph_data_path)
+            migrate = True
+        else:
+            raise FileNotFoundError(f"KG图文件{self.graph_data_path}不存在")
+
+        if migrate:
+            self.save_to_file()
+
+    def export_graphml(self, path: Optional[str] = None) -> str:
+        """导出为 GraphML 文件（供需要 GraphML 的工具使用），默认导出到旧版本的图文件路径"""
+        path = path or self.graph_data_path
+        di_graph.save_to_file(self.graph, path)
+        return path
 
     def _build_edges_between_ent(
         self,
@@ -111,8 +192,8 @@ class KGManager:
                     # 避免自连接
                     continue
                 # 一个triple就是一条边（同时构建双向联系）
-                hash_key1 = "entity" + "-" + get_sha256(triple[0])
-                hash_key2 = "entity" + "-" + get_sha256(triple[2])
+                hash_key1 = entity_hash_key(triple[0])
+                hash_key2 = entity_hash_key(triple[2])
                 node_to_node[(hash_key1, hash_key2)] = node_to_node.get((hash_key1, hash_key2), 0) + 1.0
                 node_to_node[(hash_key2, hash_key1)] = node_to_node.get((hash_key2, hash_key1), 0) + 1.0
                 entity_set.add(hash_key1)
@@ -130,7 +211,7 @@ class KGManager:
         """构建实体节点与文段节点之间的关系"""
         for idx in triple_list_data:
             for triple in triple_list_data[idx]:
-                ent_hash_key = "entity" + "-" + get_sha256(triple[0])
+                ent_hash_key = entity_hash_key(triple[0])
                 pg_hash_key = "paragraph" + "-" + str(idx)
                 node_to_node[(ent_hash_key, pg_hash_key)] = node_to_node.get((ent_hash_key, pg_hash_key), 0) + 1.0
 
@@ -146,8 +227,8 @@ class KGManager:
         ent_hash_list = set()
         for triple_list in triple_list_data.values():
             for triple in triple_list:
-                ent_hash_list.add("entity" + "-" + get_sha256(triple[0]))
-                ent_hash_list.add("entity" + "-" + get_sha256(triple[2]))
+                ent_hash_list.add(entity_hash_key(triple[0]))
+                ent_hash_list.add(entity_hash_key(triple[2]))
         ent_hash_list = list(ent_hash_list)
 
         synonym_hash_set = set()
@@ -168,39 +249,43 @@ class KGManager:
             transient=False,
         ) as progress:
             task = progress.add_task("同义词连接", total=total)
-            for ent_hash in ent_hash_list:
-                if ent_hash in synonym_hash_set:
-                    progress.update(task, advance=1)
-                    continue
-                ent = embedding_manager.entities_embedding_store.store.get(ent_hash)
-                if ent is None:
-                    progress.update(task, advance=1)
-                    continue
-                assert isinstance(ent, EmbeddingStoreItem)
-                # 查询相似实体
-                similar_ents = embedding_manager.entities_embedding_store.search_top_k(
-                    ent.embedding, global_config.lpmm_knowledge.rag_synonym_search_top_k
+            entity_store = embedding_manager.entities_embedding_store
+            for start in range(0, total, SYNONYM_SEARCH_BATCH_SIZE):
+                batch_hashes = [
+                    ent_hash
+                    for ent_hash in ent_hash_list[start : start + SYNONYM_SEARCH_BATCH_SIZE]
+                    if ent_hash not in synonym_hash_set and ent_hash in entity_store.store
+                ]
+                # 一次Faiss调用查询整批实体的相似实体
+                rows = [entity_store.store.index[ent_hash] for ent_hash in batch_hashes]
+                batch_results = entity_store.search_top_k_batch(
+                    entity_store.store.matrix[rows], global_config.lpmm_knowledge.rag_synonym_search_top_k
                 )
-                res_ent = []  # Debug
-                for res_ent_hash, similarity in similar_ents:
-                    if res_ent_hash == ent_hash:
-                        # 避免自连接
-                        continue
-                    if similarity < global_config.lpmm_knowledge.rag_synonym_threshold:
-                        # 相似度阈值
+                for ent_hash, similar_ents in zip(batch_hashes, batch_results, strict=True):
+                    if ent_hash in synonym_hash_set:
+                        # 已作为本批中前面实体的同义词被连接
                         continue
-                    node_to_node[(res_ent_hash, ent_hash)] = similarity
-                    node_to_node[(ent_hash, res_ent_hash)] = similarity
-                    synonym_hash_set.add(res_ent_hash)
-                    new_edge_cnt += 1
-                    res_ent.append(
-                        (
-                            embedding_manager.entities_embedding_store.store[res_ent_hash].str,
-                            similarity,
-                        )
-                    )  # Debug
-                    synonym_result[ent.str] = res_ent
-                progress.update(task, advance=1)
+                    ent = entity_store.store[ent_hash]
+                    res_ent = []  # Debug
+                    for res_ent_hash, similarity in similar_ents:
+                        if res_ent_hash == ent_hash:
+                            # 避免自连接
+                            continue
+                        if similarity < global_config.lpmm_knowledge.rag_synonym_threshold:
+                            # 相似度阈值
+                            continue
+                        node_to_node[(res_ent_hash, ent_hash)] = similarity
+                        node_to_node[(ent_hash, res_ent_hash)] = similarity
+                        synonym_hash_set.add(res_ent_hash)
+                        new_edge_cnt += 1
+                        res_ent.append(
+                            (
+                                entity_store.store[res_ent_hash].str,
+                                similarity,
+                            )
+                        )  # Debug
+                        synonym_result[ent.str] = res_ent
+                progress.update(task, advance=min(SYNONYM_SEARCH_BATCH_SIZE, total - start))
 
         for k, v in synonym_result.items():
             print(f'"{k}"的相似实体为：{v}')
@@ -219,17 +304,17 @@ class KGManager:
             - 若是已存在的边，则更新边的权重
         2. 更新新节点的属性
         """
-        existed_nodes = self.graph.get_node_list()
-        existed_edges = [str((edge[0], edge[1])) for edge in self.graph.get_edge_list()]
-
         now_time = time.time()
+        new_nodes = set()
 
-        # 更新图结构
+        # 更新图结构（边与节点是否存在都直接查询图的哈希索引）
         for src_tgt, weight in node_to_node.items():
-            key = str(src_tgt)
             # 检查边是否已存在
-            if key not in existed_edges:
+            if src_tgt not in self.graph:
                 # 新边
+                for node_hash in src_tgt:
+                    if node_hash not in self.graph:
+                        new_nodes.add(node_hash)
                 self.graph.add_edge(
                     di_graph.DiEdge(
                         src_tgt[0],
@@ -249,34 +334,32 @@ class KGManager:
                 self.graph.update_edge(edge_item)
 
         # 更新新节点属性
-        for src_tgt in node_to_node.keys():
-            for node_hash in src_tgt:
-                if node_hash not in existed_nodes:
-                    if node_hash.startswith("entity"):
-                        # 新增实体节点
-                        node = embedding_manager.entities_embedding_store.store.get(node_hash)
-                        if node is None:
-                            logger.warning(f"实体节点 {node_hash} 在嵌入库中不存在，跳过")
-                            continue
-                        assert isinstance(node, EmbeddingStoreItem)
-                        node_item = self.graph[node_hash]
-                        node_item["content"] = node.str
-                        node_item["type"] = "ent"
-                        node_item["create_time"] = now_time
-                        self.graph.update_node(node_item)
-                    elif node_hash.startswith("paragraph"):
-                        # 新增文段节点
-                        node = embedding_manager.paragraphs_embedding_store.store.get(node_hash)
-                        if node is None:
-                            logger.warning(f"段落节点 {node_hash} 在嵌入库中不存在，跳过")
-                            continue
-                        assert isinstance(node, EmbeddingStoreItem)
-                        content = node.str.replace("\n", " ")
-                        node_item = self.graph[node_hash]
-                        node_item["content"] = content if len(content) < 8 else content[:8] + "..."
-                        node_item["type"] = "pg"
-                        node_item["create_time"] = now_time
-                        self.graph.update_node(node_item)
+        for node_hash in new_nodes:
+            if node_hash.startswith("entity"):
+                # 新增实体节点
+                node = embedding_manager.entities_embedding_store.store.get(node_hash)
+                if node is None:
+                    logger.warning(f"实体节点 {node_hash} 在嵌入库中不存在，跳过")
+                    continue
+                assert isinstance(node, EmbeddingStoreItem)
+                node_item = self.graph[node_hash]
+                node_item["content"] = node.str
+                node_item["type"] = "ent"
+                node_item["create_time"] = now_time
+                self.graph.update_node(node_item)
+            elif node_hash.startswith("paragraph"):
+                # 新增文段节点
+                node = embedding_manager.paragraphs_embedding_store.store.get(node_hash)
+                if node is None:
+                    logger.warning(f"段落节点 {node_hash} 在嵌入库中不存在，跳过")
+                    continue
+                assert isinstance(node, EmbeddingStoreItem)
+                content = node.str.replace("\n", " ")
+                node_item = self.graph[node_hash]
+                node_item["content"] = content if len(content) < 8 else content[:8] + "..."
+                node_item["type"] = "pg"
+                node_item["create_time"] = now_time
+                self.graph.update_node(node_item)
 
     def build_kg(
         self,
@@ -310,11 +393,28 @@ class KGManager:
 
         # 构建图
         self._update_graph(node_to_node, embedding_manager)
+        self._graph_changed()
 
         # 记录已处理（存储）的段落hash
         for idx in triple_list_data:
             self.stored_paragraph_hashes.add(str(idx))
 
+    def _graph_changed(self) -> None:
+        """图变化后丢弃快照并递增版本号"""
+        with self._snapshot_lock:
+            self._snapshot = None
+            self.version += 1
+
+    def get_snapshot(self) -> KGSnapshot:
+        """获取图的CSR快照，图变化后第一次调用时重新构建（可在工作线程中调用）"""
+        with self._snapshot_lock:
+            if self._snapshot is None:
+                if self._graph is None and self._arrays is not None:
+                    self._snapshot = self._arrays.snapshot()
+                else:
+                    self._snapshot = KGSnapshot.from_graph(self.graph)
+            return self._snapshot
+
     def kg_search(
         self,
         relation_search_result: List[Tuple[Tuple[str, str, str], float]],
@@ -323,13 +423,15 @@ class KGManager:
     ):
         """RAG搜索与PageRank
 
+        返回PPR分数最高的 qa_paragraph_search_top_k 个文段（与只用文段检索时的候选数一致）及PPR的个性化权重。
+
         Args:
             relation_search_result: RelationEmbedding的搜索结果（relation_tripple, similarity）
             paragraph_search_result: ParagraphEmbedding的搜索结果（paragraph_hash, similarity）
             embed_manager: EmbeddingManager对象
         """
         # 图中存在的节点总集
-        existed_nodes = self.graph.get_node_list()
+        snapshot = self.get_snapshot()
 
         # 准备PPR使用的数据
         # 节点权重：实体
@@ -348,8 +450,8 @@ class KGManager:
             # 关系三元组
             triple = relation[2:-2].split("', '")
             for ent in [(triple[0]), (triple[2])]:
-                ent_hash = "entity" + "-" + get_sha256(ent)
-                if ent_hash in existed_nodes:  # 该实体需在KG中存在
+                ent_hash = entity_hash_key(ent)
+                if ent_hash in snapshot:  # 该实体需在KG中存在
                     if ent_hash not in ent_sim_scores:  # 尚未记录的实体
                         ent_sim_scores[ent_hash] = []
                     ent_sim_scores[ent_hash].append(similarity)
@@ -415,22 +517,18 @@ class KGManager:
         ppr_node_weights = {k: v for d in [ent_weights, pg_weights] for k, v in d.items()}
         del ent_weights, pg_weights
 
-        # PersonalizedPageRank
-        ppr_res = pagerank.run_pagerank(
-            self.graph,
-            personalization=ppr_node_weights,
-            max_iter=100,
-            alpha=global_config.lpmm_knowledge.qa_ppr_damping,
-        )
-
-        # 获取最终结果
-        # 从搜索结果中提取文段节点的结果
-        passage_node_res = [
-            (node_key, score) for node_key, score in ppr_res.items() if node_key.startswith("paragraph")
-        ]
-        del ppr_res
-
-        # 排序：按照分数从大到小
-        passage_node_res = sorted(passage_node_res, key=lambda item: item[1], reverse=True)
+        # PersonalizedPageRank，并从结果中取分数最高的文段节点（按照分数从大到小）
+        lpmm_config = global_config.lpmm_knowledge
+        top_k = lpmm_config.qa_paragraph_search_top_k
+        if lpmm_config.qa_ppr_method == "push":
+            node_ids, scores = snapshot.local_push(
+                ppr_node_weights, alpha=lpmm_config.qa_ppr_damping, epsilon=lpmm_config.qa_ppr_push_epsilon
+            )
+            passage_node_res = snapshot.top_paragraphs(scores, top_k, node_ids)
+        else:
+            scores = snapshot.personalized_pagerank(
+                ppr_node_weights, alpha=lpmm_config.qa_ppr_damping, max_iter=PPR_MAX_ITER, tol=PPR_TOLERANCE
+            )
+            passage_node_res = snapshot.top_paragraphs(scores, top_k)
 
         return passage_node_res, ppr_node_weights
@@ -0,0 +1,209 @@
+"""
+知识图谱的 CSR 快照与 Personalized PageRank
+
+KGManager 的图保存在 quick_algo 的 DiGraph 中，逐条边访问需要跨越 Python/C 边界。
+检索时改为使用一份只读的 CSR（压缩稀疏行）快照：
+- 节点名 -> 下标的 hash 索引
+- 按起点排列的出边（已按出边权重和归一化为转移概率），以及按终点排列的同一组边
+
+快照只在图被修改（build_kg / 加载）后重新构建，在线查询不再遍历 DiGraph。
+PPR 结果以按节点编号排列的分数数组返回，文段节点的 top-k 用预先计算的文段节点编号在 NumPy 中选出，
+只有最终的 k 个结果才转换为 Python 对象。
+
+PPR 的语义与 quick_algo.pagerank.run_pagerank 相同：
+    x = alpha * (x·P + 悬挂节点质量 * p) + (1 - alpha) * p
+其中 P 为按权重归一化的转移矩阵，p 为归一化的个性化向量，悬挂节点（无出边）的质量按 p 重新分配。
+
+- power：向量化的幂迭代，L1 变化小于 tol 时提前停止，结果与 quick_algo 一致
+- push：以种子节点为中心的局部前向推送（Andersen-Chung-Lang），只访问残差足够大的节点附近的边，
+  耗时与图的总规模无关；未被访问到的节点视为 0 分
+"""
+
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from quick_algo import di_graph
+
+from .global_logger import logger
+
+PUSH_MAX_ROUNDS = 1000
+"""局部推送的最大轮数（每轮同时推送所有残差超过阈值的节点）"""
+
+
+class KGSnapshot:
+    """知识图谱的只读 CSR 快照"""
+
+    def __init__(self, nodes: List[str], src: np.ndarray, dst: np.ndarray, weights: np.ndarray):
+        """
+        Args:
+            nodes: 节点名列表，下标即节点编号
+            src: 每条边的起点编号
+            dst: 每条边的终点编号
+            weights: 每条边的权重
+        """
+        self.nodes = nodes
+        self.node_index: Dict[str, int] = {name: idx for idx, name in enumerate(nodes)}
+        num_nodes = len(nodes)
+        self.paragraph_nodes = np.fromiter(
+            (idx for idx, name in enumerate(nodes) if name.startswith("paragraph")), dtype=np.int64
+        )
+        """文段节点的编号（升序）"""
+        self.is_paragraph = np.zeros(num_nodes, dtype=bool)
+        self.is_paragraph[self.paragraph_nodes] = True
+
+        out_weight = np.bincount(src, weights=weights, minlength=num_nodes)
+        self.dangling = out_weight == 0
+        # 转移概率：边权重 / 起点的出边权重和
+        prob = weights / np.where(out_weight[src] > 0, out_weight[src], 1.0)
+
+        # 按起点排列（局部推送使用）
+        order = np.argsort(src, kind="stable")
+        self.out_indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=self.out_indptr[1:])
+        self.out_dst = dst[order]
+        self.out_prob = prob[order]
+
+        # 按终点排列（幂迭代使用，bincount 按终点累加）
+        order = np.argsort(dst, kind="stable")
+        self.in_src = src[order]
+        self.in_dst = dst[order]
+        self.in_prob = prob[order]
+
+    @classmethod
+    def from_graph(cls, graph: di_graph.DiGraph) -> "KGSnapshot":
+        """从 DiGraph 构建快照（O(节点数 + 边数)，只在图变化后调用）"""
+        start_time = time.perf_counter()
+        nodes = graph.get_node_list()
+        node_index = {name: idx for idx, name in enumerate(nodes)}
+        edge_list = graph.get_edge_list()
+        src = np.fromiter((node_index[s] for s, _ in edge_list), dtype=np.int64, count=len(edge_list))
+        dst = np.fromiter((node_index[d] for _, d in edge_list), dtype=np.int64, count=len(edge_list))
+        weights = np.fromiter(
+            (float(graph[edge]["weight"]) for edge in edge_list), dtype=np.float64, count=len(edge_list)
+        )
+        snapshot = cls(nodes, src, dst, weights)
+        logger.debug(
+            f"KG快照构建完成：{len(nodes)}个节点，{len(edge_list)}条边，耗时{time.perf_counter() - start_time:.2f}秒"
+        )
+        return snapshot
+
+    def __contains__(self, node: object) -> bool:
+        return node in self.node_index
+
+    def _personalization_vector(self, personalization: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """个性化向量的 (节点编号, 归一化权重)，忽略不在图中的节点"""
+        items = [(self.node_index[k], v) for k, v in personalization.items() if k in self.node_index and v > 0]
+        seeds = np.array([idx for idx, _ in items], dtype=np.int64)
+        weights = np.array([v for _, v in items], dtype=np.float64)
+        if len(seeds) == 0:
+            raise ValueError("个性化向量中没有图中存在的节点")
+        return seeds, weights / weights.sum()
+
+    def personalized_pagerank(
+        self, personalization: Dict[str, float], alpha: float, max_iter: int = 100, tol: float = 1e-6
+    ) -> np.ndarray:
+        """幂迭代计算 PPR
+
+        Args:
+            personalization: 节点名 -> 个性化权重
+            alpha: 阻尼系数
+            max_iter: 最大迭代次数
+            tol: 两次迭代结果的 L1 距离小于该值时停止
+        Returns:
+            np.ndarray: 按节点编号排列的 PPR 分数
+        """
+        num_nodes = len(self.nodes)
+        seeds, seed_weights = self._personalization_vector(personalization)
+        p = np.zeros(num_nodes)
+        p[seeds] = seed_weights
+        x = p.copy()
+        for _ in range(max_iter):
+            x_last = x
+            x = np.bincount(self.in_dst, weights=x_last[self.in_src] * self.in_prob, minlength=num_nodes)
+            x += x_last[self.dangling].sum() * p
+            x *= alpha
+            x += (1 - alpha) * p
+            if np.abs(x - x_last).sum() < tol:
+                break
+        return x
+
+    def local_push(
+        self, personalization: Dict[str, float], alpha: float, epsilon: float = 1e-6
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """以种子节点为中心的局部前向推送，近似计算 PPR
+
+        每个节点的误差不超过 epsilon * 出度，只返回被访问到的节点。
+
+        Args:
+            personalization: 节点名 -> 个性化权重
+            alpha: 阻尼系数
+            epsilon: 残差阈值，越小越精确，访问的节点越多
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (被访问到的节点编号, 对应的近似 PPR 分数)
+        """
+        seeds, seed_weights = self._personalization_vector(personalization)
+        num_nodes = len(self.nodes)
+        # 稠密数组按需分配物理页，只有被访问的节点会被写入
+        estimate = np.zeros(num_nodes)
+        residual = np.zeros(num_nodes)
+        residual[seeds] = seed_weights
+        # 只有上一轮收到推送的节点的残差可能超过阈值
+        candidates = seeds
+        visited = [seeds]
+
+        for _ in range(PUSH_MAX_ROUNDS):
+            threshold = epsilon * np.maximum(self.out_indptr[candidates + 1] - self.out_indptr[candidates], 1)
+            frontier = candidates[residual[candidates] >= threshold]
+            if len(frontier) == 0:
+                break
+            mass = residual[frontier]
+            residual[frontier] = 0.0
+            estimate[frontier] += (1 - alpha) * mass
+
+            # 沿出边推送 alpha * 残差；悬挂节点的质量按个性化向量回到种子节点
+            starts = self.out_indptr[frontier]
+            counts = self.out_indptr[frontier + 1] - starts
+            edge_idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            targets = self.out_dst[edge_idx]
+            pushed = np.repeat(alpha * mass, counts) * self.out_prob[edge_idx]
+            dangling_mass = alpha * mass[self.dangling[frontier]].sum()
+            if dangling_mass > 0:
+                targets = np.concatenate([targets, seeds])
+                pushed = np.concatenate([pushed, dangling_mass * seed_weights])
+            np.add.at(residual, targets, pushed)
+            candidates = np.unique(targets)
+            visited.append(candidates)
+
+        touched = np.unique(np.concatenate(visited))
+        touched = touched[estimate[touched] > 0]
+        return touched, estimate[touched]
+
+    def top_paragraphs(
+        self, scores: np.ndarray, k: int, node_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float]]:
+        """取分数最高的k个文段节点
+
+        Args:
+            scores: 节点分数；node_ids 为 None 时为按节点编号排列的全部节点的分数
+            k: 返回的文段数
+            node_ids: scores 对应的节点编号
+        Returns:
+            List[Tuple[str, float]]: 按分数从大到小排列的(文段节点名, 分数)列表
+        """
+        if node_ids is None:
+            node_ids = self.paragraph_nodes
+            scores = scores[node_ids]
+        else:
+            mask = self.is_paragraph[node_ids]
+            node_ids, scores = node_ids[mask], scores[mask]
+        if len(scores) > k > 0:
+            top = np.argpartition(-scores, k - 1)[:k]
+            node_ids, scores = node_ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [
+            (self.nodes[node], score)
+            for node, score in zip(node_ids[order].tolist(), scores[order].tolist(), strict=True)
+        ]
@@ -1,12 +1,15 @@
 import json
 import os
 import glob
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional
 
 
 from . import INVALID_ENTITY, ROOT_PATH, DATA_PATH
+from .global_logger import logger
 # from src.manager.local_store_manager import local_storage
 
+OPENIE_DIR = os.path.join(DATA_PATH, "openie")
+
 
 def _filter_invalid_entities(entities: List[str]) -> List[str]:
     """过滤无效的实体"""
@@ -42,6 +45,45 @@ def _filter_invalid_triples(triples: List[List[str]]) -> List[List[str]]:
     return valid_triples
 
 
+def _iter_jsonl_docs(file_path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取JSONL文件中的文档，跳过无法解析的行（例如提取中断时写了一半的最后一行）"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"跳过无法解析的行：{file_path} 第{line_no}行")
+
+
+class OpenIEJsonlWriter:
+    """以JSONL格式追加写入OpenIE文档，每行一个文档，写入后立即刷新到文件"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.count = 0
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._file = open(file_path, "a", encoding="utf-8")
+
+    def write(self, doc: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
+        # 没有写入任何文档时不留下空文件
+        if os.path.exists(self.file_path) and os.path.getsize(self.file_path) == 0:
+            os.remove(self.file_path)
+
+    def __enter__(self) -> "OpenIEJsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
 class OpenIE:
     """
     OpenIE规约的数据格式为如下
@@ -58,6 +100,8 @@ class OpenIE:
         "avg_ent_chars": "实体平均字符数",
         "avg_ent_words": "实体平均词数"
     }
+
+    信息提取脚本输出的 .jsonl 文件每行是一个上述的文档（不含统计字段，加载时重新计算）。
     """
 
     def __init__(
@@ -83,6 +127,11 @@ class OpenIE:
         all_docs = []
         for data in data_list:
             all_docs.extend(data.get("docs", []))
+        return OpenIE._from_docs(all_docs)
+
+    @staticmethod
+    def _from_docs(all_docs: List[Dict[str, Any]]) -> "OpenIE":
+        """从文档列表构建OpenIE对象"""
         # 重新计算统计
         sum_phrase_chars = sum([len(e) for chunk in all_docs for e in chunk["extracted_entities"]])
         sum_phrase_words = sum([len(e.split()) for chunk in all_docs for e in chunk["extracted_entities"]])
@@ -104,22 +153,29 @@ class OpenIE:
         }
 
     @staticmethod
-    def load() -> "OpenIE":
-        """从OPENIE_DIR下所有json文件合并加载OpenIE数据"""
-        openie_dir = os.path.join(DATA_PATH, "openie")
+    def list_files(openie_dir: Optional[str] = None) -> List[str]:
+        """OpenIE数据目录下的全部 .json 与 .jsonl 文件"""
+        openie_dir = openie_dir or OPENIE_DIR
         if not os.path.exists(openie_dir):
             raise Exception(f"OpenIE数据目录不存在: {openie_dir}")
-        json_files = sorted(glob.glob(os.path.join(openie_dir, "*.json")))
-        data_list = []
-        for file in json_files:
-            with open(file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                data_list.append(data)
-        if not data_list:
-            # print(f"111111111111111111111Root Path : \n{ROOT_PATH}")
-            raise Exception(f"未在 {openie_dir} 找到任何OpenIE json文件")
-        openie_data = OpenIE._from_dict(data_list)
-        return openie_data
+        return sorted(glob.glob(os.path.join(openie_dir, "*.json")) + glob.glob(os.path.join(openie_dir, "*.jsonl")))
+
+    @staticmethod
+    def iter_docs(openie_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """逐个文件、逐个文档读取OpenIE数据（.jsonl 文件逐行读取，不会整体载入内存）"""
+        for file in OpenIE.list_files(openie_dir):
+            if file.endswith(".jsonl"):
+                yield from _iter_jsonl_docs(file)
+            else:
+                with open(file, "r", encoding="utf-8") as f:
+                    yield from json.load(f).get("docs", [])
+
+    @staticmethod
+    def load() -> "OpenIE":
+        """从OPENIE_DIR下所有 .json / .jsonl 文件合并加载OpenIE数据"""
+        if not OpenIE.list_files():
+            raise Exception(f"未在 {OPENIE_DIR} 找到任何OpenIE数据文件")
+        return OpenIE._from_docs(list(OpenIE.iter_docs()))
 
     def extract_entity_dict(self):
         """提取实体列表"""
@@ -0,0 +1,174 @@
+"""
+QAManager 的查询结果缓存
+
+群聊中相近的问题往往在几分钟内反复出现，每次都要生成问题Embedding、检索两个向量库、计算PPR。
+这里按两级缓存复用 get_knowledge 的结果：
+- 精确缓存：按规范化后的问题文本查找，命中时不需要生成问题Embedding
+- 语义缓存：问题Embedding与某个已缓存问题的余弦相似度不低于阈值时复用其结果
+
+缓存项超过TTL后失效，超过容量时按LRU淘汰；知识库（KG或嵌入库）的版本号变化后整个缓存清空。
+"""
+
+import re
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "?？!！。.~～…,，"
+
+
+def normalize_question(question: str) -> str:
+    """规范化问题文本：合并空白、转为小写、去掉末尾的标点"""
+    return _WHITESPACE_PATTERN.sub(" ", question).strip().lower().rstrip(_TRAILING_PUNCTUATION).strip()
+
+
+@dataclass
+class _CacheEntry:
+    created_time: float
+    slot: int
+    """在语义缓存矩阵中的行号"""
+    knowledge: Optional[str]
+    """缓存的查询结果，None 表示知识库中没有相关知识"""
+
+
+class QACache:
+    """问题 -> 知识查询结果的两级缓存（只在事件循环中使用，不加锁）"""
+
+    def __init__(self, max_size: int, ttl: float, similarity_threshold: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        # 语义缓存：每个缓存项的归一化问题Embedding占一行，第一次写入时按维度分配
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[str]] = [None] * max_size
+        self._free_slots = list(range(max_size - 1, -1, -1))
+        self._data_version: Optional[Hashable] = None
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def check_version(self, data_version: Hashable) -> None:
+        """知识库版本号变化时清空缓存"""
+        if data_version == self._data_version:
+            return
+        if self._entries:
+            self.invalidations += 1
+        self.clear()
+        self._data_version = data_version
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._slot_keys = [None] * self.max_size
+        self._free_slots = list(range(self.max_size - 1, -1, -1))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._slot_keys[entry.slot] = None
+        self._free_slots.append(entry.slot)
+
+    def _expired(self, entry: _CacheEntry, now: float) -> bool:
+        return now - entry.created_time > self.ttl
+
+    def get_exact(self, question: str) -> Tuple[bool, Optional[str]]:
+        """按问题文本查找，返回 (是否命中, 缓存结果)
+
+        未命中时不计入 misses，调用方接着用问题Embedding调用 get_semantic。
+        """
+        key = normalize_question(question)
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if self._expired(entry, time.monotonic()):
+            self._remove(key)
+            return False, None
+        self._entries.move_to_end(key)
+        self.exact_hits += 1
+        return True, entry.knowledge
+
+    def get_semantic(self, question: str, embedding: np.ndarray) -> Tuple[bool, Optional[str]]:
+        """按问题Embedding查找最相似的缓存项，返回 (是否命中, 缓存结果)
+
+        命中时把新问题也加入精确缓存（沿用原缓存项的创建时间，不延长有效期）。
+        """
+        entry = self._find_similar(embedding)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self.semantic_hits += 1
+        self._put(normalize_question(question), embedding, entry.knowledge, entry.created_time)
+        return True, entry.knowledge
+
+    def _find_similar(self, embedding: np.ndarray) -> Optional[_CacheEntry]:
+        if self._matrix is None or not self._entries or self.similarity_threshold > 1:
+            return None
+        query = self._normalized(embedding)
+        if query is None or query.shape[0] != self._matrix.shape[1]:
+            return None
+        similarities = self._matrix @ query
+        now = time.monotonic()
+        # 按相似度从高到低检查，跳过空行与已过期的缓存项
+        for slot in np.argsort(-similarities).tolist():
+            if similarities[slot] < self.similarity_threshold:
+                break
+            key = self._slot_keys[slot]
+            if key is None:
+                continue
+            entry = self._entries[key]
+            if self._expired(entry, now):
+                self._remove(key)
+                continue
+            self._entries.move_to_end(key)
+            return entry
+        return None
+
+    @staticmethod
+    def _normalized(embedding: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def put(self, question: str, embedding: np.ndarray, knowledge: Optional[str]) -> None:
+        """写入缓存"""
+        self._put(normalize_question(question), embedding, knowledge, time.monotonic())
+
+    def _put(self, key: str, embedding: np.ndarray, knowledge: Optional[str], created_time: float) -> None:
+        if self.max_size <= 0:
+            return
+        vector = self._normalized(embedding)
+        if vector is None:
+            return
+        if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+            # 嵌入维度变化（更换了模型）时旧的缓存项没有意义
+            self.clear()
+            self._matrix = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+        if key in self._entries:
+            self._remove(key)
+        while not self._free_slots:
+            self._remove(next(iter(self._entries)))
+        slot = self._free_slots.pop()
+        self._matrix[slot] = vector
+        self._slot_keys[slot] = key
+        self._entries[key] = _CacheEntry(created_time, slot, knowledge)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+            "size": len(self._entries),
+        }
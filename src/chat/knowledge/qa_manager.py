@@ -1,9 +1,11 @@
+import asyncio
 import time
 from typing import Tuple, List, Dict, Optional
 
 from .global_logger import logger
 from .embedding_store import EmbeddingManager
 from .kg_manager import KGManager
+from .qa_cache import QACache
 
 # from .lpmmconfig import global_config
 from .utils.dyn_topk import dyn_select_top_k
@@ -23,13 +25,19 @@ class QAManager:
         self.embed_manager = embed_manager
         self.kg_manager = kg_manager
         self.qa_model = LLMRequest(model_set=model_config.model_task_config.lpmm_qa, request_type="lpmm.qa")
+        self.cache = QACache(
+            max_size=global_config.lpmm_knowledge.qa_cache_size,
+            ttl=global_config.lpmm_knowledge.qa_cache_ttl,
+            similarity_threshold=global_config.lpmm_knowledge.qa_cache_similarity_threshold,
+        )
 
-    async def process_query(
-        self, question: str
-    ) -> Optional[Tuple[List[Tuple[str, float, float]], Optional[Dict[str, float]]]]:
-        """处理查询"""
+    @property
+    def data_version(self) -> Tuple[int, Tuple[int, int, int]]:
+        """知识库的版本号，KG或任一嵌入库变化后改变"""
+        return self.kg_manager.version, self.embed_manager.version
 
-        # 生成问题的Embedding
+    async def _get_question_embedding(self, question: str) -> Optional[List[float]]:
+        """生成问题的Embedding"""
         part_start_time = time.perf_counter()
         question_embedding = await get_embedding(question)
         if question_embedding is None:
@@ -37,13 +45,37 @@ class QAManager:
             return None
         part_end_time = time.perf_counter()
         logger.debug(f"Embedding用时：{part_end_time - part_start_time:.5f}s")
+        return question_embedding
+
+    async def process_query(
+        self, question: str, question_embedding: Optional[List[float]] = None
+    ) -> Optional[Tuple[List[Tuple[str, float, float]], Optional[Dict[str, float]]]]:
+        """处理查询
+
+        Args:
+            question: 问题
+            question_embedding: 问题的Embedding，为None时重新生成
+        """
 
-        # 根据问题Embedding查询Relation Embedding库
+        if question_embedding is None:
+            question_embedding = await self._get_question_embedding(question)
+            if question_embedding is None:
+                return None
+
+        # 根据问题Embedding同时查询Relation与Paragraph Embedding库（在线程池中执行，不阻塞其他聊天）
         part_start_time = time.perf_counter()
-        relation_search_res = self.embed_manager.relation_embedding_store.search_top_k(
-            question_embedding,
-            global_config.lpmm_knowledge.qa_relation_search_top_k,
+        relation_search_res, paragraph_search_res = await asyncio.gather(
+            self.embed_manager.relation_embedding_store.search_top_k_async(
+                question_embedding,
+                global_config.lpmm_knowledge.qa_relation_search_top_k,
+            ),
+            self.embed_manager.paragraphs_embedding_store.search_top_k_async(
+                question_embedding,
+                global_config.lpmm_knowledge.qa_paragraph_search_top_k,
+            ),
         )
+        part_end_time = time.perf_counter()
+        logger.debug(f"关系与文段检索用时：{part_end_time - part_start_time:.5f}s")
         if relation_search_res is None:
             return None
         # 过滤阈值
@@ -54,9 +86,6 @@ class QAManager:
             logger.debug("未找到相关关系，跳过关系检索")
             relation_search_res = []
 
-        part_end_time = time.perf_counter()
-        logger.debug(f"关系检索用时：{part_end_time - part_start_time:.5f}s")
-
         for res in relation_search_res:
             if store_item := self.embed_manager.relation_embedding_store.store.get(res[0]):
                 rel_str = store_item.str
@@ -66,21 +95,12 @@ class QAManager:
         # logger.info(f"LLM过滤三元组用时：{time.time() - part_start_time:.2f}s")
         # part_start_time = time.time()
 
-        # 根据问题Embedding查询Paragraph Embedding库
-        part_start_time = time.perf_counter()
-        paragraph_search_res = self.embed_manager.paragraphs_embedding_store.search_top_k(
-            question_embedding,
-            global_config.lpmm_knowledge.qa_paragraph_search_top_k,
-        )
-        part_end_time = time.perf_counter()
-        logger.debug(f"文段检索用时：{part_end_time - part_start_time:.5f}s")
-
         if len(relation_search_res) != 0:
             logger.info("找到相关关系，将使用RAG进行检索")
-            # 使用KG检索
+            # 使用KG检索（快照构建与PPR在线程池中执行，不阻塞其他聊天）
             part_start_time = time.perf_counter()
-            result, ppr_node_weights = self.kg_manager.kg_search(
-                relation_search_res, paragraph_search_res, self.embed_manager
+            result, ppr_node_weights = await asyncio.to_thread(
+                self.kg_manager.kg_search, relation_search_res, paragraph_search_res, self.embed_manager
             )
             part_end_time = time.perf_counter()
             logger.info(f"RAG检索用时：{part_end_time - part_start_time:.5f}s")
@@ -99,29 +119,53 @@ class QAManager:
         return result, ppr_node_weights
 
     async def get_knowledge(self, question: str) -> Optional[str]:
-        """获取知识"""
-        # 处理查询
-        processed_result = await self.process_query(question)
-        if processed_result is not None:
-            query_res = processed_result[0]
-            # 检查查询结果是否为空
-            if not query_res:
-                logger.debug("知识库查询结果为空，可能是知识库中没有相关内容")
-                return None
+        """获取知识
+
+        结果按问题文本与问题Embedding缓存，知识库变化后缓存失效。
+        """
+        data_version = self.data_version
+        self.cache.check_version(data_version)
+        hit, knowledge = self.cache.get_exact(question)
+        if hit:
+            logger.debug("知识查询命中缓存（问题文本相同）")
+            return knowledge
+
+        question_embedding = await self._get_question_embedding(question)
+        if question_embedding is None:
+            return None
+        hit, knowledge = self.cache.get_semantic(question, question_embedding)
+        if hit:
+            logger.debug("知识查询命中缓存（问题语义相近）")
+            return knowledge
 
-            knowledge = [
-                (
-                    self.embed_manager.paragraphs_embedding_store.store[res[0]].str,
-                    res[1],
-                )
-                for res in query_res
-            ]
-            found_knowledge = "\n".join(
-                [f"第{i + 1}条知识：{k[0]}\n 该条知识对于问题的相关性：{k[1]}" for i, k in enumerate(knowledge)]
-            )
-            if len(found_knowledge) > MAX_KNOWLEDGE_LENGTH:
-                found_knowledge = found_knowledge[:MAX_KNOWLEDGE_LENGTH] + "\n"
-            return found_knowledge
-        else:
+        # 处理查询
+        processed_result = await self.process_query(question, question_embedding)
+        if processed_result is None:
             logger.debug("LPMM知识库并未初始化，可能是从未导入过知识...")
             return None
+        knowledge = self._format_knowledge(processed_result[0])
+        # 查询期间知识库发生变化时，结果可能对应旧的知识库，不写入缓存
+        if self.data_version == data_version:
+            self.cache.put(question, question_embedding, knowledge)
+        return knowledge
+
+    def _format_knowledge(self, query_res: List[Tuple[str, float, float]]) -> Optional[str]:
+        """把查询结果拼接为知识文本"""
+        # 检查查询结果是否为空
+        if not query_res:
+            logger.debug("知识库查询结果为空，可能是知识库中没有相关内容")
+            return None
+
+        knowledge = [
+            (
+                self.embed_manager.paragraphs_embedding_store.store[res[0]].str,
+                res[1],
+            )
+            for res in query_res
+        ]
+        found_knowledge = "\n".join(
+            [f"第{i + 1}条知识：{k[0]}\n 该条知识对于问题的相关性：{k[1]}" for i, k in enumerate(knowledge)]
+        )
+        if len(found_knowledge) > MAX_KNOWLEDGE_LENGTH:
+            found_knowledge = found_knowledge[:MAX_KNOWLEDGE_LENGTH] + "\n"
+        return found_knowledge
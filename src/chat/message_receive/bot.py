@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional
 from maim_message import UserInfo, Seg, GroupInfo
 
 from src.common.logger import get_logger
+from src.common.database.db_executor import db_write
 from src.config.config import global_config
 from src.mood.mood_manager import mood_manager  # 导入情绪管理器
 from src.chat.message_receive.chat_stream import get_chat_manager
@@ -211,7 +212,7 @@ class ChatBot:
             return
         mmc_message_id = message_data.get("echo")
         actual_message_id = message_data.get("actual_id")
-        if MessageStorage.update_message(mmc_message_id, actual_message_id):
+        if await db_write(MessageStorage.update_message, mmc_message_id, actual_message_id):
             logger.debug(f"更新消息ID成功: {mmc_message_id} -> {actual_message_id}")
         else:
             logger.warning(f"更新消息ID失败: {mmc_message_id} -> {actual_message_id}")
@@ -9,6 +9,7 @@ from maim_message import GroupInfo, UserInfo
 from src.common.logger import get_logger
 from src.common.database.database import db
 from src.common.database.database_model import ChatStreams  # 新增导入
+from src.common.database.db_executor import db_read, db_write
 
 # 避免循环导入，使用TYPE_CHECKING进行类型提示
 if TYPE_CHECKING:
@@ -233,7 +234,7 @@ class ChatManager:
             def _db_find_stream_sync(s_id: str):
                 return ChatStreams.get_or_none(ChatStreams.stream_id == s_id)
 
-            model_instance = await asyncio.to_thread(_db_find_stream_sync, stream_id)
+            model_instance = await db_read(_db_find_stream_sync, stream_id, call_site="ChatManager.get_or_create_stream")
 
             if model_instance:
                 # 从 Peewee 模型转换回 ChatStream.from_dict 期望的格式
@@ -345,7 +346,7 @@ class ChatManager:
             ChatStreams.replace(stream_id=s_data_dict["stream_id"], **fields_to_save).execute()
 
         try:
-            await asyncio.to_thread(_db_save_stream_sync, stream_data_dict)
+            await db_write(_db_save_stream_sync, stream_data_dict, call_site="ChatManager._save_stream")
             stream.saved = True
         except Exception as e:
             logger.error(f"保存聊天流 {stream.stream_id} 到数据库失败 (Peewee): {e}", exc_info=True)
@@ -388,7 +389,7 @@ class ChatManager:
             return loaded_streams_data
 
         try:
-            all_streams_data_list = await asyncio.to_thread(_db_load_all_streams_sync)
+            all_streams_data_list = await db_read(_db_load_all_streams_sync, call_site="ChatManager.load_all_streams")
             self.streams.clear()
             for data in all_streams_data_list:
                 stream = ChatStream.from_dict(data)
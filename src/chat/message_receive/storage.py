@@ -4,6 +4,9 @@ import traceback
 from typing import Union
 
 from src.common.database.database_model import Messages, Images
+from src.common.database.db_executor import db_write
+from src.common.database.write_behind import write_behind_queue
+from src.common.message_repository import message_cache
 from src.common.logger import get_logger
 from .chat_stream import ChatStream
 from .message import MessageSending, MessageRecv
@@ -31,7 +34,19 @@ class MessageStorage:
 
     @staticmethod
     async def store_message(message: Union[MessageSending, MessageRecv], chat_stream: ChatStream) -> None:
-        """存储消息到数据库"""
+        """存储消息到数据库
+
+        批量写入模式下直接放入写回队列（消息中含图片描述时需要查询图片表，仍交给写线程）；
+        逐条写入模式下在数据库写线程中执行。两种情况下返回后都能立即读到这条消息。
+        """
+        if write_behind_queue.enabled and "[图片：" not in (message.processed_plain_text or ""):
+            MessageStorage._store_message_sync(message, chat_stream)
+            return
+        await db_write(MessageStorage._store_message_sync, message, chat_stream, call_site="storage.store_message")
+
+    @staticmethod
+    def _store_message_sync(message: Union[MessageSending, MessageRecv], chat_stream: ChatStream) -> None:
+        """存储消息到数据库的同步实现"""
         try:
             pattern = r"<MainRule>.*?</MainRule>|<schedule>.*?</schedule>|<UserMessage>.*?</UserMessage>"
 
@@ -96,7 +111,7 @@ class MessageStorage:
             # 安全地获取 user_info, 如果为 None 则视为空字典 (以防万一)
             user_info_from_chat = chat_info_dict.get("user_info") or {}
 
-            Messages.create(
+            message_fields = dict(
                 message_id=msg_id,
                 time=float(message.message_info.time),  # type: ignore
                 chat_id=chat_stream.stream_id,
@@ -135,6 +150,12 @@ class MessageStorage:
                 key_words_lite=key_words_lite,
                 selected_expressions=selected_expressions,
             )
+            if write_behind_queue.enabled:
+                message_data = write_behind_queue.add(Messages, message_fields)
+            else:
+                message_data = Messages.create(**message_fields).__data__
+            # 同步写入最近消息缓存，保证随后的读取能立即看到这条消息
+            message_cache.add(message_data)
         except Exception:
             logger.exception("存储消息失败")
             logger.error(f"消息：{message}")
@@ -148,11 +169,13 @@ class MessageStorage:
             if not qq_message_id:
                 logger.info("消息不存在message_id，无法更新")
                 return False
+            write_behind_queue.flush(Messages)
             if matched_message := (
                 Messages.select().where((Messages.message_id == mmc_message_id)).order_by(Messages.time.desc()).first()
             ):
                 # 更新找到的消息记录
                 Messages.update(message_id=qq_message_id).where(Messages.id == matched_message.id).execute()  # type: ignore
+                message_cache.update_message_id(matched_message.chat_id, matched_message.id, qq_message_id)  # type: ignore
                 logger.debug(f"更新消息ID成功: {matched_message.message_id} -> {qq_message_id}")
                 return True
             else:
@@ -1,6 +1,9 @@
 import asyncio
+import time
 import traceback
 
+from typing import Optional
+
 from rich.traceback import install
 from maim_message import Seg
 
@@ -40,7 +43,13 @@ class UniversalMessageSender:
         self.storage = MessageStorage()
 
     async def send_message(
-        self, message: MessageSending, typing=False, set_reply=False, storage_message=True, show_log=True
+        self,
+        message: MessageSending,
+        typing=False,
+        set_reply=False,
+        storage_message=True,
+        show_log=True,
+        typing_since: Optional[float] = None,
     ):
         """
         处理、发送并存储一条消息。
@@ -48,6 +57,7 @@ class UniversalMessageSender:
         参数：
             message: MessageSending 对象，待发送的消息。
             typing: 是否模拟打字等待。
+            typing_since: 开始“打字”的时间戳（可选）。流式回复中等待模型生成这句话的时间计入打字等待。
 
         用法：
             - typing=True 时，发送前会有打字等待。
@@ -103,7 +113,10 @@ class UniversalMessageSender:
                     thinking_start_time=message.thinking_start_time,
                     is_emoji=message.is_emoji,
                 )
-                await asyncio.sleep(typing_time)
+                if typing_since is not None:
+                    typing_time -= time.time() - typing_since
+                if typing_time > 0:
+                    await asyncio.sleep(typing_time)
 
             sent_msg = await _send_message(message, show_log=show_log)
             if not sent_msg:
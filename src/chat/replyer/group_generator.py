@@ -4,7 +4,7 @@ import asyncio
 import random
 import re
 
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Callable, List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from src.memory_system.Memory_chest import global_memory_chest
 from src.memory_system.questions import global_conflict_tracker
@@ -73,6 +73,7 @@ class DefaultReplyer:
         stream_id: Optional[str] = None,
         reply_message: Optional[DatabaseMessages] = None,
         reply_time_point: Optional[float] = time.time(),
+        content_callback: Optional[Callable[[str], None]] = None,
     ) -> Tuple[bool, LLMGenerationDataModel]:
         # sourcery skip: merge-nested-ifs
         """
@@ -86,6 +87,7 @@ class DefaultReplyer:
             chosen_actions: 已选动作
             enable_tool: 是否启用工具调用
             from_plugin: 是否来自插件
+            content_callback: 流式输出回调（可选），提供时边生成边回调回复内容的增量
 
         Returns:
             Tuple[bool, Optional[Dict[str, Any]], Optional[str]]: (是否成功, 生成的回复, 使用的prompt)
@@ -132,7 +134,9 @@ class DefaultReplyer:
             model_name = "unknown_model"
 
             try:
-                content, reasoning_content, model_name, tool_call = await self.llm_generate_content(prompt)
+                content, reasoning_content, model_name, tool_call = await self.llm_generate_content(
+                    prompt, content_callback=content_callback
+                )
                 # logger.debug(f"replyer生成内容: {content}")
                 
                 logger.info(f"replyer生成内容: {content}")
@@ -154,6 +158,8 @@ class DefaultReplyer:
                         logger.warning("警告：插件在内容生成后才修改了prompt，此修改不会生效")
                         llm_response.prompt = modified_message.llm_prompt  # 虽然我不知道为什么在这里需要改prompt
                     if modified_message._modify_flags.modify_llm_response_content:
+                        if content_callback:
+                            logger.warning("警告：流式回复在生成过程中已经发出，插件对回复内容的修改不会生效")
                         llm_response.content = modified_message.llm_response_content
                     if modified_message._modify_flags.modify_llm_response_reasoning:
                         llm_response.reasoning = modified_message.llm_response_reasoning
@@ -996,7 +1002,7 @@ class DefaultReplyer:
             display_message=display_message,
         )
 
-    async def llm_generate_content(self, prompt: str):
+    async def llm_generate_content(self, prompt: str, content_callback: Optional[Callable[[str], None]] = None):
         with Timer("LLM生成", {}):  # 内部计时器，可选保留
             # 直接使用已初始化的模型实例
             # logger.info(f"\n{prompt}\n")
@@ -1007,7 +1013,7 @@ class DefaultReplyer:
                 logger.debug(f"\nreplyer_Prompt:{prompt}\n")
 
             content, (reasoning_content, model_name, tool_calls) = await self.express_model.generate_response_async(
-                prompt
+                prompt, content_callback=content_callback
             )
 
             # 移除 content 前后的换行符和空格
@@ -7,12 +7,12 @@ from rich.traceback import install
 
 from src.config.config import global_config
 from src.common.logger import get_logger
-from src.common.message_repository import find_messages, count_messages
+from src.common.message_repository import find_messages, find_messages_async, count_messages
 from src.common.data_models.database_data_model import DatabaseMessages, DatabaseActionRecords
 from src.common.data_models.message_data_model import MessageAndActionModel
 from src.common.database.database_model import ActionRecords
 from src.common.database.database_model import Images
-from src.person_info.person_info import Person, get_person_id
+from src.person_info.person_info import Person, get_person_id, person_info_manager
 from src.chat.utils.utils import translate_timestamp_to_human_readable, assign_message_ids
 
 install(extra_lines=3)
@@ -140,6 +140,28 @@ def get_raw_msg_by_timestamp_with_chat(
     )
 
 
+async def get_raw_msg_by_timestamp_with_chat_async(
+    chat_id: str,
+    timestamp_start: float,
+    timestamp_end: float,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    filter_bot=False,
+    filter_command=False,
+) -> List[DatabaseMessages]:
+    """get_raw_msg_by_timestamp_with_chat 的异步版本，缓存未命中时在数据库读线程中查询"""
+    filter_query = {"chat_id": chat_id, "time": {"$gt": timestamp_start, "$lt": timestamp_end}}
+    sort_order = [("time", 1)] if limit == 0 else None
+    return await find_messages_async(
+        message_filter=filter_query,
+        sort=sort_order,
+        limit=limit,
+        limit_mode=limit_mode,
+        filter_bot=filter_bot,
+        filter_command=filter_command,
+    )
+
+
 def get_raw_msg_by_timestamp_with_chat_inclusive(
     chat_id: str,
     timestamp_start: float,
@@ -408,6 +430,16 @@ def _build_readable_messages_internal(
 
         return re.sub(pic_pattern, replace_pic_id, content)
 
+    # 批量解析发送者，避免逐条消息查询数据库
+    user_ids_by_platform: Dict[str, List[str]] = {}
+    for message in messages:
+        if not message.is_action_record and message.user_platform and message.user_id:
+            user_ids_by_platform.setdefault(message.user_platform, []).append(message.user_id)
+    persons: Dict[Tuple[str, str], Person] = {}
+    for platform, user_ids in user_ids_by_platform.items():
+        for user_id, person in person_info_manager.get_persons(platform, user_ids).items():
+            persons[(platform, user_id)] = person
+
     # 1: 获取发送者信息并提取消息组件
     for message in messages:
         if message.is_action_record:
@@ -432,7 +464,7 @@ def _build_readable_messages_internal(
         if not all([platform, user_id, timestamp is not None]):
             continue
 
-        person = Person(platform=platform, user_id=user_id)
+        person = persons.get((platform, user_id)) or Person(platform=platform, user_id=user_id)
         # 根据 replace_bot_name 参数决定是否替换机器人名称
         person_name = (
             person.person_name or f"{user_nickname}" or (f"昵称：{user_cardname}" if user_cardname else "某人")
@@ -8,6 +8,11 @@ from typing import Any, Dict, Tuple, List
 from src.common.logger import get_logger
 from src.common.database.database import db
 from src.common.database.database_model import OnlineTime, LLMUsage, Messages
+from src.common.message_repository import message_cache
+from src.common.database.db_executor import db_executor
+from src.common.database.write_behind import write_behind_queue
+from src.llm_models.model_health import CIRCUIT_STATE_DISPLAY_NAMES, model_health
+from src.llm_models.scheduler import PRIORITY_DISPLAY_NAMES, llm_scheduler
 from src.manager.async_task_manager import AsyncTask
 from src.manager.local_store_manager import local_storage
 
@@ -192,12 +197,89 @@ class StatisticOutputTask(AsyncTask):
             self._format_model_classified_stat(stats["last_hour"]),
             "",
             self._format_chat_stat(stats["last_hour"]),
+            "",
+            self._format_message_cache_stat(),
+            self._format_lpmm_cache_stat(),
+            self._format_db_executor_stat(),
+            self._format_llm_scheduler_stat(),
+            self._format_model_health_stat(),
             self.SEP_LINE,
             "",
         ]
 
         logger.info("\n" + "\n".join(output))
 
+    @staticmethod
+    def _format_message_cache_stat() -> str:
+        """格式化最近消息缓存的命中统计（自启动以来）"""
+        cache_stats = message_cache.get_stats()
+        return (
+            f"最近消息缓存: 命中 {cache_stats['hits']} 次, 回落数据库 {cache_stats['misses']} 次, "
+            f"命中率 {cache_stats['hit_rate']:.1%}, 已缓存聊天 {cache_stats['cached_chats']} 个"
+        )
+
+    @staticmethod
+    def _format_lpmm_cache_stat() -> str:
+        """格式化LPMM知识查询缓存的命中统计（自启动以来）"""
+        from src.chat import knowledge
+
+        if knowledge.qa_manager is None:
+            return "知识查询缓存: LPMM知识库未启用"
+        cache_stats = knowledge.qa_manager.cache.get_stats()
+        return (
+            f"知识查询缓存: 精确命中 {cache_stats['exact_hits']} 次, 语义命中 {cache_stats['semantic_hits']} 次, "
+            f"未命中 {cache_stats['misses']} 次, 命中率 {cache_stats['hit_rate']:.1%}, "
+            f"已缓存 {cache_stats['size']} 条, 因知识库更新失效 {cache_stats['invalidations']} 次"
+        )
+
+    @staticmethod
+    def _format_llm_scheduler_stat() -> str:
+        """格式化LLM请求调度器各优先级的排队时间与各提供商的队列状态（自启动以来）"""
+        scheduler_stats = llm_scheduler.get_stats()
+        lines = ["LLM请求排队:"]
+        for priority, stat in scheduler_stats["priorities"].items():
+            lines.append(
+                f"  {PRIORITY_DISPLAY_NAMES[priority]}: {stat['count']} 次, 排队 平均 {stat['avg_wait'] * 1000:.1f}ms"
+                f" / P95 {stat['p95_wait'] * 1000:.1f}ms / 最大 {stat['max_wait'] * 1000:.1f}ms"
+            )
+        for name, stat in scheduler_stats["providers"].items():
+            limit = stat["max_concurrency"] or "不限"
+            lines.append(
+                f"  提供商 {name}: 进行中 {stat['active']}/{limit}, 排队中 {stat['queued']}, 收到429 {stat['rate_limited']} 次"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_model_health_stat() -> str:
+        """格式化各模型的耗时、失败率与熔断状态（自启动以来）"""
+        lines = ["模型健康状态:"]
+        for name, stat in sorted(model_health.get_stats().items()):
+            latency = f"{stat['latency']:.2f}s" if stat["latency"] is not None else "-"
+            lines.append(
+                f"  {name}: {CIRCUIT_STATE_DISPLAY_NAMES[stat['state']]}, 耗时EWMA {latency}, "
+                f"失败率 {stat['error_rate']:.1%}, 请求 {stat['requests']} 次 / 失败 {stat['failures']} 次, "
+                f"熔断 {stat['trips']} 次"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_db_executor_stat(top_n: int = 5) -> str:
+        """格式化数据库执行器的调用点耗时与事件循环延迟（自启动以来）"""
+        db_stats = db_executor.get_stats()
+        write_stats = write_behind_queue.get_stats()
+        lines = [
+            f"批量写入: {write_stats['batches']} 批 / {write_stats['rows_written']} 行, 待写入 {write_stats['pending_rows']} 行",
+            f"事件循环延迟: 平均 {db_stats['loop_lag_avg'] * 1000:.1f}ms, 最大 {db_stats['loop_lag_max'] * 1000:.1f}ms",
+            "数据库调用（已移出事件循环）:",
+        ]
+        call_sites = sorted(db_stats["call_sites"].items(), key=lambda item: item[1]["total_exec_time"], reverse=True)
+        for name, stat in call_sites[:top_n]:
+            lines.append(
+                f"  {name}: {stat['count']} 次, 执行 平均 {stat['avg_exec_time'] * 1000:.1f}ms"
+                f" / 最大 {stat['max_exec_time'] * 1000:.1f}ms, 排队 平均 {stat['avg_wait_time'] * 1000:.1f}ms"
+            )
+        return "\n".join(lines)
+
     async def run(self):
         try:
             now = datetime.now()
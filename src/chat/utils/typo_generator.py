@@ -5,18 +5,168 @@
 import json
 import math
 import os
+import pickle
 import random
+import threading
 import time
 import jieba
 
 from collections import defaultdict
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 from pypinyin import Style, pinyin
 
 from src.common.logger import get_logger
 
 logger = get_logger("typo_gen")
 
+# 预计算查找表的磁盘缓存，格式变化时需要提升版本号
+TYPO_TABLES_CACHE_FILE = Path("data/typo_generator_tables.pkl")
+TYPO_TABLES_CACHE_VERSION = 1
+
+
+class TypoTables:
+    """
+    错别字生成所需的只读查找表，进程内只构建一次
+
+    pinyin_dict: 拼音 -> 汉字列表
+    char_frequency: 汉字 -> 归一化字频
+    word_frequency: jieba 词典中的词 -> 词频
+    word_pinyin_index: 多字词各字拼音组成的序列 -> 词列表，用于直接查出同音词
+    """
+
+    def __init__(
+        self,
+        pinyin_dict: Dict[str, List[str]],
+        char_frequency: Dict[str, float],
+        word_frequency: Dict[str, float],
+        word_pinyin_index: Dict[Tuple[str, ...], List[str]],
+    ):
+        self.pinyin_dict = pinyin_dict
+        self.char_frequency = char_frequency
+        self.word_frequency = word_frequency
+        self.word_pinyin_index = word_pinyin_index
+
+
+_typo_tables: Optional[TypoTables] = None
+_typo_tables_lock = threading.Lock()
+_typo_generator: Optional["ChineseTypoGenerator"] = None
+
+
+def _jieba_dict_path() -> str:
+    return os.path.join(os.path.dirname(jieba.__file__), "dict.txt")
+
+
+def _jieba_dict_signature() -> Tuple[int, float]:
+    """jieba 词典的大小与修改时间，用于判断磁盘缓存是否过期"""
+    stat = os.stat(_jieba_dict_path())
+    return stat.st_size, stat.st_mtime
+
+
+def _build_typo_tables() -> TypoTables:
+    """从 pypinyin 与 jieba 词典构建全部查找表"""
+    pinyin_dict = ChineseTypoGenerator._create_pinyin_dict()
+    char_frequency = ChineseTypoGenerator._load_or_create_char_frequency()
+
+    # 每个汉字的默认读音，与 pinyin_dict 的构建方式一致
+    char_pinyin = {char: py for py, chars in pinyin_dict.items() for char in chars}
+
+    word_frequency: Dict[str, float] = {}
+    word_pinyin_index: Dict[Tuple[str, ...], List[str]] = defaultdict(list)
+    with open(_jieba_dict_path(), "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) < 2:
+                continue
+            word_text = parts[0]
+            word_frequency[word_text] = float(parts[1])
+            if len(word_text) < 2:
+                continue
+            key = tuple(char_pinyin.get(char, "") for char in word_text)
+            if all(key):
+                word_pinyin_index[key].append(word_text)
+
+    return TypoTables(dict(pinyin_dict), char_frequency, word_frequency, dict(word_pinyin_index))
+
+
+def _load_or_build_typo_tables() -> TypoTables:
+    """优先从磁盘缓存加载查找表，缓存缺失或过期时重新构建并写回"""
+    signature = _jieba_dict_signature()
+    if TYPO_TABLES_CACHE_FILE.exists():
+        try:
+            with open(TYPO_TABLES_CACHE_FILE, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("version") == TYPO_TABLES_CACHE_VERSION and cached.get("jieba_dict") == signature:
+                return TypoTables(
+                    cached["pinyin_dict"],
+                    cached["char_frequency"],
+                    cached["word_frequency"],
+                    cached["word_pinyin_index"],
+                )
+            logger.info("错别字查找表缓存已过期，重新构建")
+        except Exception as e:
+            logger.warning(f"读取错别字查找表缓存失败，重新构建: {e}")
+
+    start_time = time.time()
+    tables = _build_typo_tables()
+    logger.info(f"错别字查找表构建完成，耗时 {time.time() - start_time:.2f} 秒")
+
+    try:
+        TYPO_TABLES_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = TYPO_TABLES_CACHE_FILE.with_suffix(".tmp")
+        with open(tmp_file, "wb") as f:
+            pickle.dump(
+                {
+                    "version": TYPO_TABLES_CACHE_VERSION,
+                    "jieba_dict": signature,
+                    "pinyin_dict": tables.pinyin_dict,
+                    "char_frequency": tables.char_frequency,
+                    "word_frequency": tables.word_frequency,
+                    "word_pinyin_index": tables.word_pinyin_index,
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_file, TYPO_TABLES_CACHE_FILE)
+    except Exception as e:
+        logger.warning(f"保存错别字查找表缓存失败: {e}")
+
+    return tables
+
+
+def get_typo_tables() -> TypoTables:
+    """获取进程内共享的查找表，首次调用时加载"""
+    global _typo_tables
+    if _typo_tables is None:
+        with _typo_tables_lock:
+            if _typo_tables is None:
+                _typo_tables = _load_or_build_typo_tables()
+    return _typo_tables
+
+
+def get_typo_generator(
+    error_rate=0.3, min_freq=5, tone_error_rate=0.2, word_replace_rate=0.3, max_freq_diff=200
+) -> "ChineseTypoGenerator":
+    """
+    获取进程内共享的错别字生成器，参数每次调用时更新以便跟随配置热重载
+    """
+    global _typo_generator
+    if _typo_generator is None:
+        _typo_generator = ChineseTypoGenerator(
+            error_rate=error_rate,
+            min_freq=min_freq,
+            tone_error_rate=tone_error_rate,
+            word_replace_rate=word_replace_rate,
+            max_freq_diff=max_freq_diff,
+        )
+    else:
+        _typo_generator.error_rate = error_rate
+        _typo_generator.min_freq = min_freq
+        _typo_generator.tone_error_rate = tone_error_rate
+        _typo_generator.word_replace_rate = word_replace_rate
+        _typo_generator.max_freq_diff = max_freq_diff
+    return _typo_generator
+
 
 class ChineseTypoGenerator:
     def __init__(self, error_rate=0.3, min_freq=5, tone_error_rate=0.2, word_replace_rate=0.3, max_freq_diff=200):
@@ -36,14 +186,15 @@ class ChineseTypoGenerator:
         self.word_replace_rate = word_replace_rate
         self.max_freq_diff = max_freq_diff
 
-        # 加载数据
-        # print("正在加载汉字数据库，请稍候...")
-        # logger.info("正在加载汉字数据库，请稍候...")
+        # 加载数据（查找表在进程内共享，只在首次使用时构建）
+        tables = get_typo_tables()
+        self.pinyin_dict = tables.pinyin_dict
+        self.char_frequency = tables.char_frequency
+        self.word_frequency = tables.word_frequency
+        self.word_pinyin_index = tables.word_pinyin_index
 
-        self.pinyin_dict = self._create_pinyin_dict()
-        self.char_frequency = self._load_or_create_char_frequency()
-
-    def _load_or_create_char_frequency(self):
+    @staticmethod
+    def _load_or_create_char_frequency():
         """
         加载或创建汉字频率字典
         """
@@ -64,7 +215,7 @@ class ChineseTypoGenerator:
                 word, freq = line.strip().split()[:2]
                 # 对词中的每个字进行频率累加
                 for char in word:
-                    if self._is_chinese_char(char):
+                    if ChineseTypoGenerator._is_chinese_char(char):
                         char_freq[char] += int(freq)
 
         # 归一化频率值
@@ -235,43 +386,21 @@ class ChineseTypoGenerator:
         if len(word) == 1:
             return []
 
-        # 获取词的拼音
+        # 获取词的拼音，并从预建索引中直接取出同音词
         word_pinyin = self._get_word_pinyin(word)
-
-        # 遍历所有可能的同音字组合
-        candidates = []
-        for py in word_pinyin:
-            chars = self.pinyin_dict.get(py, [])
-            if not chars:
-                return []
-            candidates.append(chars)
-
-        # 生成所有可能的组合
-        import itertools
-
-        all_combinations = itertools.product(*candidates)
-
-        # 获取jieba词典和词频信息
-        dict_path = os.path.join(os.path.dirname(jieba.__file__), "dict.txt")
-        valid_words = {}  # 改用字典存储词语及其频率
-        with open(dict_path, "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) >= 2:
-                    word_text = parts[0]
-                    word_freq = float(parts[1])  # 获取词频
-                    valid_words[word_text] = word_freq
+        candidate_words = self.word_pinyin_index.get(tuple(word_pinyin), [])
+        if not candidate_words:
+            return []
 
         # 获取原词的词频作为参考
-        original_word_freq = valid_words.get(word, 0)
+        original_word_freq = self.word_frequency.get(word, 0)
         min_word_freq = original_word_freq * 0.1  # 设置最小词频为原词频的10%
 
         # 过滤和计算频率
         homophones = []
-        for combo in all_combinations:
-            new_word = "".join(combo)
-            if new_word != word and new_word in valid_words:
-                new_word_freq = valid_words[new_word]
+        for new_word in candidate_words:
+            if new_word != word:
+                new_word_freq = self.word_frequency[new_word]
                 # 只保留词频达到阈值的词
                 if new_word_freq >= min_word_freq:
                     # 计算词的平均字频（考虑字频和词频）
@@ -449,7 +578,7 @@ class ChineseTypoGenerator:
 
 def main():
     # 创建错别字生成器实例
-    typo_generator = ChineseTypoGenerator(error_rate=0.03, min_freq=7, tone_error_rate=0.02, word_replace_rate=0.3)
+    typo_generator = get_typo_generator(error_rate=0.03, min_freq=7, tone_error_rate=0.02, word_replace_rate=0.3)
 
     # 获取用户输入
     sentence = input("请输入中文句子：")
@@ -7,7 +7,7 @@ import ast
 import numpy as np
 
 from collections import Counter
-from typing import Optional, Tuple, List, TYPE_CHECKING
+from typing import Optional, Tuple, List, Dict, TYPE_CHECKING
 
 from src.common.logger import get_logger
 from src.common.data_models.database_data_model import DatabaseMessages
@@ -17,7 +17,7 @@ from src.chat.message_receive.message import MessageRecv
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.llm_models.utils_model import LLMRequest
 from src.person_info.person_info import Person
-from .typo_generator import ChineseTypoGenerator
+from .typo_generator import get_typo_generator
 
 if TYPE_CHECKING:
     from src.common.data_models.info_data_model import TargetPersonInfo
@@ -173,18 +173,41 @@ def is_mentioned_bot_in_message(message: MessageRecv) -> tuple[bool, bool, float
     return is_mentioned, is_at, reply_probability
 
 
+_embedding_requests: Dict[str, LLMRequest] = {}
+
+
+def get_embedding_request(request_type: str = "embedding") -> LLMRequest:
+    """获取共享的嵌入模型请求实例
+
+    模型客户端按事件循环复用，因此同一个实例可以在不同线程各自的事件循环中使用。
+    """
+    if request_type not in _embedding_requests:
+        _embedding_requests[request_type] = LLMRequest(
+            model_set=model_config.model_task_config.embedding, request_type=request_type
+        )
+    return _embedding_requests[request_type]
+
+
 async def get_embedding(text, request_type="embedding") -> Optional[List[float]]:
     """获取文本的embedding向量"""
-    # 每次都创建新的LLMRequest实例以避免事件循环冲突
-    llm = LLMRequest(model_set=model_config.model_task_config.embedding, request_type=request_type)
     try:
-        embedding, _ = await llm.get_embedding(text)
+        embedding, _ = await get_embedding_request(request_type).get_embedding(text)
     except Exception as e:
         logger.error(f"获取embedding失败: {str(e)}")
         embedding = None
     return embedding
 
 
+async def get_embeddings(texts: List[str], request_type="embedding") -> Optional[List[List[float]]]:
+    """批量获取文本的embedding向量，结果与输入顺序一致"""
+    try:
+        embeddings, _ = await get_embedding_request(request_type).get_embeddings(texts)
+    except Exception as e:
+        logger.error(f"批量获取embedding失败: {str(e)}")
+        return None
+    return embeddings
+
+
 
 def split_into_sentences_w_remove_punctuation(text: str) -> list[str]:
     """将文本分割成句子，并根据概率合并
@@ -328,10 +351,8 @@ def random_remove_punctuation(text: str) -> str:
     return result
 
 
-def process_llm_response(text: str, enable_splitter: bool = True, enable_chinese_typo: bool = True) -> list[str]:
-    if not global_config.response_post_process.enable_response_post_process:
-        return [text]
-
+def _clean_llm_response(text: str) -> Tuple[str, Dict[str, str]]:
+    """保护颜文字并去除被括号包裹且包含中文的内容，返回 (清理后的文本, 颜文字占位符映射)"""
     # 先保护颜文字
     if global_config.response_splitter.enable_kaomoji_protection:
         protected_text, kaomoji_mapping = protect_kaomoji(text)
@@ -344,26 +365,22 @@ def process_llm_response(text: str, enable_splitter: bool = True, enable_chinese
     _extracted_contents = pattern.findall(protected_text)  # 在保护后的文本上查找
     # 去除 () 和 [] 及其包裹的内容
     cleaned_text = pattern.sub("", protected_text)
-
-    if cleaned_text == "":
-        return ["呃呃"]
-
-    logger.debug(f"{text}去除括号处理后的文本: {cleaned_text}")
-
-    # 对清理后的文本进行进一步处理
-    max_length = global_config.response_splitter.max_length * 2
-    max_sentence_num = global_config.response_splitter.max_sentence_num
-    # 如果基本上是中文，则进行长度过滤
-    if get_western_ratio(cleaned_text) < 0.1 and len(cleaned_text) > max_length:
-        logger.warning(f"回复过长 ({len(cleaned_text)} 字符)，返回默认回复")
-        return ["懒得说"]
-
-    typo_generator = ChineseTypoGenerator(
-        error_rate=global_config.chinese_typo.error_rate,
-        min_freq=global_config.chinese_typo.min_freq,
-        tone_error_rate=global_config.chinese_typo.tone_error_rate,
-        word_replace_rate=global_config.chinese_typo.word_replace_rate,
-    )
+    return cleaned_text, kaomoji_mapping
+
+
+def _split_llm_response(
+    cleaned_text: str, kaomoji_mapping: Dict[str, str], enable_splitter: bool, enable_chinese_typo: bool
+) -> List[str]:
+    """对清理后的文本分句、生成错别字并恢复颜文字"""
+    # 仅在启用错别字时获取共享的生成器，首次使用时才会加载查找表
+    typo_generator = None
+    if global_config.chinese_typo.enable and enable_chinese_typo:
+        typo_generator = get_typo_generator(
+            error_rate=global_config.chinese_typo.error_rate,
+            min_freq=global_config.chinese_typo.min_freq,
+            tone_error_rate=global_config.chinese_typo.tone_error_rate,
+            word_replace_rate=global_config.chinese_typo.word_replace_rate,
+        )
 
     if global_config.response_splitter.enable and enable_splitter:
         split_sentences = split_into_sentences_w_remove_punctuation(cleaned_text)
@@ -372,7 +389,7 @@ def process_llm_response(text: str, enable_splitter: bool = True, enable_chinese
 
     sentences: List[str] = []
     for sentence in split_sentences:
-        if global_config.chinese_typo.enable and enable_chinese_typo:
+        if typo_generator is not None:
             typoed_text, typo_corrections = typo_generator.create_typo_sentence(sentence)
             sentences.append(typoed_text)
             if typo_corrections:
@@ -380,6 +397,34 @@ def process_llm_response(text: str, enable_splitter: bool = True, enable_chinese
         else:
             sentences.append(sentence)
 
+    # 在所有句子处理完毕后，对包含占位符的列表进行恢复
+    if global_config.response_splitter.enable_kaomoji_protection:
+        sentences = recover_kaomoji(sentences, kaomoji_mapping)
+
+    return sentences
+
+
+def process_llm_response(text: str, enable_splitter: bool = True, enable_chinese_typo: bool = True) -> list[str]:
+    if not global_config.response_post_process.enable_response_post_process:
+        return [text]
+
+    cleaned_text, kaomoji_mapping = _clean_llm_response(text)
+
+    if cleaned_text == "":
+        return ["呃呃"]
+
+    logger.debug(f"{text}去除括号处理后的文本: {cleaned_text}")
+
+    # 对清理后的文本进行进一步处理
+    max_length = global_config.response_splitter.max_length * 2
+    max_sentence_num = global_config.response_splitter.max_sentence_num
+    # 如果基本上是中文，则进行长度过滤
+    if get_western_ratio(cleaned_text) < 0.1 and len(cleaned_text) > max_length:
+        logger.warning(f"回复过长 ({len(cleaned_text)} 字符)，返回默认回复")
+        return ["懒得说"]
+
+    sentences = _split_llm_response(cleaned_text, kaomoji_mapping, enable_splitter, enable_chinese_typo)
+
     if len(sentences) > max_sentence_num:
         logger.warning(f"分割后消息数量过多 ({len(sentences)} 条)，返回默认回复")
         return [f"{global_config.bot.nickname}不知道哦"]
@@ -388,13 +433,107 @@ def process_llm_response(text: str, enable_splitter: bool = True, enable_chinese
     #     for content in extracted_contents:
     #         sentences.append(content)
 
-    # 在所有句子处理完毕后，对包含占位符的列表进行恢复
-    if global_config.response_splitter.enable_kaomoji_protection:
-        sentences = recover_kaomoji(sentences, kaomoji_mapping)
-
     return sentences
 
 
+STREAM_SENTENCE_ENDINGS = frozenset("。！？!?…~～\n")
+"""流式回复中视为一句话结束的字符"""
+
+_STREAM_OPEN_BRACKETS = frozenset("([（【")
+_STREAM_CLOSE_BRACKETS = frozenset(")]）】")
+
+
+class StreamingResponseSplitter:
+    """流式回复分句器
+
+    逐段接收模型输出的正式内容，在括号外的句末标点处切出已经完整的句子，按 process_llm_response 的规则
+    （去除括号内容、分割、错别字、颜文字保护）处理后返回，调用方可以立即发送，不必等待整段回复生成完毕。
+    回复长度与消息条数的上限按已发出的内容累计检查：已发出的消息无法撤回，超出上限后只是不再输出后续内容。
+    """
+
+    def __init__(self, enable_splitter: bool = True, enable_chinese_typo: bool = True):
+        self.enable_splitter = enable_splitter
+        self.enable_chinese_typo = enable_chinese_typo
+        self.text = ""
+        """收到的完整回复"""
+
+        self.segments: List[str] = []
+        """已输出的消息"""
+
+        self._buffer = ""
+        self._cleaned_length = 0
+        self._stopped = False
+
+    def feed(self, delta: str) -> List[str]:
+        """接收一段模型输出，返回其中已经完整、可以发送的消息"""
+        self.text += delta
+        if not global_config.response_post_process.enable_response_post_process:
+            # 不做后处理时回复作为一条消息发送，只能等待生成完毕
+            return []
+        self._buffer += delta
+        cut = self._find_sentence_end(self._buffer)
+        if not cut:
+            return []
+        chunk, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return self._process(chunk)
+
+    def flush(self) -> List[str]:
+        """生成结束，返回剩余的消息"""
+        chunk, self._buffer = self._buffer, ""
+        if not global_config.response_post_process.enable_response_post_process:
+            segments = [self.text.strip()] if self.text.strip() else []
+            self.segments.extend(segments)
+            return segments
+        segments = self._process(chunk)
+        if not self.segments and self.text.strip():
+            # 一条消息都没有输出（整段回复都在括号内、第一句就超长等），按完整回复的规则处理，得到默认回复
+            segments = process_llm_response(self.text.strip(), self.enable_splitter, self.enable_chinese_typo)
+            self.segments.extend(segments)
+        return segments
+
+    @staticmethod
+    def _find_sentence_end(text: str) -> int:
+        """返回最后一个完整句子之后的位置，没有完整句子时返回0
+
+        句末标点必须位于括号外（避免切开颜文字和括号内容），且其后已经出现了其他字符（连续的标点如“！？”要一起切出）。
+        """
+        depth = 0
+        cut = 0
+        for i, char in enumerate(text):
+            if depth == 0 and i > 0 and text[i - 1] in STREAM_SENTENCE_ENDINGS and char not in STREAM_SENTENCE_ENDINGS:
+                cut = i
+            if char in _STREAM_OPEN_BRACKETS:
+                depth += 1
+            elif char in _STREAM_CLOSE_BRACKETS:
+                depth = max(0, depth - 1)
+        return cut
+
+    def _process(self, chunk: str) -> List[str]:
+        if self._stopped or not chunk.strip():
+            return []
+        cleaned_text, kaomoji_mapping = _clean_llm_response(chunk)
+        if not cleaned_text.strip():
+            return []
+
+        self._cleaned_length += len(cleaned_text)
+        if (
+            get_western_ratio(cleaned_text) < 0.1
+            and self._cleaned_length > global_config.response_splitter.max_length * 2
+        ):
+            logger.warning(f"流式回复过长 ({self._cleaned_length} 字符)，不再发送后续内容")
+            self._stopped = True
+            return []
+
+        sentences = _split_llm_response(cleaned_text, kaomoji_mapping, self.enable_splitter, self.enable_chinese_typo)
+        max_sentence_num = global_config.response_splitter.max_sentence_num
+        if len(self.segments) + len(sentences) > max_sentence_num:
+            logger.warning(f"流式回复消息数量过多，只发送前 {max_sentence_num} 条")
+            self._stopped = True
+            sentences = sentences[: max(0, max_sentence_num - len(self.segments))]
+        self.segments.extend(sentences)
+        return sentences
+
+
 def calculate_typing_time(
     input_string: str,
     thinking_start_time: float,
@@ -13,6 +13,7 @@ from rich.traceback import install
 from src.common.logger import get_logger
 from src.common.database.database import db
 from src.common.database.database_model import Images, ImageDescriptions
+from src.common.database.db_executor import db_write
 from src.config.config import global_config, model_config
 from src.llm_models.utils_model import LLMRequest
 
@@ -473,6 +474,60 @@ class ImageManager:
             logger.error(f"GIF转换失败: {str(e)}", exc_info=True)  # 记录详细错误信息
             return None  # 其他错误也返回None
 
+    def _register_image_sync(self, image_bytes: bytes, image_hash: str) -> Tuple[str, bool]:
+        """登记图片的数据库与文件部分，在数据库写线程中执行
+
+        Returns:
+            Tuple[str, bool]: (图片ID, 是否为新图片)
+        """
+        if existing_image := Images.get_or_none(Images.emoji_hash == image_hash):
+            # 检查是否缺少必要字段，如果缺少则创建新记录
+            if (
+                not hasattr(existing_image, "image_id")
+                or not existing_image.image_id
+                or not hasattr(existing_image, "count")
+                or existing_image.count is None
+                or not hasattr(existing_image, "vlm_processed")
+                or existing_image.vlm_processed is None
+            ):
+                logger.debug(f"图片记录缺少必要字段，补全旧记录: {image_hash}")
+                if not existing_image.image_id:
+                    existing_image.image_id = str(uuid.uuid4())
+                if existing_image.count is None:
+                    existing_image.count = 0
+                if existing_image.vlm_processed is None:
+                    existing_image.vlm_processed = False
+
+            existing_image.count += 1
+            existing_image.save()
+            return existing_image.image_id, False
+        else:
+            # print(f"图片不存在: {image_hash}")
+            image_id = str(uuid.uuid4())
+
+        # 保存新图片
+        current_timestamp = time.time()
+        image_dir = os.path.join(self.IMAGE_DIR, "images")
+        os.makedirs(image_dir, exist_ok=True)
+        filename = f"{image_id}.png"
+        file_path = os.path.join(image_dir, filename)
+
+        # 保存文件
+        with open(file_path, "wb") as f:
+            f.write(image_bytes)
+
+        # 保存到数据库
+        Images.create(
+            image_id=image_id,
+            emoji_hash=image_hash,
+            path=file_path,
+            type="image",
+            timestamp=current_timestamp,
+            vlm_processed=False,
+            count=1,
+        )
+        return image_id, True
+
     async def process_image(self, image_base64: str) -> Tuple[str, str]:
         # sourcery skip: hoist-if-from-if
         """处理图片并返回图片ID和描述
@@ -492,52 +547,11 @@ class ImageManager:
             image_bytes = base64.b64decode(image_base64)
             image_hash = hashlib.md5(image_bytes).hexdigest()
 
-            if existing_image := Images.get_or_none(Images.emoji_hash == image_hash):
-                # 检查是否缺少必要字段，如果缺少则创建新记录
-                if (
-                    not hasattr(existing_image, "image_id")
-                    or not existing_image.image_id
-                    or not hasattr(existing_image, "count")
-                    or existing_image.count is None
-                    or not hasattr(existing_image, "vlm_processed")
-                    or existing_image.vlm_processed is None
-                ):
-                    logger.debug(f"图片记录缺少必要字段，补全旧记录: {image_hash}")
-                    if not existing_image.image_id:
-                        existing_image.image_id = str(uuid.uuid4())
-                    if existing_image.count is None:
-                        existing_image.count = 0
-                    if existing_image.vlm_processed is None:
-                        existing_image.vlm_processed = False
-
-                existing_image.count += 1
-                existing_image.save()
-                return existing_image.image_id, f"[picid:{existing_image.image_id}]"
-            else:
-                # print(f"图片不存在: {image_hash}")
-                image_id = str(uuid.uuid4())
-
-            # 保存新图片
-            current_timestamp = time.time()
-            image_dir = os.path.join(self.IMAGE_DIR, "images")
-            os.makedirs(image_dir, exist_ok=True)
-            filename = f"{image_id}.png"
-            file_path = os.path.join(image_dir, filename)
-
-            # 保存文件
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
-
-            # 保存到数据库
-            Images.create(
-                image_id=image_id,
-                emoji_hash=image_hash,
-                path=file_path,
-                type="image",
-                timestamp=current_timestamp,
-                vlm_processed=False,
-                count=1,
+            image_id, is_new = await db_write(
+                self._register_image_sync, image_bytes, image_hash, call_site="ImageManager.process_image"
             )
+            if not is_new:
+                return image_id, f"[picid:{image_id}]"
 
             # 启动异步VLM处理
             await self._process_image_with_vlm(image_id, image_base64)
@@ -126,7 +126,7 @@ class Messages(BaseModel):
     """
 
     message_id = TextField(index=True)  # 消息 ID (更改自 IntegerField)
-    time = DoubleField()  # 消息时间戳
+    time = DoubleField(index=True)  # 消息时间戳，统计任务按时间范围扫描
 
     chat_id = TextField(index=True)  # 对应的 ChatStreams stream_id
 
@@ -175,6 +175,11 @@ class Messages(BaseModel):
     class Meta:
         # database = db # 继承自 BaseModel
         table_name = "messages"
+        # 复合索引，对应按聊天/用户筛选并按时间排序的查询
+        indexes = (
+            (("chat_id", "time"), False),
+            (("user_id", "time"), False),
+        )
 
 
 class ActionRecords(BaseModel):
@@ -201,6 +206,7 @@ class ActionRecords(BaseModel):
     class Meta:
         # database = db # 继承自 BaseModel
         table_name = "action_records"
+        indexes = ((("chat_id", "time"), False),)
 
 
 class Images(BaseModel):
@@ -456,6 +462,9 @@ def initialize_database(sync_constraints=False):
                     except Exception as e:
                         logger.error(f"删除字段 '{field_name}' 失败: {e}")
 
+                # 检查索引
+                _create_missing_indexes(model)
+
         # 如果启用了约束同步，执行约束检查和修复
         if sync_constraints:
             logger.debug("开始同步数据库字段约束...")
@@ -470,6 +479,100 @@ def initialize_database(sync_constraints=False):
     logger.info("数据库初始化完成")
 
 
+def _create_missing_indexes(model):
+    """
+    为已存在的表补建模型中定义、但数据库中缺失的索引。
+    create_tables 只会在建表时创建索引，旧数据库需要在这里迁移。
+    """
+    table_name = model._meta.table_name
+    cursor = db.execute_sql(f"PRAGMA index_list('{table_name}')")
+    existing_indexes = {row[1] for row in cursor.fetchall()}
+
+    for index in model._meta.fields_to_index():
+        index_name = index._name
+        if index_name in existing_indexes:
+            continue
+        logger.info(f"表 '{table_name}' 缺失索引 '{index_name}'，正在创建（数据量较大时可能需要一些时间）...")
+        try:
+            db.execute(model._schema._create_index(index, safe=True))
+            logger.info(f"索引 '{index_name}' 创建成功")
+        except Exception as e:
+            logger.error(f"创建索引 '{index_name}' 失败: {e}")
+
+
+def _build_hot_queries():
+    """
+    构造热点查询的代表样例，用于检查查询计划。
+    返回 [(查询名称, peewee 查询)]，参数值仅用于生成 SQL，不影响查询计划。
+    """
+    now = datetime.datetime.now().timestamp()
+    return [
+        (
+            "find_messages 按聊天取最近消息",
+            Messages.select()
+            .where((Messages.chat_id == "chat"), (Messages.time > now - 3600), (Messages.time < now))
+            .where(Messages.message_id != "notice")
+            .order_by(Messages.time.desc())
+            .limit(20),
+        ),
+        (
+            "find_messages 按聊天取时间点之前的消息",
+            Messages.select()
+            .where((Messages.chat_id == "chat"), (Messages.time < now))
+            .order_by(Messages.time.asc()),
+        ),
+        (
+            "count_messages 按聊天计数",
+            Messages.select().where((Messages.chat_id == "chat"), (Messages.time > now - 3600), (Messages.time < now)),
+        ),
+        (
+            "统计任务按时间扫描消息",
+            Messages.select().where(Messages.time >= now - 3600),
+        ),
+        (
+            "find_messages 按用户取消息",
+            Messages.select()
+            .where((Messages.time < now), (Messages.user_id.in_(["user_a", "user_b"])))
+            .order_by(Messages.time.desc())
+            .limit(20),
+        ),
+        (
+            "按聊天取动作记录",
+            ActionRecords.select()
+            .where((ActionRecords.chat_id == "chat"), (ActionRecords.time > now - 3600), (ActionRecords.time < now))
+            .order_by(ActionRecords.time.asc()),
+        ),
+        (
+            "统计任务按时间扫描LLM用量",
+            LLMUsage.select().where(LLMUsage.timestamp >= datetime.datetime.now()),
+        ),
+    ]
+
+
+def check_hot_query_plans() -> list[str]:
+    """
+    使用 EXPLAIN QUERY PLAN 检查热点查询，记录退化为全表扫描的查询。
+
+    Returns:
+        list[str]: 存在问题的查询名称列表
+    """
+    problem_queries = []
+    try:
+        for name, query in _build_hot_queries():
+            sql, params = query.sql()
+            cursor = db.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params)
+            details = [row[-1] for row in cursor.fetchall()]
+            plan = "; ".join(details)
+            if any(detail.startswith("SCAN ") and "INDEX" not in detail for detail in details):
+                problem_queries.append(name)
+                logger.warning(f"热点查询 '{name}' 退化为全表扫描: {plan}")
+            else:
+                logger.debug(f"热点查询 '{name}' 查询计划: {plan}")
+    except Exception as e:
+        logger.warning(f"检查查询计划时出错: {e}")
+    return problem_queries
+
+
 def sync_field_constraints():
     """
     同步数据库字段约束，确保现有数据库字段的 NULL 约束与模型定义一致。
@@ -750,3 +853,4 @@ def fix_image_id():
 # 模块加载时调用初始化函数
 initialize_database(sync_constraints=True)
 fix_image_id()
+check_hot_query_plans()
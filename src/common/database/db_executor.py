@@ -0,0 +1,224 @@
+"""
+统一的异步数据库访问层
+
+peewee 的所有调用都是同步阻塞的，直接在协程里执行会卡住服务所有聊天的事件循环。
+这里提供一个专用执行器：
+- 写操作全部进入单个写线程串行执行，避免 SQLite 写锁竞争（busy_timeout）
+- 读操作进入一个小的读线程池，peewee 为每个线程维护独立连接，配合 WAL 可以与写入并发
+- 按调用点统计排队时间与执行时间（即原本会阻塞事件循环的时间），用于验证事件循环是否保持响应
+"""
+
+import asyncio
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from src.common.database.database import db
+from src.common.logger import get_logger
+from src.manager.async_task_manager import AsyncTask
+
+logger = get_logger("db_executor")
+
+T = TypeVar("T")
+
+DB_READER_THREADS = 4
+"""读线程池大小"""
+
+SLOW_DB_CALL_THRESHOLD = 0.5
+"""执行时间超过该值（秒）的调用会打印警告"""
+
+LOOP_LAG_CHECK_INTERVAL = 0.5
+"""事件循环延迟采样间隔（秒）"""
+
+
+@dataclass
+class CallSiteStat:
+    """单个调用点的统计信息"""
+
+    count: int = 0
+    errors: int = 0
+    total_exec_time: float = 0.0
+    max_exec_time: float = 0.0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_exec_time": self.total_exec_time,
+            "avg_exec_time": self.total_exec_time / self.count if self.count else 0.0,
+            "max_exec_time": self.max_exec_time,
+            "avg_wait_time": self.total_wait_time / self.count if self.count else 0.0,
+            "max_wait_time": self.max_wait_time,
+        }
+
+
+class DatabaseExecutor:
+    """单写线程 + 读线程池的数据库执行器"""
+
+    def __init__(self, reader_threads: int = DB_READER_THREADS):
+        self._thread_local = threading.local()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="db-writer", initializer=self._mark_writer_thread
+        )
+        self._readers = ThreadPoolExecutor(max_workers=reader_threads, thread_name_prefix="db-reader")
+        self._stats: Dict[str, CallSiteStat] = {}
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+        self.loop_lag_max: float = 0.0
+        """统计周期内观测到的最大事件循环延迟（秒）"""
+        self.loop_lag_total: float = 0.0
+        self.loop_lag_samples: int = 0
+
+    def _mark_writer_thread(self) -> None:
+        self._thread_local.is_writer = True
+
+    def in_writer_thread(self) -> bool:
+        """当前线程是否为数据库写线程（在写线程中等待写线程上的任务会死锁）"""
+        return getattr(self._thread_local, "is_writer", False)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @staticmethod
+    def _call_site_of(func: Callable[..., Any]) -> str:
+        module = getattr(func, "__module__", "") or ""
+        name = getattr(func, "__qualname__", None) or getattr(func, "__name__", repr(func))
+        return f"{module.rsplit('.', 1)[-1]}.{name}" if module else name
+
+    def _record(self, call_site: str, wait_time: float, exec_time: float, failed: bool) -> None:
+        with self._stats_lock:
+            stat = self._stats.get(call_site)
+            if stat is None:
+                stat = self._stats[call_site] = CallSiteStat()
+            stat.count += 1
+            stat.errors += int(failed)
+            stat.total_exec_time += exec_time
+            stat.max_exec_time = max(stat.max_exec_time, exec_time)
+            stat.total_wait_time += wait_time
+            stat.max_wait_time = max(stat.max_wait_time, wait_time)
+        if exec_time > SLOW_DB_CALL_THRESHOLD:
+            logger.warning(f"数据库调用 {call_site} 耗时 {exec_time:.3f} 秒")
+
+    def _wrap(self, func: Callable[..., T], call_site: str, args, kwargs) -> Callable[[], T]:
+        submit_time = time.perf_counter()
+
+        def _run() -> T:
+            start = time.perf_counter()
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                end = time.perf_counter()
+                self._record(call_site, start - submit_time, end - start, failed)
+
+        return _run
+
+    def _submit(
+        self,
+        executor: ThreadPoolExecutor,
+        func: Callable[..., T],
+        call_site: Optional[str],
+        args,
+        kwargs,
+    ) -> Future:
+        if self._closed:
+            raise RuntimeError("数据库执行器已关闭")
+        return executor.submit(self._wrap(func, call_site or self._call_site_of(func), args, kwargs))
+
+    async def run_read(self, func: Callable[..., T], *args, call_site: Optional[str] = None, **kwargs) -> T:
+        """在读线程池中执行只读数据库操作"""
+        return await asyncio.wrap_future(self._submit(self._readers, func, call_site, args, kwargs))
+
+    async def run_write(self, func: Callable[..., T], *args, call_site: Optional[str] = None, **kwargs) -> T:
+        """在写线程中执行数据库写操作，所有写入按提交顺序串行执行"""
+        return await asyncio.wrap_future(self._submit(self._writer, func, call_site, args, kwargs))
+
+    def submit_write(self, func: Callable[..., Any], *args, call_site: Optional[str] = None, **kwargs) -> Future:
+        """提交写操作但不等待结果，适用于同步上下文中的统计类写入
+
+        调用方不关心结果时，函数本身应自行处理并记录异常。
+        """
+        return self._submit(self._writer, func, call_site, args, kwargs)
+
+    def record_loop_lag(self, lag: float) -> None:
+        """记录一次事件循环延迟采样"""
+        self.loop_lag_max = max(self.loop_lag_max, lag)
+        self.loop_lag_total += lag
+        self.loop_lag_samples += 1
+
+    def get_stats(self, reset: bool = False) -> Dict[str, Any]:
+        """获取各调用点的统计信息
+
+        Args:
+            reset: 获取后是否清空统计
+        """
+        with self._stats_lock:
+            call_sites = {name: stat.to_dict() for name, stat in self._stats.items()}
+            if reset:
+                self._stats.clear()
+        stats = {
+            "call_sites": call_sites,
+            "loop_lag_max": self.loop_lag_max,
+            "loop_lag_avg": self.loop_lag_total / self.loop_lag_samples if self.loop_lag_samples else 0.0,
+        }
+        if reset:
+            self.loop_lag_max = 0.0
+            self.loop_lag_total = 0.0
+            self.loop_lag_samples = 0
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭执行器，等待已提交的写入完成后关闭各线程持有的连接"""
+        if self._closed:
+            return
+        # 写线程按提交顺序执行，关闭连接的任务排在所有已提交写入之后
+        self._writer.submit(_close_thread_connection)
+        self._closed = True
+        for executor in (self._writer, self._readers):
+            executor.shutdown(wait=wait)
+
+
+def _close_thread_connection() -> None:
+    """关闭当前线程持有的数据库连接"""
+    if not db.is_closed():
+        db.close()
+
+
+class EventLoopLagMonitorTask(AsyncTask):
+    """事件循环延迟监控任务
+
+    定期测量 sleep 的实际唤醒延迟，延迟越大说明事件循环被同步代码阻塞得越久。
+    """
+
+    def __init__(self):
+        super().__init__(task_name="Event Loop Lag Monitor Task", wait_before_start=10, run_interval=0)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LOOP_LAG_CHECK_INTERVAL)
+            db_executor.record_loop_lag(max(0.0, loop.time() - start - LOOP_LAG_CHECK_INTERVAL))
+
+
+db_executor = DatabaseExecutor()
+
+
+async def db_read(func: Callable[..., T], *args, call_site: Optional[str] = None, **kwargs) -> T:
+    """在读线程池中执行只读数据库操作"""
+    return await db_executor.run_read(func, *args, call_site=call_site, **kwargs)
+
+
+async def db_write(func: Callable[..., T], *args, call_site: Optional[str] = None, **kwargs) -> T:
+    """在单写线程中执行数据库写操作"""
+    return await db_executor.run_write(func, *args, call_site=call_site, **kwargs)
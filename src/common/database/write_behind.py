@@ -0,0 +1,214 @@
+"""
+写回（write-behind）批量写入队列
+
+消息与 LLM 用量记录是写入最频繁的两张表，逐条 create 会让每一行都成为一次独立事务。
+这里把这些插入先放进内存队列，每隔 flush_interval_ms 或累积到 max_batch_size 行时，
+在数据库写线程中用一次 insert_many 事务写入。
+
+- 主键在入队时就分配好，调用方可以立刻把带主键的完整记录放进内存缓存；
+  起始主键在启动时由 seed_ids 在读线程中查询，入队时不必在事件循环上查询数据库
+- 需要读到刚写入数据的读取方在查询数据库前调用 flush(model)，保证读到自己的写入
+- write_mode = "immediate" 时退化为逐条写入
+"""
+
+import atexit
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from peewee import IntegrityError, Model, fn
+
+from src.common.database.database import db
+from src.common.database.db_executor import db_executor
+from src.common.logger import get_logger
+from src.config.config import global_config
+
+logger = get_logger("write_behind")
+
+
+class WriteBehindQueue:
+    """按表合并插入的写回队列"""
+
+    def __init__(self):
+        self._pending: Dict[Type[Model], List[Dict[str, Any]]] = {}
+        self._inflight: Dict[Type[Model], List[List[Dict[str, Any]]]] = {}
+        """已从队列取出、正在写线程中写入但尚未提交的批次"""
+        self._next_ids: Dict[Type[Model], int] = {}
+        self._id_listeners: Dict[Type[Model], Callable[[Dict[str, Any], int], None]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.batches = 0
+        self.rows_written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return global_config.database.write_mode == "batch" and not self._closed
+
+    def add_id_listener(self, model_class: Type[Model], listener: Callable[[Dict[str, Any], int], None]) -> None:
+        """注册主键被重新分配时的回调，参数为入队时的记录和新主键"""
+        self._id_listeners[model_class] = listener
+
+    @staticmethod
+    def _max_id(model_class: Type[Model]) -> int:
+        return model_class.select(fn.MAX(model_class.id)).scalar() or 0  # type: ignore
+
+    async def seed_ids(self, *model_classes: Type[Model]) -> None:
+        """在读线程中查询各表当前的最大主键，作为之后入队记录的起始主键"""
+        for model_class in model_classes:
+            max_id = await db_executor.run_read(self._max_id, model_class, call_site="write_behind.seed_ids")
+            with self._lock:
+                self._next_ids[model_class] = max(self._next_ids.get(model_class, 0), max_id + 1)
+
+    def _allocate_id(self, model_class: Type[Model]) -> int:
+        # 调用方需持有 self._lock
+        if model_class not in self._next_ids:
+            # 未经 seed_ids 预先查询（如独立脚本）时才在此同步查询
+            self._next_ids[model_class] = self._max_id(model_class) + 1
+        new_id = self._next_ids[model_class]
+        self._next_ids[model_class] = new_id + 1
+        return new_id
+
+    def add(self, model_class: Type[Model], row: Dict[str, Any]) -> Dict[str, Any]:
+        """将一行插入放入队列
+
+        Args:
+            model_class: 目标表
+            row: 字段字典，未提供的字段使用模型默认值
+
+        Returns:
+            Dict[str, Any]: 补全默认值并分配主键后的完整记录
+        """
+        data = model_class(**row).__data__
+        with self._lock:
+            data["id"] = self._allocate_id(model_class)
+            self._pending.setdefault(model_class, []).append(data)
+            pending_rows = sum(len(rows) for rows in self._pending.values())
+        if pending_rows >= global_config.database.max_batch_size:
+            self._schedule_flush()
+        else:
+            self._ensure_flusher()
+            self._wakeup.set()
+        return data
+
+    def has_pending(self, model_class: Optional[Type[Model]] = None) -> bool:
+        """是否有尚未提交到数据库的记录"""
+        with self._lock:
+            if model_class is None:
+                return any(self._pending.values()) or any(self._inflight.values())
+            return bool(self._pending.get(model_class)) or bool(self._inflight.get(model_class))
+
+    def pending_rows(self, model_class: Type[Model]) -> List[Dict[str, Any]]:
+        """获取某张表尚未确认提交的记录（其中一部分可能在调用返回时已经提交）"""
+        with self._lock:
+            rows = [row for batch in self._inflight.get(model_class, []) for row in batch]
+            rows.extend(self._pending.get(model_class, []))
+            return rows
+
+    def flush(self, model_class: Optional[Type[Model]] = None) -> None:
+        """同步等待队列中的记录写入数据库
+
+        写线程按提交顺序执行，因此在写线程中提交一次写入并等待它完成，
+        就能保证在此之前入队或正在写入的记录都已提交。
+        """
+        if not self.has_pending(model_class):
+            return
+        if db_executor.in_writer_thread() or db_executor.closed:
+            self._flush_sync()
+            return
+        try:
+            db_executor.submit_write(self._flush_sync, call_site="write_behind.flush").result()
+        except RuntimeError:
+            # 解释器退出阶段无法再向线程池提交任务
+            self._flush_sync()
+
+    def _schedule_flush(self) -> None:
+        try:
+            db_executor.submit_write(self._flush_sync, call_site="write_behind.flush")
+        except RuntimeError:
+            self._flush_sync()
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="db-write-behind", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        """每当有新记录入队，等待一个合并周期后提交一次写入"""
+        while True:
+            self._wakeup.wait()
+            if self._closed:
+                return
+            time.sleep(global_config.database.flush_interval_ms / 1000)
+            self._wakeup.clear()
+            if self._closed:
+                return
+            self._schedule_flush()
+
+    def _flush_sync(self) -> None:
+        """取出所有待写入的记录并逐表写入，只应在写线程（或写线程已关闭时）调用"""
+        with self._lock:
+            batches = [(model_class, rows) for model_class, rows in self._pending.items() if rows]
+            self._pending = {}
+            for model_class, rows in batches:
+                self._inflight.setdefault(model_class, []).append(rows)
+        for model_class, rows in batches:
+            try:
+                self._write_rows(model_class, rows)
+            finally:
+                with self._lock:
+                    self._inflight[model_class] = [batch for batch in self._inflight[model_class] if batch is not rows]
+
+    def _write_rows(self, model_class: Type[Model], rows: List[Dict[str, Any]]) -> None:
+        try:
+            with db.atomic():
+                model_class.insert_many(rows).execute()
+            self.batches += 1
+            self.rows_written += len(rows)
+            return
+        except IntegrityError as e:
+            logger.warning(f"批量写入 {model_class.__name__} 冲突，改为逐条写入: {e}")
+        except Exception as e:
+            logger.error(f"批量写入 {model_class.__name__} 失败，改为逐条写入: {e}")
+
+        # 有其他代码绕过队列写入了同一张表，或个别记录不合法：逐条写入并由数据库重新分配冲突的主键
+        listener = self._id_listeners.get(model_class)
+        for row in rows:
+            try:
+                try:
+                    model_class.insert(row).execute()
+                    new_id = row["id"]
+                except IntegrityError:
+                    new_id = model_class.insert({k: v for k, v in row.items() if k != "id"}).execute()
+                self.rows_written += 1
+            except Exception as e:
+                logger.error(f"写入 {model_class.__name__} 记录失败，已丢弃: {e}")
+                continue
+            if new_id != row["id"]:
+                with self._lock:
+                    self._next_ids[model_class] = max(self._next_ids.get(model_class, 0), new_id + 1)
+                if listener:
+                    listener(row, new_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending_rows = sum(len(rows) for rows in self._pending.values())
+        return {"batches": self.batches, "rows_written": self.rows_written, "pending_rows": pending_rows}
+
+    def close(self) -> None:
+        """停止定时写入并把剩余记录写入数据库，之后的写入退化为逐条写入"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+
+
+write_behind_queue = WriteBehindQueue()
+atexit.register(write_behind_queue.close)
@@ -1,11 +1,15 @@
+import bisect
+import threading
 import traceback
 
-from typing import List, Any, Optional
+from typing import List, Any, Optional, Dict
 from peewee import Model  # 添加 Peewee Model 导入
 
 from src.config.config import global_config
 from src.common.data_models.database_data_model import DatabaseMessages
 from src.common.database.database_model import Messages
+from src.common.database.db_executor import db_read
+from src.common.database.write_behind import write_behind_queue
 from src.common.logger import get_logger
 
 logger = get_logger(__name__)
@@ -18,6 +22,281 @@ def _model_to_instance(model_instance: Model) -> DatabaseMessages:
     return DatabaseMessages(**model_instance.__data__)
 
 
+# 每个聊天流在内存中缓存的最近消息条数下限，实际容量会根据上下文长度放大
+MESSAGE_CACHE_MIN_SIZE = 200
+
+
+def _normalize_message_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """按数据库字段类型转换一遍数据，使缓存中的数据与从数据库读出的数据保持一致"""
+    normalized = {}
+    for name, field in Messages._meta.fields.items():  # type: ignore
+        if name in data:
+            value = data[name]
+            normalized[name] = field.python_value(field.db_value(value)) if value is not None else None
+    return normalized
+
+
+def _match_value(value: Any, condition: Any) -> bool:
+    """在内存中按 find_messages 的过滤器语义比较单个字段"""
+    if not isinstance(condition, dict):
+        return value == condition
+    if value is None:
+        # 与 SQL 语义保持一致：NULL 参与任何比较都不成立
+        return False
+    for op, op_value in condition.items():
+        if op == "$gt" and not value > op_value:
+            return False
+        elif op == "$lt" and not value < op_value:
+            return False
+        elif op == "$gte" and not value >= op_value:
+            return False
+        elif op == "$lte" and not value <= op_value:
+            return False
+        elif op == "$ne" and not value != op_value:
+            return False
+        elif op == "$in" and value not in op_value:
+            return False
+        elif op == "$nin" and value in op_value:
+            return False
+    return True
+
+
+class _ChatMessageBuffer:
+    """单个聊天流的最近消息缓冲区
+
+    不变式：records 恰好包含该聊天中 time > covered_after 的全部消息，按时间升序排列。
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], covered_after: float):
+        self.records = records
+        self.covered_after = covered_after
+
+
+class MessageCache:
+    """按 chat_id 划分的有界最近消息缓存（写穿式）
+
+    消息写入数据库后同步写入缓存；find_messages 对最近时间窗口的查询直接由缓存回答，
+    超出缓存覆盖范围的查询仍然回落到 SQLite。
+    """
+
+    def __init__(self):
+        self._buffers: Dict[str, _ChatMessageBuffer] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @property
+    def capacity(self) -> int:
+        return max(MESSAGE_CACHE_MIN_SIZE, global_config.chat.max_context_size * 4)
+
+    def _load_buffer(self, chat_id: str) -> _ChatMessageBuffer:
+        """从数据库预热某个聊天的缓冲区"""
+        capacity = self.capacity
+        # 先取批量写入队列中尚未提交的记录再查询数据库，期间提交的记录按主键去重
+        pending = [row for row in write_behind_queue.pending_rows(Messages) if row.get("chat_id") == chat_id]
+        rows = list(
+            Messages.select().where(Messages.chat_id == chat_id).order_by(Messages.time.desc()).limit(capacity)
+        )
+        records = [_normalize_message_data(row.__data__) for row in reversed(rows)]
+        covered_after = float("-inf")
+        if len(rows) >= capacity:
+            # 与最早一条同一时间戳的消息可能没有全部取到，因此将这一时间戳整体排除在覆盖范围之外
+            covered_after = records[0]["time"]
+        if pending:
+            loaded_ids = {record["id"] for record in records}
+            records.extend(_normalize_message_data(row) for row in pending if row["id"] not in loaded_ids)
+            records.sort(key=lambda r: r["time"])
+            if len(records) > capacity:
+                covered_after = max(covered_after, records[-capacity - 1]["time"])
+        records = [record for record in records if record["time"] > covered_after]
+        self.loads += 1
+        buffer = _ChatMessageBuffer(records, covered_after)
+        self._buffers[chat_id] = buffer
+        return buffer
+
+    def add(self, data: Dict[str, Any]) -> None:
+        """写入一条已经存入数据库或已进入批量写入队列的消息，仅在该聊天缓冲区已建立时生效"""
+        chat_id = data.get("chat_id")
+        with self._lock:
+            buffer = self._buffers.get(chat_id)  # type: ignore
+            if buffer is None:
+                # 尚未建立缓冲区时无需处理，首次查询时会从数据库完整加载
+                return
+            record = _normalize_message_data(data)
+            if record.get("time") is None or record["time"] <= buffer.covered_after:
+                return
+            # 写线程提交后、写入缓存前，读线程可能已经把这条消息加载进缓冲区
+            lo = bisect.bisect_left(buffer.records, record["time"], key=lambda r: r["time"])
+            hi = bisect.bisect_right(buffer.records, record["time"], key=lambda r: r["time"])
+            if any(r.get("id") == record.get("id") for r in buffer.records[lo:hi]):
+                return
+            bisect.insort_right(buffer.records, record, key=lambda r: r["time"])
+            while len(buffer.records) > self.capacity:
+                evicted_time = buffer.records.pop(0)["time"]
+                buffer.covered_after = evicted_time
+                while buffer.records and buffer.records[0]["time"] <= evicted_time:
+                    buffer.records.pop(0)
+
+    def reassign_row_id(self, row: Dict[str, Any], new_id: int) -> None:
+        """批量写入时主键冲突、数据库重新分配了主键，同步到缓存中"""
+        with self._lock:
+            buffer = self._buffers.get(row.get("chat_id"))  # type: ignore
+            if buffer is None:
+                return
+            for record in buffer.records:
+                if record.get("id") == row["id"]:
+                    record["id"] = new_id
+                    return
+
+    def is_loaded(self, chat_id: str) -> bool:
+        """某个聊天的缓冲区是否已建立（已建立时查询不会访问数据库）"""
+        with self._lock:
+            return chat_id in self._buffers
+
+    def update_message_id(self, chat_id: str, row_id: int, new_message_id: str) -> None:
+        """同步数据库中对消息ID的更新"""
+        with self._lock:
+            buffer = self._buffers.get(chat_id)
+            if buffer is None:
+                return
+            for record in reversed(buffer.records):
+                if record.get("id") == row_id:
+                    record["message_id"] = new_message_id
+                    return
+
+    def query(
+        self,
+        message_filter: dict[str, Any],
+        sort: Optional[List[tuple[str, int]]],
+        limit: int,
+        limit_mode: str,
+        filter_bot: bool,
+        filter_command: bool,
+    ) -> Optional[List[DatabaseMessages]]:
+        """尝试由缓存回答查询，无法保证结果与数据库一致时返回 None"""
+        chat_id = message_filter.get("chat_id")
+        if not isinstance(chat_id, str):
+            return None
+        if any(not hasattr(Messages, key) for key in message_filter):
+            return None
+        if limit <= 0 and sort and any(field_name != "time" or direction not in (1, -1) for field_name, direction in sort):
+            return None
+
+        # 查询的时间下界，None 表示无下界
+        time_condition = message_filter.get("time")
+        lower_bound: Optional[float] = None
+        lower_inclusive = False
+        if isinstance(time_condition, dict):
+            if "$gt" in time_condition:
+                lower_bound = time_condition["$gt"]
+            if "$gte" in time_condition and (lower_bound is None or time_condition["$gte"] > lower_bound):
+                lower_bound = time_condition["$gte"]
+                lower_inclusive = True
+        elif time_condition is not None:
+            lower_bound = time_condition
+            lower_inclusive = True
+
+        with self._lock:
+            buffer = self._buffers.get(chat_id)
+            if buffer is None:
+                buffer = self._load_buffer(chat_id)
+
+            # 查询范围是否完全落在缓冲区覆盖范围内
+            if lower_bound is None:
+                fully_covered = buffer.covered_after == float("-inf")
+            elif lower_inclusive:
+                fully_covered = lower_bound > buffer.covered_after
+            else:
+                fully_covered = lower_bound >= buffer.covered_after
+
+            bot_account = str(global_config.bot.qq_account)
+            matched = [
+                record
+                for record in buffer.records
+                if record.get("message_id") != "notice"
+                and not (filter_bot and record.get("user_id") in (None, bot_account))
+                and not (filter_command and record.get("is_command"))
+                and all(_match_value(record.get(key), condition) for key, condition in message_filter.items())
+            ]
+
+            if limit > 0:
+                if limit_mode == "earliest":
+                    if not fully_covered:
+                        return self._miss()
+                    matched = matched[:limit]
+                else:
+                    # 缓冲区之外的消息都比缓冲区内的更早，只要缓冲区内已有足够的匹配项即可回答
+                    if len(matched) < limit and not fully_covered:
+                        return self._miss()
+                    matched = matched[-limit:]
+            else:
+                if not fully_covered:
+                    return self._miss()
+                if sort:
+                    if sort[0][1] == -1:
+                        matched = list(reversed(matched))
+                else:
+                    matched = sorted(matched, key=lambda r: r.get("id") or 0)
+
+            self.hits += 1
+            return [DatabaseMessages(**record) for record in matched]
+
+    def _miss(self) -> None:
+        self.misses += 1
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "hit_rate": self.hits / total if total else 0.0,
+            "cached_chats": len(self._buffers),
+        }
+
+
+message_cache = MessageCache()
+write_behind_queue.add_id_listener(Messages, message_cache.reassign_row_id)
+
+
+async def find_messages_async(
+    message_filter: dict[str, Any],
+    sort: Optional[List[tuple[str, int]]] = None,
+    limit: int = 0,
+    limit_mode: str = "latest",
+    filter_bot=False,
+    filter_command=False,
+) -> List[DatabaseMessages]:
+    """
+    find_messages 的异步版本，供事件循环中的热路径调用。
+
+    缓冲区已建立时直接在内存中回答，否则整个查询交给数据库读线程执行，不阻塞事件循环。
+    参数与返回值同 find_messages。
+    """
+    chat_id = message_filter.get("chat_id") if message_filter else None
+    if isinstance(chat_id, str) and message_cache.is_loaded(chat_id):
+        cached_results = message_cache.query(message_filter, sort, limit, limit_mode, filter_bot, filter_command)
+        if cached_results is not None:
+            return cached_results
+        # 缓存已确认无法回答，直接查询数据库
+        func = _find_messages_in_db
+    else:
+        func = find_messages
+    return await db_read(
+        func,
+        message_filter,
+        sort,
+        limit,
+        limit_mode,
+        filter_bot,
+        filter_command,
+        call_site="message_repository.find_messages",
+    )
+
+
 def find_messages(
     message_filter: dict[str, Any],
     sort: Optional[List[tuple[str, int]]] = None,
@@ -39,6 +318,27 @@ def find_messages(
         消息字典列表，如果出错则返回空列表。
     """
     try:
+        # 最近时间窗口的单聊天查询优先由内存缓存回答
+        if message_filter and "chat_id" in message_filter:
+            cached_results = message_cache.query(message_filter, sort, limit, limit_mode, filter_bot, filter_command)
+            if cached_results is not None:
+                return cached_results
+    except Exception as e:
+        logger.error(f"查询最近消息缓存失败，改为查询数据库: {e}")
+    return _find_messages_in_db(message_filter, sort, limit, limit_mode, filter_bot, filter_command)
+
+
+def _find_messages_in_db(
+    message_filter: dict[str, Any],
+    sort: Optional[List[tuple[str, int]]],
+    limit: int,
+    limit_mode: str,
+    filter_bot: bool,
+    filter_command: bool,
+) -> List[DatabaseMessages]:
+    """直接在数据库中执行 find_messages 的查询"""
+    try:
+        write_behind_queue.flush(Messages)
         query = Messages.select()
 
         # 应用过滤器
@@ -135,6 +435,7 @@ def count_messages(message_filter: dict[str, Any]) -> int:
         符合条件的消息数量，如果出错则返回 0。
     """
     try:
+        write_behind_queue.flush(Messages)
         query = Messages.select()
 
         # 应用过滤器
@@ -28,6 +28,15 @@ class APIProvider(ConfigBase):
     retry_interval: int = 10
     """重试间隔（如果API调用失败，重试的间隔时间，单位：秒）"""
 
+    max_concurrency: int = 0
+    """同时进行的请求数上限（0表示不限制）"""
+
+    rpm: int = 0
+    """每分钟请求数上限（0表示不限制）"""
+
+    tpm: int = 0
+    """每分钟token数上限（0表示不限制）"""
+
     def get_api_key(self) -> str:
         return self.api_key
 
@@ -88,6 +97,9 @@ class TaskConfig(ConfigBase):
     temperature: float = 0.3
     """模型温度"""
 
+    hedge: bool = False
+    """是否启用对冲请求：首选模型超过其在该任务上的P90耗时仍未返回时，向下一个模型再发一个请求，取先返回的结果（仅对文本生成生效）"""
+
 
 @dataclass
 class ModelTaskConfig(ConfigBase):
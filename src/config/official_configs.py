@@ -626,6 +626,9 @@ class ResponseSplitterConfig(ConfigBase):
     enable_kaomoji_protection: bool = False
     """是否启用颜文字保护"""
 
+    enable_stream_reply: bool = False
+    """是否流式发送回复：模型每生成完一句就发送，不等待整段回复生成完毕"""
+
 
 @dataclass
 class TelemetryConfig(ConfigBase):
@@ -649,6 +652,20 @@ class DebugConfig(ConfigBase):
     """是否显示回复器推理"""
 
 
+@dataclass
+class DatabaseConfig(ConfigBase):
+    """数据库配置类"""
+
+    write_mode: Literal["batch", "immediate"] = "batch"
+    """消息与LLM用量记录的写入方式：batch 为合并批量写入，immediate 为逐条立即写入"""
+
+    flush_interval_ms: int = 200
+    """batch 模式下的最长合并等待时间（毫秒），进程崩溃时最多丢失这段时间内的记录"""
+
+    max_batch_size: int = 200
+    """batch 模式下累积到该行数时立即写入"""
+
+
 @dataclass
 class ExperimentalConfig(ConfigBase):
     """实验功能配置类"""
@@ -720,8 +737,41 @@ class LPMMKnowledgeConfig(ConfigBase):
     qa_ppr_damping: float = 0.8
     """QA PageRank阻尼系数"""
 
+    qa_ppr_method: Literal["power", "push"] = "power"
+    """QA PageRank算法，power为全图幂迭代（精确），push为种子节点附近的局部推送（近似，耗时与图规模无关）"""
+
+    qa_ppr_push_epsilon: float = 1e-6
+    """局部推送的残差阈值，越小越精确"""
+
     qa_res_top_k: int = 10
     """QA最终结果的Top K数量"""
 
+    qa_cache_size: int = 256
+    """QA查询结果缓存的最大条数，0为不缓存"""
+
+    qa_cache_ttl: float = 600.0
+    """QA查询结果缓存的有效期（秒）"""
+
+    qa_cache_similarity_threshold: float = 0.95
+    """问题Embedding与已缓存问题的余弦相似度不低于该值时复用缓存结果，大于1为只按问题文本精确匹配"""
+
     embedding_dimension: int = 1024
     """嵌入向量维度，应该与模型的输出维度一致"""
+
+    faiss_index_type: Literal["auto", "flat", "ivf_flat", "hnsw", "ivf_pq"] = "auto"
+    """向量索引类型，auto 按数据量自动选择（flat / hnsw / ivf_pq）"""
+
+    faiss_nprobe: int = 16
+    """ivf_flat / ivf_pq 索引搜索时扫描的聚类数，越大越准确但越慢"""
+
+    faiss_hnsw_ef_search: int = 64
+    """hnsw 索引搜索时的候选队列长度，越大越准确但越慢"""
+
+    faiss_recall_test_queries: int = 200
+    """构建近似索引后用于 recall@10 自检的查询数，0为不自检"""
+
+    embedding_requests_per_second: float = 10.0
+    """导入知识时嵌入请求的速率上限（每秒请求数），0为不限制"""
+
+    embedding_max_retries: int = 3
+    """导入知识时单个嵌入批次失败后的重试次数"""
@@ -14,6 +14,7 @@ from src.chat.utils.chat_message_builder import (
     build_bare_messages,
 )
 from src.chat.utils.prompt_builder import Prompt, global_prompt_manager
+from src.chat.utils.utils import get_embedding_request
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.express.style_learner import style_learner_manager
 from src.express.express_utils import filter_message_content, calculate_similarity
@@ -79,9 +80,7 @@ class ExpressionLearner:
         self.express_learn_model: LLMRequest = LLMRequest(
             model_set=model_config.model_task_config.utils, request_type="expression.learner"
         )
-        self.embedding_model: LLMRequest = LLMRequest(
-            model_set=model_config.model_task_config.embedding, request_type="expression.embedding"
-        )
+        self.embedding_model: LLMRequest = get_embedding_request("expression.embedding")
         self.chat_id = chat_id
         self.chat_stream = get_chat_manager().get_stream(chat_id)
         self.chat_name = get_chat_manager().get_stream_name(chat_id) or chat_id
@@ -86,3 +86,15 @@ class ModelAttemptFailed(Exception):
 
     def __str__(self):
         return self.message
+
+
+class PartialOutputException(Exception):
+    """流式输出已有部分内容交给调用方后请求失败，此时不能再重试或切换模型（否则调用方会收到重复的内容）"""
+
+    def __init__(self, message: str, original_exception: Exception | None = None):
+        super().__init__(message)
+        self.message = message
+        self.original_exception = original_exception
+
+    def __str__(self):
+        return self.message
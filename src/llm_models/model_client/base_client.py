@@ -1,9 +1,11 @@
 import asyncio
+import threading
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
-from typing import Callable, Any, Optional
+from typing import Awaitable, Callable, Any, Optional, TypeVar
 
 from src.config.api_ada_configs import ModelInfo, APIProvider
+from ..exceptions import ReqAbortException
 from ..payload_content.message import Message
 from ..payload_content.resp_format import RespFormat
 from ..payload_content.tool_option import ToolOption, ToolCall
@@ -49,6 +51,9 @@ class APIResponse:
     embedding: list[float] | None = None
     """嵌入向量"""
 
+    embeddings: list[list[float]] | None = None
+    """批量嵌入向量，与输入顺序一致"""
+
     usage: UsageRecord | None = None
     """使用情况 (prompt_tokens, completion_tokens, total_tokens)"""
 
@@ -56,6 +61,50 @@ class APIResponse:
     """响应原始数据"""
 
 
+T = TypeVar("T")
+
+
+async def await_with_interrupt(awaitable: Awaitable[T], interrupt_flag: asyncio.Event | None) -> T:
+    """
+    等待请求完成，中断信号量被设置时立即取消请求并抛出ReqAbortException
+    没有中断信号量时直接等待；有中断信号量时同时等待请求与信号量，不轮询
+    :param awaitable: 请求（协程）
+    :param interrupt_flag: 中断信号量（可选）
+    :return: 请求的结果
+    """
+    if interrupt_flag is None:
+        return await awaitable
+    req_task = asyncio.ensure_future(awaitable)
+    if interrupt_flag.is_set():
+        req_task.cancel()
+        raise ReqAbortException("请求被外部信号中断")
+    flag_waiter = asyncio.create_task(interrupt_flag.wait())
+    try:
+        await asyncio.wait({req_task, flag_waiter}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # 包括调用方被取消的情况：不留下仍在进行的请求与等待任务
+        flag_waiter.cancel()
+        if not req_task.done():
+            req_task.cancel()
+    if req_task.cancelled() or not req_task.done():
+        await asyncio.gather(req_task, return_exceptions=True)
+        raise ReqAbortException("请求被外部信号中断")
+    return req_task.result()
+
+
+async def close_stream(resp_stream: Any) -> None:
+    """尽力关闭被中断的流式响应，释放底层连接"""
+    close = getattr(resp_stream, "aclose", None) or getattr(resp_stream, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+    except Exception:
+        pass
+
+
 class BaseClient(ABC):
     """
     基础客户端
@@ -81,6 +130,7 @@ class BaseClient(ABC):
         async_response_parser: Callable[[Any], tuple[APIResponse, tuple[int, int, int]]] | None = None,
         interrupt_flag: asyncio.Event | None = None,
         extra_params: dict[str, Any] | None = None,
+        content_callback: Callable[[str], None] | None = None,
     ) -> APIResponse:
         """
         获取对话响应
@@ -93,6 +143,7 @@ class BaseClient(ABC):
         :param stream_response_handler: 流式响应处理函数（可选）
         :param async_response_parser: 响应解析函数（可选）
         :param interrupt_flag: 中断信号量（可选，默认为None）
+        :param content_callback: 正式内容增量回调（可选），提供时以流式请求，每收到一段正式内容调用一次
         :return: (响应文本, 推理文本, 工具调用, 其他数据)
         """
         raise NotImplementedError("'get_response' method should be overridden in subclasses")
@@ -112,6 +163,33 @@ class BaseClient(ABC):
         """
         raise NotImplementedError("'get_embedding' method should be overridden in subclasses")
 
+    async def get_embeddings(
+        self,
+        model_info: ModelInfo,
+        embedding_inputs: list[str],
+        extra_params: dict[str, Any] | None = None,
+    ) -> APIResponse:
+        """
+        批量获取文本嵌入，默认实现为并发地逐条请求，支持多输入的客户端应覆盖此方法
+        :param model_info: 模型信息
+        :param embedding_inputs: 嵌入输入文本列表
+        :return: 嵌入响应，embeddings 与输入顺序一致，usage 为各请求之和
+        """
+        responses = await asyncio.gather(
+            *(self.get_embedding(model_info, text, extra_params=extra_params) for text in embedding_inputs)
+        )
+        response = APIResponse(embeddings=[resp.embedding or [] for resp in responses])
+        usages = [resp.usage for resp in responses if resp.usage]
+        if usages:
+            response.usage = UsageRecord(
+                model_name=model_info.name,
+                provider_name=model_info.api_provider,
+                prompt_tokens=sum(usage.prompt_tokens for usage in usages),
+                completion_tokens=sum(usage.completion_tokens for usage in usages),
+                total_tokens=sum(usage.total_tokens for usage in usages),
+            )
+        return response
+
     @abstractmethod
     async def get_audio_transcriptions(
         self,
@@ -142,8 +220,13 @@ class ClientRegistry:
     def __init__(self) -> None:
         self.client_registry: dict[str, type[BaseClient]] = {}
         """APIProvider.type -> BaseClient的映射表"""
-        self.client_instance_cache: dict[str, BaseClient] = {}
-        """APIProvider.name -> BaseClient的映射表"""
+        self.client_instance_cache: dict[Optional[asyncio.AbstractEventLoop], dict[str, BaseClient]] = {}
+        """事件循环 -> (APIProvider.name -> BaseClient) 的映射表
+
+        异步HTTP客户端的连接池绑定在创建它的事件循环上，因此每个事件循环各自持有一组长期复用的客户端，
+        在线程中用独立事件循环发起的请求（如知识库导入）也能复用连接，而不必每次请求都新建客户端。
+        """
+        self._cache_lock = threading.Lock()
 
     def register_client_class(self, client_type: str):
         """
@@ -176,13 +259,23 @@ class ClientRegistry:
             else:
                 raise KeyError(f"'{api_provider.client_type}' 类型的 Client 未注册")
 
-        # 正常的缓存逻辑
-        if api_provider.name not in self.client_instance_cache:
-            if client_class := self.client_registry.get(api_provider.client_type):
-                self.client_instance_cache[api_provider.name] = client_class(api_provider)
-            else:
-                raise KeyError(f"'{api_provider.client_type}' 类型的 Client 未注册")
-        return self.client_instance_cache[api_provider.name]
+        try:
+            loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        with self._cache_lock:
+            # 清理已关闭的事件循环对应的客户端
+            for closed_loop in [lp for lp in self.client_instance_cache if lp is not None and lp.is_closed()]:
+                del self.client_instance_cache[closed_loop]
+
+            loop_cache = self.client_instance_cache.setdefault(loop, {})
+            if api_provider.name not in loop_cache:
+                if client_class := self.client_registry.get(api_provider.client_type):
+                    loop_cache[api_provider.name] = client_class(api_provider)
+                else:
+                    raise KeyError(f"'{api_provider.client_type}' 类型的 Client 未注册")
+            return loop_cache[api_provider.name]
 
 
 client_registry = ClientRegistry()
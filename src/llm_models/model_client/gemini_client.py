@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import io
 import base64
 from typing import Callable, AsyncIterator, Optional, Coroutine, Any, List, Dict
@@ -33,7 +34,7 @@ from google.genai.errors import (
 from src.config.api_ada_configs import ModelInfo, APIProvider
 from src.common.logger import get_logger
 
-from .base_client import APIResponse, UsageRecord, BaseClient, client_registry
+from .base_client import APIResponse, UsageRecord, BaseClient, await_with_interrupt, client_registry, close_stream
 from ..exceptions import (
     RespParseException,
     NetworkConnectionError,
@@ -271,10 +272,12 @@ def _build_stream_api_resp(
 async def _default_stream_response_handler(
     resp_stream: AsyncIterator[GenerateContentResponse],
     interrupt_flag: asyncio.Event | None,
+    content_callback: Callable[[str], None] | None = None,
 ) -> tuple[APIResponse, Optional[tuple[int, int, int]]]:
     """
     流式响应处理函数 - 处理Gemini API的流式响应
     :param resp_stream: 流式响应对象,是一个神秘的iterator，我完全不知道这个玩意能不能跑，不过遍历一遍之后它就空了，如果跑不了一点的话可以考虑改成别的东西
+    :param content_callback: 正式内容增量回调（可选），thought 内容不会传给回调
     :return: APIResponse对象
     """
     _fc_delta_buffer = io.StringIO()  # 正式内容缓冲区，用于存储接收到的正式内容
@@ -294,12 +297,15 @@ async def _default_stream_response_handler(
             # 如果中断量被设置，则抛出ReqAbortException
             raise ReqAbortException("请求被外部信号中断")
 
+        _fc_length = _fc_delta_buffer.tell()
         _process_delta(
             chunk,
             _fc_delta_buffer,
             _tool_calls_buffer,
             resp=resp, 
         )
+        if content_callback and _fc_delta_buffer.tell() > _fc_length:
+            content_callback(_fc_delta_buffer.getvalue()[_fc_length:])
 
         if chunk.usage_metadata:
             # 如果有使用情况，则将其存储在APIResponse对象中
@@ -511,6 +517,7 @@ class GeminiClient(BaseClient):
         ] = None,
         interrupt_flag: asyncio.Event | None = None,
         extra_params: dict[str, Any] | None = None,
+        content_callback: Callable[[str], None] | None = None,
     ) -> APIResponse:
         """
         获取对话响应
@@ -524,11 +531,14 @@ class GeminiClient(BaseClient):
             stream_response_handler: 流式响应处理函数（可选，默认为default_stream_response_handler）
             async_response_parser: 响应解析函数（可选，默认为default_response_parser）
             interrupt_flag: 中断信号量（可选，默认为None）
+            content_callback: 正式内容增量回调（可选），提供时强制使用流式请求；自定义流式响应处理函数需自行调用回调
         Returns:
             APIResponse对象，包含响应内容、推理内容、工具调用等信息
         """
         if stream_response_handler is None:
-            stream_response_handler = _default_stream_response_handler
+            stream_response_handler = functools.partial(
+                _default_stream_response_handler, content_callback=content_callback
+            )
 
         if async_response_parser is None:
             async_response_parser = _default_normal_response_parser
@@ -585,37 +595,37 @@ class GeminiClient(BaseClient):
         generation_config = GenerateContentConfig(**generation_config_dict)
 
         try:
-            if model_info.force_stream_mode:
-                req_task = asyncio.create_task(
+            if model_info.force_stream_mode or content_callback:
+                # 中断信号量被设置时立即取消请求（不轮询）
+                resp_stream = await await_with_interrupt(
                     self.client.aio.models.generate_content_stream(
                         model=model_info.model_identifier,
                         contents=messages[0],
                         config=generation_config,
-                    )
+                    ),
+                    interrupt_flag,
                 )
-                while not req_task.done():
-                    if interrupt_flag and interrupt_flag.is_set():
-                        # 如果中断量存在且被设置，则取消任务并抛出异常
-                        req_task.cancel()
-                        raise ReqAbortException("请求被外部信号中断")
-                    await asyncio.sleep(0.1)  # 等待0.1秒后再次检查任务&中断信号量状态
-                resp, usage_record = await stream_response_handler(req_task.result(), interrupt_flag)
+                try:
+                    # 流长时间没有新数据时同样可以被中断
+                    resp, usage_record = await await_with_interrupt(
+                        stream_response_handler(resp_stream, interrupt_flag), interrupt_flag
+                    )
+                except (ReqAbortException, asyncio.CancelledError):
+                    await close_stream(resp_stream)
+                    raise
             else:
-                req_task = asyncio.create_task(
+                response = await await_with_interrupt(
                     self.client.aio.models.generate_content(
                         model=model_info.model_identifier,
                         contents=messages[0],
                         config=generation_config,
-                    )
+                    ),
+                    interrupt_flag,
                 )
-                while not req_task.done():
-                    if interrupt_flag and interrupt_flag.is_set():
-                        # 如果中断量存在且被设置，则取消任务并抛出异常
-                        req_task.cancel()
-                        raise ReqAbortException("请求被外部信号中断")
-                    await asyncio.sleep(0.5)  # 等待0.5秒后再次检查任务&中断信号量状态
-
-                resp, usage_record = async_response_parser(req_task.result())
+                resp, usage_record = async_response_parser(response)
+        except ReqAbortException:
+            # 外部中断不是网络问题，原样抛出
+            raise
         except (ClientError, ServerError) as e:
             # 重封装 ClientError 和 ServerError 为 RespNotOkException
             raise RespNotOkException(e.code, e.message) from None
@@ -686,6 +696,44 @@ class GeminiClient(BaseClient):
 
         return response
 
+    async def get_embeddings(
+        self,
+        model_info: ModelInfo,
+        embedding_inputs: list[str],
+        extra_params: dict[str, Any] | None = None,
+    ) -> APIResponse:
+        """
+        批量获取文本嵌入，一次请求发送多条输入
+        :param model_info: 模型信息
+        :param embedding_inputs: 嵌入输入文本列表
+        :return: 嵌入响应，embeddings 与输入顺序一致
+        """
+        try:
+            raw_response: EmbedContentResponse = await self.client.aio.models.embed_content(
+                model=model_info.model_identifier,
+                contents=embedding_inputs,  # type: ignore
+                config=EmbedContentConfig(task_type="SEMANTIC_SIMILARITY"),
+            )
+        except (ClientError, ServerError) as e:
+            raise RespNotOkException(e.code) from None
+        except Exception as e:
+            raise NetworkConnectionError() from e
+
+        if not raw_response.embeddings or len(raw_response.embeddings) != len(embedding_inputs):
+            raise RespParseException(raw_response, "响应解析失败，embeddings数量与输入数量不一致")
+
+        total_length = sum(len(text) for text in embedding_inputs)
+        return APIResponse(
+            embeddings=[embedding.values or [] for embedding in raw_response.embeddings],
+            usage=UsageRecord(
+                model_name=model_info.name,
+                provider_name=model_info.api_provider,
+                prompt_tokens=total_length,
+                completion_tokens=0,
+                total_tokens=total_length,
+            ),
+        )
+
     async def get_audio_transcriptions(
         self,
         model_info: ModelInfo,
@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import io
 import json
 import re
@@ -24,7 +25,7 @@ from openai.types.chat.chat_completion_chunk import ChoiceDelta
 
 from src.config.api_ada_configs import ModelInfo, APIProvider
 from src.common.logger import get_logger
-from .base_client import APIResponse, UsageRecord, BaseClient, client_registry
+from .base_client import APIResponse, UsageRecord, BaseClient, await_with_interrupt, client_registry, close_stream
 from ..exceptions import (
     RespParseException,
     NetworkConnectionError,
@@ -249,10 +250,12 @@ def _build_stream_api_resp(
 async def _default_stream_response_handler(
     resp_stream: AsyncStream[ChatCompletionChunk],
     interrupt_flag: asyncio.Event | None,
+    content_callback: Callable[[str], None] | None = None,
 ) -> tuple[APIResponse, Optional[tuple[int, int, int]]]:
     """
     流式响应处理函数 - 处理OpenAI API的流式响应
     :param resp_stream: 流式响应对象
+    :param content_callback: 正式内容增量回调（可选），推理内容不会传给回调
     :return: APIResponse对象
     """
 
@@ -301,6 +304,7 @@ async def _default_stream_response_handler(
             # 标记：有独立的推理内容块
             _has_rc_attr_flag = True
 
+        _fc_length = _fc_delta_buffer.tell()
         _in_rc_flag = _process_delta(
             delta,
             _has_rc_attr_flag,
@@ -309,6 +313,9 @@ async def _default_stream_response_handler(
             _fc_delta_buffer,
             _tool_calls_buffer,
         )
+        if content_callback and _fc_delta_buffer.tell() > _fc_length:
+            # 只转发写入正式内容缓冲区的部分（<think>块已被分流到推理内容缓冲区）
+            content_callback(_fc_delta_buffer.getvalue()[_fc_length:])
 
         if event.usage:
             # 如果有使用情况，则将其存储在APIResponse对象中
@@ -471,6 +478,8 @@ class OpenaiClient(BaseClient):
             max_retries=0,
             timeout=api_provider.timeout,
         )
+        self._batch_embedding_unsupported = False
+        """该提供商是否已确认不支持多条输入的嵌入请求"""
 
     async def get_response(
         self,
@@ -491,6 +500,7 @@ class OpenaiClient(BaseClient):
         ] = None,
         interrupt_flag: asyncio.Event | None = None,
         extra_params: dict[str, Any] | None = None,
+        content_callback: Callable[[str], None] | None = None,
     ) -> APIResponse:
         """
         获取对话响应
@@ -504,11 +514,14 @@ class OpenaiClient(BaseClient):
             stream_response_handler: 流式响应处理函数（可选，默认为default_stream_response_handler）
             async_response_parser: 响应解析函数（可选，默认为default_response_parser）
             interrupt_flag: 中断信号量（可选，默认为None）
+            content_callback: 正式内容增量回调（可选），提供时强制使用流式请求；自定义流式响应处理函数需自行调用回调
         Returns:
             (响应文本, 推理文本, 工具调用, 其他数据)
         """
         if stream_response_handler is None:
-            stream_response_handler = _default_stream_response_handler
+            stream_response_handler = functools.partial(
+                _default_stream_response_handler, content_callback=content_callback
+            )
 
         if async_response_parser is None:
             async_response_parser = _default_normal_response_parser
@@ -519,8 +532,9 @@ class OpenaiClient(BaseClient):
         tools: Iterable[ChatCompletionToolParam] = _convert_tool_options(tool_options) if tool_options else NOT_GIVEN  # type: ignore
 
         try:
-            if model_info.force_stream_mode:
-                req_task = asyncio.create_task(
+            if model_info.force_stream_mode or content_callback:
+                # 中断信号量被设置时立即取消请求（不轮询）
+                resp_stream = await await_with_interrupt(
                     self.client.chat.completions.create(
                         model=model_info.model_identifier,
                         messages=messages,
@@ -530,20 +544,21 @@ class OpenaiClient(BaseClient):
                         stream=True,
                         response_format=NOT_GIVEN,
                         extra_body=extra_params,
-                    )
+                    ),
+                    interrupt_flag,
                 )
-                while not req_task.done():
-                    if interrupt_flag and interrupt_flag.is_set():
-                        # 如果中断量存在且被设置，则取消任务并抛出异常
-                        req_task.cancel()
-                        raise ReqAbortException("请求被外部信号中断")
-                    await asyncio.sleep(0.1)  # 等待0.1秒后再次检查任务&中断信号量状态
-
-                resp, usage_record = await stream_response_handler(req_task.result(), interrupt_flag)
+                try:
+                    # 流长时间没有新数据时同样可以被中断
+                    resp, usage_record = await await_with_interrupt(
+                        stream_response_handler(resp_stream, interrupt_flag), interrupt_flag
+                    )
+                except (ReqAbortException, asyncio.CancelledError):
+                    await close_stream(resp_stream)
+                    raise
             else:
                 # 发送请求并获取响应
                 # start_time = time.time()
-                req_task = asyncio.create_task(
+                completion = await await_with_interrupt(
                     self.client.chat.completions.create(
                         model=model_info.model_identifier,
                         messages=messages,
@@ -553,21 +568,16 @@ class OpenaiClient(BaseClient):
                         stream=False,
                         response_format=NOT_GIVEN,
                         extra_body=extra_params,
-                    )
+                    ),
+                    interrupt_flag,
                 )
-                while not req_task.done():
-                    if interrupt_flag and interrupt_flag.is_set():
-                        # 如果中断量存在且被设置，则取消任务并抛出异常
-                        req_task.cancel()
-                        raise ReqAbortException("请求被外部信号中断")
-                    await asyncio.sleep(0.1)  # 等待0.5秒后再次检查任务&中断信号量状态
 
                 # logger.
-                # logger.debug(f"OpenAI API响应(非流式): {req_task.result()}")
+                # logger.debug(f"OpenAI API响应(非流式): {completion}")
 
                 # logger.info(f"OpenAI请求时间: {model_info.model_identifier}  {time.time() - start_time} \n{messages}")
 
-                resp, usage_record = async_response_parser(req_task.result())
+                resp, usage_record = async_response_parser(completion)
         except APIConnectionError as e:
             # 重封装APIConnectionError为NetworkConnectionError
             raise NetworkConnectionError() from e
@@ -640,6 +650,59 @@ class OpenaiClient(BaseClient):
 
         return response
 
+    async def get_embeddings(
+        self,
+        model_info: ModelInfo,
+        embedding_inputs: list[str],
+        extra_params: dict[str, Any] | None = None,
+    ) -> APIResponse:
+        """
+        批量获取文本嵌入，一次请求发送多条输入
+        :param model_info: 模型信息
+        :param embedding_inputs: 嵌入输入文本列表
+        :return: 嵌入响应，embeddings 与输入顺序一致
+        """
+        if self._batch_embedding_unsupported:
+            return await super().get_embeddings(model_info, embedding_inputs, extra_params)
+        try:
+            raw_response = await self.client.embeddings.create(
+                model=model_info.model_identifier,
+                input=embedding_inputs,
+                extra_body=extra_params,
+            )
+        except APIConnectionError as e:
+            logger.error(f"OpenAI API连接错误（嵌入模型）: {str(e)}")
+            raise NetworkConnectionError() from e
+        except APIStatusError as e:
+            if e.status_code in (400, 413, 422) and len(embedding_inputs) > 1:
+                # 部分OpenAI兼容服务不支持多条输入，退化为逐条请求
+                logger.warning(
+                    f"API提供商 '{self.api_provider.name}' 不支持批量嵌入请求（{e.status_code}），改为逐条请求"
+                )
+                self._batch_embedding_unsupported = True
+                return await super().get_embeddings(model_info, embedding_inputs, extra_params)
+            raise RespNotOkException(e.status_code) from e
+
+        if len(raw_response.data) != len(embedding_inputs):
+            raise RespParseException(
+                raw_response,
+                f"响应解析失败，嵌入数量 {len(raw_response.data)} 与输入数量 {len(embedding_inputs)} 不一致。",
+            )
+
+        response = APIResponse()
+        response.embeddings = [item.embedding for item in sorted(raw_response.data, key=lambda item: item.index)]
+
+        if hasattr(raw_response, "usage"):
+            response.usage = UsageRecord(
+                model_name=model_info.name,
+                provider_name=model_info.api_provider,
+                prompt_tokens=raw_response.usage.prompt_tokens or 0,
+                completion_tokens=getattr(raw_response.usage, "completion_tokens", 0),
+                total_tokens=raw_response.usage.total_tokens or 0,
+            )
+
+        return response
+
     async def get_audio_transcriptions(
         self,
         model_info: ModelInfo,
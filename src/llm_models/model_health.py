@@ -0,0 +1,267 @@
+"""
+进程内共享的模型健康状态
+
+负载均衡原本按 LLMRequest 实例记录惩罚值，代码中几十个 LLMRequest 各自只看到自己发出的少量请求，
+一个模型开始超时后，每个实例都要各自失败几次才会避开它。这里按模型名称在整个进程内共享：
+- 成功请求耗时的EWMA（不含在调度器中排队的时间）与失败率的EWMA
+- 熔断器：连续失败达到阈值后熔断，冷却期内所有任务都不再选择该模型；冷却结束后进入半开状态，
+  只放行一个探测请求，成功则恢复，失败则以加倍的冷却时间再次熔断
+- 选择模型时取预期耗时最低者：耗时 * (1 + 进行中的请求数 * IN_FLIGHT_WEIGHT) / 成功率，
+  其中耗时取耗时EWMA与最早一个进行中请求已等待时长的较大者：模型开始卡住时不必等到请求超时，
+  几秒后新请求就会转向其他模型
+- 按 (模型, 请求类型) 保留最近的成功耗时，供对冲请求计算各任务的耗时分位数
+"""
+
+import itertools
+import threading
+import time
+
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple
+
+from src.common.logger import get_logger
+
+logger = get_logger("model_health")
+
+LATENCY_EWMA_ALPHA = 0.3
+"""耗时EWMA的平滑系数"""
+
+ERROR_EWMA_ALPHA = 0.2
+"""失败率EWMA的平滑系数"""
+
+FAILURE_THRESHOLD = 3
+"""连续失败达到该次数后熔断"""
+
+CIRCUIT_OPEN_SECONDS = 15.0
+"""首次熔断的冷却时间（秒），探测失败后加倍"""
+
+CIRCUIT_MAX_OPEN_SECONDS = 300.0
+"""熔断冷却时间上限（秒）"""
+
+IN_FLIGHT_WEIGHT = 0.5
+"""每个进行中的请求使预期耗时增加的比例，避免同时到达的请求全部涌向同一个模型"""
+
+MIN_SUCCESS_RATE = 0.05
+"""计算预期耗时时成功率的下限"""
+
+DEFAULT_LATENCY = 5.0
+"""候选模型都没有耗时记录时使用的默认耗时（秒）"""
+
+LATENCY_WINDOW = 200
+"""每个 (模型, 请求类型) 保留的最近成功耗时样本数"""
+
+MIN_QUANTILE_SAMPLES = 20
+"""样本数少于该值时不计算耗时分位数"""
+
+
+class CircuitState(Enum):
+    """熔断器状态"""
+
+    CLOSED = "closed"
+    """正常"""
+
+    OPEN = "open"
+    """熔断中，冷却结束前不接收请求"""
+
+    HALF_OPEN = "half_open"
+    """冷却结束，只放行一个探测请求"""
+
+
+CIRCUIT_STATE_DISPLAY_NAMES: Dict[CircuitState, str] = {
+    CircuitState.CLOSED: "正常",
+    CircuitState.OPEN: "熔断",
+    CircuitState.HALF_OPEN: "探测中",
+}
+
+
+@dataclass
+class ModelHealth:
+    """单个模型的健康状态"""
+
+    latency: Optional[float] = None
+    """成功请求耗时的EWMA（秒），None 表示还没有记录"""
+
+    error_rate: float = 0.0
+    """失败率的EWMA"""
+
+    consecutive_failures: int = 0
+    in_flight: Dict[int, float] = field(default_factory=dict)
+    """进行中请求的租约ID -> 开始时间（按开始时间先后排列）"""
+
+    state: CircuitState = CircuitState.CLOSED
+    open_until: float = 0.0
+    cooldown: float = CIRCUIT_OPEN_SECONDS
+    probe_id: Optional[int] = None
+    """半开状态下正在进行的探测请求的租约ID"""
+
+    requests: int = 0
+    failures: int = 0
+    trips: int = 0
+    """熔断次数"""
+
+
+@dataclass(frozen=True)
+class ModelLease:
+    """acquire 选中模型后返回的租约，请求结束后交给 release"""
+
+    model_name: str
+    lease_id: int
+
+
+class ModelHealthRegistry:
+    """按模型名称记录健康状态，所有 LLMRequest 共享"""
+
+    def __init__(self):
+        self._models: Dict[str, ModelHealth] = {}
+        self._latency_windows: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lease_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _get(self, model_name: str) -> ModelHealth:
+        health = self._models.get(model_name)
+        if health is None:
+            health = self._models[model_name] = ModelHealth()
+        return health
+
+    def _available(self, health: ModelHealth, now: float) -> bool:
+        if health.state == CircuitState.OPEN and now >= health.open_until:
+            health.state = CircuitState.HALF_OPEN
+            health.probe_id = None
+        if health.state == CircuitState.HALF_OPEN:
+            return health.probe_id is None
+        return health.state == CircuitState.CLOSED
+
+    @staticmethod
+    def _expected_latency(health: ModelHealth, default_latency: float, now: float) -> float:
+        latency = default_latency if health.latency is None else health.latency
+        if health.in_flight:
+            latency = max(latency, now - next(iter(health.in_flight.values())))
+        return latency * (1 + len(health.in_flight) * IN_FLIGHT_WEIGHT) / max(MIN_SUCCESS_RATE, 1 - health.error_rate)
+
+    def acquire(self, candidates: Sequence[str]) -> ModelLease:
+        """从候选模型中选出预期耗时最低的可用模型，并计入进行中的请求（请求结束后必须调用 release）
+
+        没有耗时记录的模型按候选模型中的最低耗时估计，保证新模型能被尝试；冷却结束的模型优先接收一个探测请求。
+        所有候选模型都处于熔断中时，选择最早结束冷却的模型，而不是直接失败。
+        """
+        if not candidates:
+            raise RuntimeError("没有可用的模型可供选择。所有模型均已尝试失败。")
+        now = time.monotonic()
+        with self._lock:
+            healths = {name: self._get(name) for name in candidates}
+            available = [name for name, health in healths.items() if self._available(health, now)]
+            probes = [name for name in available if healths[name].state == CircuitState.HALF_OPEN]
+            if probes:
+                # 冷却结束的模型优先接收一个探测请求，否则有更快的模型时它永远没有机会恢复
+                model_name = probes[0]
+            elif available:
+                known = [healths[name].latency for name in available if healths[name].latency is not None]
+                default_latency = min(known) if known else DEFAULT_LATENCY
+                model_name = min(
+                    available, key=lambda name: self._expected_latency(healths[name], default_latency, now)
+                )
+            else:
+                model_name = min(healths, key=lambda name: healths[name].open_until)
+                logger.warning(f"候选模型均处于熔断状态，仍尝试最早恢复的模型 '{model_name}'")
+            health = healths[model_name]
+            lease = ModelLease(model_name, next(self._lease_ids))
+            if health.state == CircuitState.HALF_OPEN:
+                health.probe_id = lease.lease_id
+            health.in_flight[lease.lease_id] = now
+            health.requests += 1
+            return lease
+
+    def release(self, lease: ModelLease) -> None:
+        """模型上的请求（含重试）结束"""
+        with self._lock:
+            health = self._get(lease.model_name)
+            health.in_flight.pop(lease.lease_id, None)
+            if health.probe_id == lease.lease_id:
+                # 探测请求被取消或没有产生结果时，允许下一个请求继续探测；其他请求结束不影响进行中的探测
+                health.probe_id = None
+
+    def is_open(self, model_name: str) -> bool:
+        """模型是否处于熔断冷却中（正在重试的请求据此提前切换模型）"""
+        with self._lock:
+            health = self._get(model_name)
+            return health.state == CircuitState.OPEN and time.monotonic() < health.open_until
+
+    def latency_quantile(self, model_name: str, request_type: str, quantile: float) -> Optional[float]:
+        """模型在该请求类型上最近成功耗时的分位数，样本不足时返回 None"""
+        with self._lock:
+            window = self._latency_windows.get((model_name, request_type))
+            if window is None or len(window) < MIN_QUANTILE_SAMPLES:
+                return None
+            samples = sorted(window)
+        return samples[min(len(samples) - 1, int(len(samples) * quantile))]
+
+    def record_success(self, model_name: str, latency: float, request_type: str = "") -> None:
+        """记录一次成功的请求"""
+        with self._lock:
+            window = self._latency_windows.get((model_name, request_type))
+            if window is None:
+                window = self._latency_windows[(model_name, request_type)] = deque(maxlen=LATENCY_WINDOW)
+            window.append(latency)
+            health = self._get(model_name)
+            health.latency = (
+                latency
+                if health.latency is None
+                else LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * health.latency
+            )
+            health.error_rate *= 1 - ERROR_EWMA_ALPHA
+            health.consecutive_failures = 0
+            if health.state != CircuitState.CLOSED:
+                logger.info(f"模型 '{model_name}' 探测成功，恢复正常")
+                health.state = CircuitState.CLOSED
+                health.cooldown = CIRCUIT_OPEN_SECONDS
+            health.probe_id = None
+
+    def record_failure(self, model_name: str, latency: float) -> None:
+        """记录一次模型自身原因的失败（超时、网络错误、空回复、429/5xx等），耗时较长的失败同样拉高耗时EWMA"""
+        with self._lock:
+            health = self._get(model_name)
+            health.failures += 1
+            health.error_rate = ERROR_EWMA_ALPHA + (1 - ERROR_EWMA_ALPHA) * health.error_rate
+            health.consecutive_failures += 1
+            if health.latency is not None and latency > health.latency:
+                health.latency = LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * health.latency
+            if health.state == CircuitState.HALF_OPEN:
+                health.cooldown = min(CIRCUIT_MAX_OPEN_SECONDS, health.cooldown * 2)
+                self._trip(model_name, health)
+            elif health.state == CircuitState.CLOSED and health.consecutive_failures >= FAILURE_THRESHOLD:
+                self._trip(model_name, health)
+            health.probe_id = None
+
+    @staticmethod
+    def _trip(model_name: str, health: ModelHealth) -> None:
+        health.state = CircuitState.OPEN
+        health.open_until = time.monotonic() + health.cooldown
+        health.trips += 1
+        logger.warning(
+            f"模型 '{model_name}' 连续失败 {health.consecutive_failures} 次，熔断 {health.cooldown:.0f} 秒，"
+            "期间所有任务改用其他模型"
+        )
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各模型的健康状态（自启动以来）"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "state": health.state
+                    if health.state != CircuitState.OPEN or now < health.open_until
+                    else CircuitState.HALF_OPEN,
+                    "latency": health.latency,
+                    "error_rate": health.error_rate,
+                    "in_flight": len(health.in_flight),
+                    "requests": health.requests,
+                    "failures": health.failures,
+                    "trips": health.trips,
+                }
+                for name, health in self._models.items()
+            }
+
+
+model_health = ModelHealthRegistry()
@@ -0,0 +1,385 @@
+"""
+全局LLM请求调度器
+
+各子系统各自创建 LLMRequest 并直接向API提供商发请求，后台任务（表达学习、记忆构建、情绪、频率调整等）
+与回复、规划争用同一个提供商的并发数与RPM/TPM额度，触发429后又各自按 retry_interval 重试，互相拖慢。
+这里在每次实际发出请求前按API提供商排队：
+- 按优先级出队：回复/规划 > 对话链路中的辅助请求 > 后台任务，同优先级先到先得
+- 并发上限与RPM/TPM令牌桶来自 APIProvider 配置（0表示不限制），后台任务不能占用为高优先级请求保留的额度
+- 提供商返回429后暂停该提供商的出队，排队中的请求不会继续触发429
+- 按优先级统计排队时间
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple
+
+from src.common.logger import get_logger
+from src.config.api_ada_configs import APIProvider
+from .payload_content.message import Message
+
+logger = get_logger("llm_scheduler")
+
+BACKGROUND_RESERVED_RATIO = 0.25
+"""提供商的并发数与RPM/TPM额度中为高优先级请求保留的比例，后台任务只能使用其余部分"""
+
+CHARS_PER_TOKEN_ESTIMATE = 1.5
+"""估算请求token数时每个token对应的字符数（请求完成后按实际用量修正TPM令牌桶）"""
+
+IMAGE_TOKEN_ESTIMATE = 1000
+"""估算请求token数时每张图片计入的token数"""
+
+QUEUE_TIME_WINDOW = 1000
+"""计算排队时间分位数时保留的最近样本数"""
+
+SLOW_QUEUE_WARNING = 3.0
+"""回复/规划请求排队超过该时长（秒）时打印警告"""
+
+
+class RequestPriority(IntEnum):
+    """请求优先级，数值越小越先出队"""
+
+    INTERACTIVE = 0
+    """回复、规划：用户正在等待结果"""
+
+    TOOL = 1
+    """工具调用、动作判断、知识问答、识图等对话链路中的辅助请求"""
+
+    BACKGROUND = 2
+    """表达学习、记忆构建、情绪、频率调整、LPMM信息提取等后台任务"""
+
+
+PRIORITY_DISPLAY_NAMES: Dict[RequestPriority, str] = {
+    RequestPriority.INTERACTIVE: "回复/规划",
+    RequestPriority.TOOL: "辅助请求",
+    RequestPriority.BACKGROUND: "后台任务",
+}
+
+_REQUEST_TYPE_PRIORITIES: Dict[str, RequestPriority] = {
+    "replyer": RequestPriority.INTERACTIVE,
+    "generator_api": RequestPriority.INTERACTIVE,
+    "planner": RequestPriority.INTERACTIVE,
+    "tool_executor": RequestPriority.TOOL,
+    "action": RequestPriority.TOOL,
+    "lpmm.qa": RequestPriority.TOOL,
+    "embedding": RequestPriority.TOOL,
+    "image": RequestPriority.TOOL,
+    "audio": RequestPriority.TOOL,
+    "expression.selector": RequestPriority.TOOL,
+    "relation_selection": RequestPriority.TOOL,
+    "expression.learner": RequestPriority.BACKGROUND,
+    "memory_chest": RequestPriority.BACKGROUND,
+    "memory_chest_build": RequestPriority.BACKGROUND,
+    "chat_history_analysis": RequestPriority.BACKGROUND,
+    "curious_detector": RequestPriority.BACKGROUND,
+    "conflict_tracker": RequestPriority.BACKGROUND,
+    "conflict": RequestPriority.BACKGROUND,
+    "mood": RequestPriority.BACKGROUND,
+    "frequency": RequestPriority.BACKGROUND,
+    "relation": RequestPriority.BACKGROUND,
+    "emoji": RequestPriority.BACKGROUND,
+    "lpmm.entity_extract": RequestPriority.BACKGROUND,
+    "lpmm.rdf_build": RequestPriority.BACKGROUND,
+}
+"""请求类型 -> 优先级，按完整名称或以 "." 分隔的前缀匹配（如 "frequency" 匹配 "frequency.adjust"）"""
+
+
+def priority_of_request_type(request_type: str) -> RequestPriority:
+    """根据请求类型推断优先级，未知类型（如插件自定义的请求）视为辅助请求"""
+    name = request_type
+    while name:
+        if (priority := _REQUEST_TYPE_PRIORITIES.get(name)) is not None:
+            return priority
+        name = name.rpartition(".")[0]
+    return RequestPriority.TOOL
+
+
+def estimate_request_tokens(
+    message_list: Sequence[Message],
+    max_tokens: int = 0,
+    embedding_input: str | List[str] | None = None,
+) -> int:
+    """估算请求消耗的token数（输入 + 最大输出），用于在发出请求前扣减TPM额度"""
+    chars = 0
+    images = 0
+    for message in message_list:
+        if isinstance(message.content, str):
+            chars += len(message.content)
+            continue
+        for part in message.content:
+            if isinstance(part, str):
+                chars += len(part)
+            else:
+                images += 1
+    if isinstance(embedding_input, str):
+        chars += len(embedding_input)
+    elif embedding_input:
+        chars += sum(len(text) for text in embedding_input)
+    return int(chars / CHARS_PER_TOKEN_ESTIMATE) + images * IMAGE_TOKEN_ESTIMATE + max(0, max_tokens)
+
+
+class _TokenBucket:
+    """按分钟补满的令牌桶，limit <= 0 表示不限制（不加锁，由 ProviderLimiter 保护）"""
+
+    def __init__(self, limit_per_minute: int):
+        self.capacity = float(max(0, limit_per_minute))
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self, amount: float, reserve: float, now: float) -> float:
+        """取出 amount 个令牌后仍剩 reserve 个令牌需要等待的时长（秒），0表示可以立即取出"""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        # 单次请求超过桶容量时按装满计算，避免永远等不到
+        amount = min(amount, self.capacity - reserve)
+        return max(0.0, (amount + reserve - self.tokens) / self.rate)
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """按实际用量修正：delta 为实际用量与预扣量之差，可能使令牌数暂时为负（下次请求等待更久）"""
+        if not self.unlimited:
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+@dataclass
+class _Waiter:
+    priority: RequestPriority
+    tokens: int
+    future: asyncio.Future
+    granted: bool = False
+    """已分配额度（在锁内设置），取消时据此决定是否需要归还"""
+
+
+@dataclass
+class QueueTimeStat:
+    """单个优先级的排队时间统计"""
+
+    count: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    recent: Deque[float] = field(default_factory=lambda: deque(maxlen=QUEUE_TIME_WINDOW))
+
+    def record(self, wait_time: float) -> None:
+        self.count += 1
+        self.total_wait += wait_time
+        self.max_wait = max(self.max_wait, wait_time)
+        self.recent.append(wait_time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        return {
+            "count": self.count,
+            "avg_wait": self.total_wait / self.count if self.count else 0.0,
+            "p95_wait": recent[int(len(recent) * 0.95)] if len(recent) >= 20 else (recent[-1] if recent else 0.0),
+            "max_wait": self.max_wait,
+        }
+
+
+class ProviderLimiter:
+    """单个API提供商的优先级队列与并发/RPM/TPM限制
+
+    请求按 (优先级, 到达顺序) 出队，队首请求的额度不足时后面的请求也不会越过它。
+    状态由线程锁保护：同步接口在独立线程的事件循环中发起的请求也计入同一份额度。
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 0, rpm: int = 0, tpm: int = 0):
+        self.name = name
+        self.max_concurrency = max(0, max_concurrency)
+        self._request_bucket = _TokenBucket(rpm)
+        self._token_bucket = _TokenBucket(tpm)
+        self._active = 0
+        self._paused_until = 0.0
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._timer_deadline: Optional[float] = None
+
+        self.rate_limited = 0
+        """收到429的次数"""
+
+    def _admission_delay(self, priority: RequestPriority, tokens: int, now: float) -> Optional[float]:
+        """请求还需等待的时长（秒），None 表示并发已满，需要等其他请求完成"""
+        ratio = BACKGROUND_RESERVED_RATIO if priority >= RequestPriority.BACKGROUND else 0.0
+        if self.max_concurrency and self._active >= self.max_concurrency - int(self.max_concurrency * ratio):
+            return None
+        return max(
+            self._paused_until - now,
+            self._request_bucket.wait_time(1, self._request_bucket.capacity * ratio, now),
+            self._token_bucket.wait_time(tokens, self._token_bucket.capacity * ratio, now),
+            0.0,
+        )
+
+    def _commit(self, tokens: int) -> None:
+        self._active += 1
+        self._request_bucket.take(1)
+        self._token_bucket.take(tokens)
+
+    def _dispatch_locked(self, now: float) -> Tuple[List[_Waiter], Optional[float]]:
+        """按优先级放行队首的请求，返回 (放行的请求, 队首还需等待的时长)"""
+        granted: List[_Waiter] = []
+        while self._queue:
+            waiter = self._queue[0][2]
+            if waiter.future.done():
+                # 已取消
+                heapq.heappop(self._queue)
+                continue
+            delay = self._admission_delay(waiter.priority, waiter.tokens, now)
+            if delay is None or delay > 0:
+                return granted, delay
+            heapq.heappop(self._queue)
+            self._commit(waiter.tokens)
+            waiter.granted = True
+            granted.append(waiter)
+        return granted, None
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._timer_deadline is not None and self._timer_deadline <= now:
+                self._timer_deadline = None
+            granted, delay = self._dispatch_locked(now)
+            head_loop: Optional[asyncio.AbstractEventLoop] = None
+            if delay and (self._timer_deadline is None or self._timer_deadline > now + delay):
+                # 队首受RPM/TPM或429暂停限制，到时间后重新检查；计时器放在队首请求所在的事件循环上（它一定还在运行）
+                self._timer_deadline = now + delay
+                head_loop = self._queue[0][2].future.get_loop()
+        for waiter in granted:
+            waiter.future.get_loop().call_soon_threadsafe(self._resolve, waiter)
+        if head_loop is not None:
+            head_loop.call_soon_threadsafe(head_loop.call_later, delay, self._dispatch)
+
+    def _resolve(self, waiter: _Waiter) -> None:
+        if not waiter.future.done():
+            waiter.future.set_result(None)
+
+    async def acquire(self, priority: RequestPriority, tokens: int) -> None:
+        """等待放行，返回后占用一个并发名额，请求结束后必须调用 release"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._queue and self._admission_delay(priority, tokens, now) == 0:
+                self._commit(tokens)
+                return
+            waiter = _Waiter(priority, tokens, asyncio.get_running_loop().create_future())
+            heapq.heappush(self._queue, (int(priority), next(self._seq), waiter))
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+            if granted:
+                self.release(tokens)
+            else:
+                # 队首被取消后，后面的请求可能可以放行了
+                self._dispatch()
+            raise
+
+    def release(self, estimated_tokens: int, used_tokens: Optional[int] = None) -> None:
+        """请求结束，归还并发名额，并按实际token用量修正TPM令牌桶"""
+        with self._lock:
+            self._active -= 1
+            if used_tokens is not None:
+                self._token_bucket.adjust(used_tokens - estimated_tokens)
+        self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """提供商返回429后暂停出队"""
+        with self._lock:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": sum(not waiter.future.done() for _, _, waiter in self._queue),
+                "max_concurrency": self.max_concurrency,
+                "rate_limited": self.rate_limited,
+            }
+
+
+@dataclass
+class RequestTicket:
+    """一次放行的请求，请求完成后由调用方填入实际token用量"""
+
+    estimated_tokens: int
+    wait_time: float
+    used_tokens: Optional[int] = None
+
+
+class LLMScheduler:
+    """按API提供商分组的全局请求调度器"""
+
+    def __init__(self):
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+        self._queue_stats: Dict[RequestPriority, QueueTimeStat] = {
+            priority: QueueTimeStat() for priority in RequestPriority
+        }
+
+    def get_limiter(self, api_provider: APIProvider) -> ProviderLimiter:
+        with self._lock:
+            limiter = self._limiters.get(api_provider.name)
+            if limiter is None:
+                limiter = self._limiters[api_provider.name] = ProviderLimiter(
+                    api_provider.name, api_provider.max_concurrency, api_provider.rpm, api_provider.tpm
+                )
+            return limiter
+
+    @asynccontextmanager
+    async def slot(
+        self, api_provider: APIProvider, priority: RequestPriority, estimated_tokens: int
+    ) -> AsyncIterator[RequestTicket]:
+        """在提供商的队列中排队，放行后执行 async with 块中的请求"""
+        limiter = self.get_limiter(api_provider)
+        start_time = time.perf_counter()
+        await limiter.acquire(priority, estimated_tokens)
+        ticket = RequestTicket(estimated_tokens, time.perf_counter() - start_time)
+        with self._lock:
+            self._queue_stats[priority].record(ticket.wait_time)
+        if priority == RequestPriority.INTERACTIVE and ticket.wait_time > SLOW_QUEUE_WARNING:
+            logger.warning(
+                f"{PRIORITY_DISPLAY_NAMES[priority]}请求在提供商 '{api_provider.name}' 排队 {ticket.wait_time:.1f} 秒"
+            )
+        try:
+            yield ticket
+        finally:
+            limiter.release(estimated_tokens, ticket.used_tokens)
+
+    def report_rate_limited(self, api_provider: APIProvider) -> None:
+        """提供商返回429：在重试间隔内暂停该提供商的所有请求"""
+        self.get_limiter(api_provider).pause(api_provider.retry_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各优先级的排队时间与各提供商的队列状态（自启动以来）"""
+        with self._lock:
+            priorities = {priority: stat.to_dict() for priority, stat in self._queue_stats.items()}
+            limiters = list(self._limiters.values())
+        return {
+            "priorities": priorities,
+            "providers": {limiter.name: limiter.get_stats() for limiter in limiters},
+        }
+
+
+llm_scheduler = LLMScheduler()
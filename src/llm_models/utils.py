@@ -7,6 +7,8 @@ from datetime import datetime
 from src.common.logger import get_logger
 from src.common.database.database import db  # 确保 db 被导入用于 create_tables
 from src.common.database.database_model import LLMUsage
+from src.common.database.db_executor import db_executor
+from src.common.database.write_behind import write_behind_queue
 from src.config.api_ada_configs import ModelInfo
 from .payload_content.message import Message, MessageBuilder
 from .model_client.base_client import UsageRecord
@@ -173,27 +175,34 @@ class LLMUsageRecorder:
         request_type: str,
         endpoint: str,
         time_cost: float = 0.0,
+        status: str = "success",
     ):
+        """记录一次模型调用的用量，写入交给批量写入队列或数据库写线程，不等待完成"""
         input_cost = (model_usage.prompt_tokens / 1000000) * model_info.price_in
         output_cost = (model_usage.completion_tokens / 1000000) * model_info.price_out
         total_cost = round(input_cost + output_cost, 6)
+        usage_fields = {
+            "model_name": model_info.model_identifier,
+            "model_assign_name": model_info.name,
+            "model_api_provider": model_info.api_provider,
+            "user_id": user_id,
+            "request_type": request_type,
+            "endpoint": endpoint,
+            "prompt_tokens": model_usage.prompt_tokens or 0,
+            "completion_tokens": model_usage.completion_tokens or 0,
+            "total_tokens": model_usage.total_tokens or 0,
+            "cost": total_cost or 0.0,
+            "time_cost": round(time_cost or 0.0, 3),
+            "status": status,
+            "timestamp": datetime.now(),  # Peewee 会处理 DateTimeField
+        }
         try:
-            # 使用 Peewee 模型创建记录
-            LLMUsage.create(
-                model_name=model_info.model_identifier,
-                model_assign_name=model_info.name,
-                model_api_provider=model_info.api_provider,
-                user_id=user_id,
-                request_type=request_type,
-                endpoint=endpoint,
-                prompt_tokens=model_usage.prompt_tokens or 0,
-                completion_tokens=model_usage.completion_tokens or 0,
-                total_tokens=model_usage.total_tokens or 0,
-                cost=total_cost or 0.0,
-                time_cost=round(time_cost or 0.0, 3),
-                status="success",
-                timestamp=datetime.now(),  # Peewee 会处理 DateTimeField
-            )
+            if write_behind_queue.enabled:
+                write_behind_queue.add(LLMUsage, usage_fields)
+            else:
+                db_executor.submit_write(
+                    self._create_usage_record, usage_fields, call_site="LLMUsageRecorder.record_usage_to_database"
+                )
             logger.debug(
                 f"Token使用情况 - 模型: {model_usage.model_name}, "
                 f"用户: {user_id}, 类型: {request_type}, "
@@ -203,5 +212,12 @@ class LLMUsageRecorder:
         except Exception as e:
             logger.error(f"记录token使用情况失败: {str(e)}")
 
+    @staticmethod
+    def _create_usage_record(usage_fields: dict) -> None:
+        try:
+            LLMUsage.create(**usage_fields)
+        except Exception as e:
+            logger.error(f"记录token使用情况失败: {str(e)}")
+
 
 llm_usage_recorder = LLMUsageRecorder()
@@ -2,6 +2,7 @@ import re
 import asyncio
 import time
 
+from dataclasses import dataclass, field
 from enum import Enum
 from rich.traceback import install
 from typing import Tuple, List, Dict, Optional, Callable, Any, Set
@@ -13,19 +14,125 @@ from src.config.api_ada_configs import APIProvider, ModelInfo, TaskConfig
 from .payload_content.message import MessageBuilder, Message
 from .payload_content.resp_format import RespFormat
 from .payload_content.tool_option import ToolOption, ToolCall, ToolOptionBuilder, ToolParamType
-from .model_client.base_client import BaseClient, APIResponse, client_registry
+from .model_client.base_client import BaseClient, APIResponse, UsageRecord, client_registry
+from .model_health import ModelLease, model_health
+from .scheduler import RequestPriority, estimate_request_tokens, llm_scheduler, priority_of_request_type
 from .utils import compress_messages, llm_usage_recorder
 from .exceptions import (
     NetworkConnectionError,
     RespNotOkException,
     EmptyResponseException,
     ModelAttemptFailed,
+    PartialOutputException,
 )
 
 install(extra_lines=3)
 
 logger = get_logger("model_utils")
 
+EMBEDDING_BATCH_SIZE = 32
+"""单次嵌入请求携带的最大输入条数"""
+
+HEDGE_QUANTILE = 0.9
+"""首选模型超过其在该任务上的这一耗时分位数仍未返回时发出对冲请求"""
+
+HEDGE_MIN_DELAY = 1.0
+"""对冲等待时长的下限（秒），避免为本来就很快的请求发出对冲"""
+
+
+def _is_model_failure(e: Exception) -> bool:
+    """请求失败是否由模型或提供商自身引起（计入模型健康状态），参数错误、请求体过大等与请求内容有关的错误不计入"""
+    if isinstance(e, RespNotOkException):
+        return e.status_code == 429 or e.status_code >= 500 or e.status_code in (401, 402, 403, 404)
+    return True
+
+
+@dataclass
+class _ModelAttempt:
+    """在单个模型上进行中的一次尝试"""
+
+    model_info: ModelInfo
+    lease: ModelLease
+    message_list: List[Message]
+    start_time: float
+    send_time: Optional[float] = None
+    """调度器首次放行该请求的时间（time.perf_counter），与模型耗时样本的计时起点一致"""
+    admitted: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def mark_admitted(self, send_time: float) -> None:
+        """记录请求被调度器放行，重试时保留首次放行的时间"""
+        if self.send_time is None:
+            self.send_time = send_time
+            self.admitted.set()
+
+
+THINK_OPEN_TAG = "<think>"
+"""写在正式内容中的推理内容开始标签"""
+
+THINK_CLOSE_TAG = "</think>"
+"""写在正式内容中的推理内容结束标签"""
+
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """text 末尾与 tag 前缀重合的长度（标签可能被拆分到下一段输出中）"""
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class _ContentRelay:
+    """将流式输出的正式内容转发给调用方，并记录是否已有内容发出
+
+    部分模型把推理内容以 <think>…</think> 的形式写在正式内容中，且标签不一定是单独的一段输出
+    （如 "<think>\n"、标签被拆到两段、标签前有空白），客户端不一定能识别。这里按前缀跨段匹配标签，
+    推理内容不会转发给调用方；可能是标签开头的末尾字符暂不转发，等下一段输出或请求结束时再确定。
+    """
+
+    def __init__(self, callback: Callable[[str], None]):
+        self.callback = callback
+        self.emitted = False
+        self._pending = ""
+        self._in_think = False
+
+    def __call__(self, delta: str) -> None:
+        self._pending += delta
+        output = []
+        while self._pending:
+            tag = THINK_CLOSE_TAG if self._in_think else THINK_OPEN_TAG
+            index = self._pending.find(tag)
+            if index >= 0:
+                if not self._in_think:
+                    output.append(self._pending[:index])
+                self._pending = self._pending[index + len(tag) :]
+                self._in_think = not self._in_think
+                continue
+            keep = _partial_tag_length(self._pending, tag)
+            if not self._in_think:
+                output.append(self._pending[: len(self._pending) - keep])
+            self._pending = self._pending[len(self._pending) - keep :]
+            break
+        self._emit("".join(output))
+
+    def flush(self) -> None:
+        """请求成功结束：转发暂存的末尾字符（未闭合的推理内容不转发）"""
+        pending, self._pending = self._pending, ""
+        if not self._in_think:
+            self._emit(pending)
+
+    def reset(self) -> None:
+        """尚未发出内容时重新发出请求，丢弃上一次请求的解析状态"""
+        self._pending = ""
+        self._in_think = False
+
+    def _emit(self, text: str) -> None:
+        if not self.emitted:
+            # 推理块之前的空白不转发
+            text = text.lstrip()
+        if text:
+            self.emitted = True
+            self.callback(text)
+
 
 class RequestType(Enum):
     """请求类型枚举"""
@@ -38,14 +145,19 @@ class RequestType(Enum):
 class LLMRequest:
     """LLM请求类"""
 
-    def __init__(self, model_set: TaskConfig, request_type: str = "") -> None:
+    def __init__(
+        self, model_set: TaskConfig, request_type: str = "", priority: Optional[RequestPriority] = None
+    ) -> None:
+        """
+        Args:
+            model_set: 任务使用的模型配置
+            request_type: 请求类型（用于记录使用量）
+            priority: 在全局调度器中的优先级，默认根据请求类型推断
+        """
         self.task_name = request_type
         self.model_for_task = model_set
         self.request_type = request_type
-        self.model_usage: Dict[str, Tuple[int, int, int]] = {
-            model: (0, 0, 0) for model in self.model_for_task.model_list
-        }
-        """模型使用量记录，用于进行负载均衡，对应为(total_tokens, penalty, usage_penalty)，惩罚值是为了能在某个模型请求不给力或正在被使用的时候进行调整"""
+        self.priority = priority if priority is not None else priority_of_request_type(request_type)
 
     async def generate_response_for_image(
         self,
@@ -118,6 +230,7 @@ class LLMRequest:
         max_tokens: Optional[int] = None,
         tools: Optional[List[Dict[str, Any]]] = None,
         raise_when_empty: bool = True,
+        content_callback: Optional[Callable[[str], None]] = None,
     ) -> Tuple[str, Tuple[str, str, Optional[List[ToolCall]]]]:
         """
         异步生成响应
@@ -127,6 +240,8 @@ class LLMRequest:
             max_tokens (int, optional): 最大token数
             tools (Optional[List[Dict[str, Any]]]): 工具列表
             raise_when_empty (bool): 当响应为空时是否抛出异常
+            content_callback (Optional[Callable[[str], None]]): 正式内容增量回调，提供时以流式请求，边生成边回调；
+                已有内容发出后请求失败不会再重试或切换模型，而是抛出 PartialOutputException
         Returns:
             (Tuple[str, str, str, Optional[List[ToolCall]]]): 响应内容、推理内容、模型名称、工具调用列表
         """
@@ -145,6 +260,7 @@ class LLMRequest:
             temperature=temperature,
             max_tokens=max_tokens,
             tool_options=tool_built,
+            content_callback=content_callback,
         )
 
         logger.debug(f"LLM请求总耗时: {time.time() - start_time}")
@@ -194,30 +310,58 @@ class LLMRequest:
             raise RuntimeError("获取embedding失败")
         return embedding, model_info.name
 
-    def _select_model(self, exclude_models: Optional[Set[str]] = None) -> Tuple[ModelInfo, APIProvider, BaseClient]:
+    async def get_embeddings(self, embedding_inputs: List[str]) -> Tuple[List[List[float]], str]:
         """
-        根据总tokens和惩罚值选择的模型
+        批量获取嵌入向量，按 EMBEDDING_BATCH_SIZE 拆分为多个多输入请求
+        Args:
+            embedding_inputs (List[str]): 获取嵌入的目标列表
+        Returns:
+            (Tuple[List[List[float]], str]): (与输入顺序一致的嵌入向量列表，使用的模型名称)
         """
-        available_models = {
-            model: scores
-            for model, scores in self.model_usage.items()
-            if not exclude_models or model not in exclude_models
-        }
-        if not available_models:
-            raise RuntimeError("没有可用的模型可供选择。所有模型均已尝试失败。")
-
-        least_used_model_name = min(
-            available_models,
-            key=lambda k: available_models[k][0] + available_models[k][1] * 300 + available_models[k][2] * 1000,
-        )
-        model_info = model_config.get_model_info(least_used_model_name)
-        api_provider = model_config.get_provider(model_info.api_provider)
-        force_new_client = self.request_type == "embedding"
-        client = client_registry.get_client_class_instance(api_provider, force_new=force_new_client)
+        embeddings: List[List[float]] = []
+        model_name = ""
+        for start in range(0, len(embedding_inputs), EMBEDDING_BATCH_SIZE):
+            batch = embedding_inputs[start : start + EMBEDDING_BATCH_SIZE]
+            start_time = time.time()
+            response, model_info = await self._execute_request(
+                request_type=RequestType.EMBEDDING,
+                embedding_input=batch,
+            )
+            if usage := response.usage:
+                llm_usage_recorder.record_usage_to_database(
+                    model_info=model_info,
+                    model_usage=usage,
+                    user_id="system",
+                    request_type=self.request_type,
+                    endpoint="/embeddings",
+                    time_cost=time.time() - start_time,
+                )
+            batch_embeddings = response.embeddings or []
+            if len(batch_embeddings) != len(batch) or not all(batch_embeddings):
+                raise RuntimeError("批量获取embedding失败")
+            embeddings.extend(batch_embeddings)
+            model_name = model_info.name
+        return embeddings, model_name
+
+    def _select_model(
+        self, exclude_models: Optional[Set[str]] = None
+    ) -> Tuple[ModelInfo, APIProvider, BaseClient, ModelLease]:
+        """
+        根据全局模型健康状态选择预期耗时最低的可用模型，调用方在请求结束后需要以返回的租约调用 model_health.release
+        """
+        candidates = [
+            model for model in self.model_for_task.model_list if not exclude_models or model not in exclude_models
+        ]
+        lease = model_health.acquire(candidates)
+        try:
+            model_info = model_config.get_model_info(lease.model_name)
+            api_provider = model_config.get_provider(model_info.api_provider)
+            client = client_registry.get_client_class_instance(api_provider)
+        except Exception:
+            model_health.release(lease)
+            raise
         logger.debug(f"选择请求模型: {model_info.name}")
-        total_tokens, penalty, usage_penalty = self.model_usage[model_info.name]
-        self.model_usage[model_info.name] = (total_tokens, penalty, usage_penalty + 1)
-        return model_info, api_provider, client
+        return model_info, api_provider, client, lease
 
     async def _attempt_request_on_model(
         self,
@@ -232,44 +376,69 @@ class LLMRequest:
         async_response_parser: Optional[Callable],
         temperature: Optional[float],
         max_tokens: Optional[int],
-        embedding_input: str | None,
+        embedding_input: str | List[str] | None,
         audio_base64: str | None,
+        content_relay: Optional[_ContentRelay] = None,
+        on_admitted: Optional[Callable[[float], None]] = None,
     ) -> APIResponse:
         """
         在单个模型上执行请求，包含针对临时错误的重试逻辑。
         如果成功，返回APIResponse。如果失败（重试耗尽或硬错误），则抛出ModelAttemptFailed异常。
+        on_admitted 在每次请求被调度器放行时以放行时间（time.perf_counter）调用。
         """
         retry_remain = api_provider.max_retry
         compressed_messages: Optional[List[Message]] = None
+        attempts = 0
 
         while retry_remain > 0:
+            if attempts and model_health.is_open(model_info.name):
+                # 重试间隔内模型已被熔断（可能是其他任务的请求触发的），直接切换模型
+                raise ModelAttemptFailed(f"模型 '{model_info.name}' 已熔断，停止重试")
+            attempts += 1
             try:
-                if request_type == RequestType.RESPONSE:
-                    return await client.get_response(
-                        model_info=model_info,
-                        message_list=(compressed_messages or message_list),
-                        tool_options=tool_options,
-                        max_tokens=self.model_for_task.max_tokens if max_tokens is None else max_tokens,
-                        temperature=self.model_for_task.temperature if temperature is None else temperature,
-                        response_format=response_format,
-                        stream_response_handler=stream_response_handler,
-                        async_response_parser=async_response_parser,
-                        extra_params=model_info.extra_params,
-                    )
-                elif request_type == RequestType.EMBEDDING:
-                    assert embedding_input is not None, "嵌入输入不能为空"
-                    return await client.get_embedding(
-                        model_info=model_info,
-                        embedding_input=embedding_input,
-                        extra_params=model_info.extra_params,
-                    )
-                elif request_type == RequestType.AUDIO:
-                    assert audio_base64 is not None, "音频Base64不能为空"
-                    return await client.get_audio_transcriptions(
-                        model_info=model_info,
-                        audio_base64=audio_base64,
-                        extra_params=model_info.extra_params,
-                    )
+                current_messages = compressed_messages or message_list
+                max_tokens_for_request = self.model_for_task.max_tokens if max_tokens is None else max_tokens
+                estimated_tokens = estimate_request_tokens(
+                    current_messages,
+                    max_tokens_for_request if request_type == RequestType.RESPONSE else 0,
+                    embedding_input,
+                )
+                # 在全局调度器中按提供商排队，重试间隔内不占用并发名额
+                async with llm_scheduler.slot(api_provider, self.priority, estimated_tokens) as ticket:
+                    send_time = time.perf_counter()
+                    if on_admitted is not None:
+                        on_admitted(send_time)
+                    if content_relay is not None and not content_relay.emitted:
+                        content_relay.reset()
+                    try:
+                        response = await self._send_request(
+                            model_info,
+                            client,
+                            request_type,
+                            message_list=current_messages,
+                            tool_options=tool_options,
+                            response_format=response_format,
+                            stream_response_handler=stream_response_handler,
+                            async_response_parser=async_response_parser,
+                            temperature=temperature,
+                            max_tokens=max_tokens_for_request,
+                            embedding_input=embedding_input,
+                            audio_base64=audio_base64,
+                            content_callback=content_relay,
+                        )
+                    except Exception as e:
+                        if _is_model_failure(e):
+                            model_health.record_failure(model_info.name, time.perf_counter() - send_time)
+                        if content_relay is not None and content_relay.emitted:
+                            logger.warning(f"模型 '{model_info.name}' 在流式输出部分内容后失败，不再重试: {str(e)}")
+                            raise PartialOutputException(
+                                f"模型 '{model_info.name}' 在流式输出部分内容后失败", original_exception=e
+                            ) from e
+                        raise
+                    model_health.record_success(model_info.name, time.perf_counter() - send_time, self.request_type)
+                    if response.usage:
+                        ticket.used_tokens = response.usage.total_tokens
+                return response
             except EmptyResponseException as e:
                 # 空回复：通常为临时问题，单独记录并重试
                 retry_remain -= 1
@@ -277,9 +446,7 @@ class LLMRequest:
                     logger.error(f"模型 '{model_info.name}' 在多次出现空回复后仍然失败。")
                     raise ModelAttemptFailed(f"模型 '{model_info.name}' 重试耗尽", original_exception=e) from e
 
-                logger.warning(
-                    f"模型 '{model_info.name}' 返回空回复(可重试)。剩余重试次数: {retry_remain}"
-                )
+                logger.warning(f"模型 '{model_info.name}' 返回空回复(可重试)。剩余重试次数: {retry_remain}")
                 await asyncio.sleep(api_provider.retry_interval)
 
             except NetworkConnectionError as e:
@@ -289,14 +456,14 @@ class LLMRequest:
                     logger.error(f"模型 '{model_info.name}' 在网络错误重试用尽后仍然失败。")
                     raise ModelAttemptFailed(f"模型 '{model_info.name}' 重试耗尽", original_exception=e) from e
 
-                logger.warning(
-                    f"模型 '{model_info.name}' 遇到网络错误(可重试): {str(e)}。剩余重试次数: {retry_remain}"
-                )
+                logger.warning(f"模型 '{model_info.name}' 遇到网络错误(可重试): {str(e)}。剩余重试次数: {retry_remain}")
                 await asyncio.sleep(api_provider.retry_interval)
 
             except RespNotOkException as e:
                 # 可重试的HTTP错误
                 if e.status_code == 429 or e.status_code >= 500:
+                    if e.status_code == 429:
+                        llm_scheduler.report_rate_limited(api_provider)
                     retry_remain -= 1
                     if retry_remain <= 0:
                         logger.error(f"模型 '{model_info.name}' 在遇到 {e.status_code} 错误并用尽重试次数后仍然失败。")
@@ -319,6 +486,9 @@ class LLMRequest:
                 logger.warning(f"模型 '{model_info.name}' 遇到不可重试的HTTP错误: {str(e)}")
                 raise ModelAttemptFailed(f"模型 '{model_info.name}' 遇到硬错误", original_exception=e) from e
 
+            except PartialOutputException:
+                raise
+
             except Exception as e:
                 logger.error(traceback.format_exc())
 
@@ -327,6 +497,58 @@ class LLMRequest:
 
         raise ModelAttemptFailed(f"模型 '{model_info.name}' 未被尝试，因为重试次数已配置为0或更少。")
 
+    async def _send_request(
+        self,
+        model_info: ModelInfo,
+        client: BaseClient,
+        request_type: RequestType,
+        message_list: List[Message],
+        tool_options: list[ToolOption] | None,
+        response_format: RespFormat | None,
+        stream_response_handler: Optional[Callable],
+        async_response_parser: Optional[Callable],
+        temperature: Optional[float],
+        max_tokens: int,
+        embedding_input: str | List[str] | None,
+        audio_base64: str | None,
+        content_callback: Optional[Callable[[str], None]] = None,
+    ) -> APIResponse:
+        """向模型发出一次请求（不含重试）"""
+        if request_type == RequestType.RESPONSE:
+            return await client.get_response(
+                model_info=model_info,
+                message_list=message_list,
+                tool_options=tool_options,
+                max_tokens=max_tokens,
+                temperature=self.model_for_task.temperature if temperature is None else temperature,
+                response_format=response_format,
+                stream_response_handler=stream_response_handler,
+                async_response_parser=async_response_parser,
+                extra_params=model_info.extra_params,
+                content_callback=content_callback,
+            )
+        elif request_type == RequestType.EMBEDDING:
+            assert embedding_input is not None, "嵌入输入不能为空"
+            if isinstance(embedding_input, list):
+                return await client.get_embeddings(
+                    model_info=model_info,
+                    embedding_inputs=embedding_input,
+                    extra_params=model_info.extra_params,
+                )
+            return await client.get_embedding(
+                model_info=model_info,
+                embedding_input=embedding_input,
+                extra_params=model_info.extra_params,
+            )
+        elif request_type == RequestType.AUDIO:
+            assert audio_base64 is not None, "音频Base64不能为空"
+            return await client.get_audio_transcriptions(
+                model_info=model_info,
+                audio_base64=audio_base64,
+                extra_params=model_info.extra_params,
+            )
+        raise ValueError(f"不支持的请求类型: {request_type}")
+
     async def _execute_request(
         self,
         request_type: RequestType,
@@ -337,25 +559,41 @@ class LLMRequest:
         async_response_parser: Optional[Callable] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-        embedding_input: str | None = None,
+        embedding_input: str | List[str] | None = None,
         audio_base64: str | None = None,
+        content_callback: Optional[Callable[[str], None]] = None,
     ) -> Tuple[APIResponse, ModelInfo]:
         """
         调度器函数，负责模型选择、故障切换。
+
+        任务配置启用了对冲请求时，首选模型超过其P90耗时仍未返回，会向下一个模型再发一个请求，
+        取先成功返回的结果并取消另一个请求（每次调用最多对冲一次）。
+        提供了 content_callback 的流式输出请求不对冲，且已有内容发出后失败时不再切换模型。
         """
         failed_models_this_request: Set[str] = set()
         max_attempts = len(self.model_for_task.model_list)
         last_exception: Optional[Exception] = None
+        can_hedge = (
+            self.model_for_task.hedge
+            and request_type == RequestType.RESPONSE
+            and stream_response_handler is None
+            and content_callback is None
+            and max_attempts > 1
+        )
+        content_relay = _ContentRelay(content_callback) if content_callback else None
+        attempts: Dict[asyncio.Task, _ModelAttempt] = {}
 
-        for _ in range(max_attempts):
-            model_info, api_provider, client = self._select_model(exclude_models=failed_models_this_request)
-
-            message_list = []
-            if message_factory:
-                message_list = message_factory(client)
-
+        def start_attempt() -> None:
+            exclude = failed_models_this_request | {attempt.model_info.name for attempt in attempts.values()}
+            model_info, api_provider, client, lease = self._select_model(exclude_models=exclude)
             try:
-                response = await self._attempt_request_on_model(
+                message_list = message_factory(client) if message_factory else []
+            except Exception:
+                model_health.release(lease)
+                raise
+            attempt = _ModelAttempt(model_info, lease, message_list, time.time())
+            task = asyncio.create_task(
+                self._attempt_request_on_model(
                     model_info,
                     api_provider,
                     client,
@@ -369,29 +607,104 @@ class LLMRequest:
                     max_tokens=max_tokens,
                     embedding_input=embedding_input,
                     audio_base64=audio_base64,
+                    content_relay=content_relay,
+                    on_admitted=attempt.mark_admitted,
                 )
-                total_tokens, penalty, usage_penalty = self.model_usage[model_info.name]
-                if response_usage := response.usage:
-                    total_tokens += response_usage.total_tokens
-                self.model_usage[model_info.name] = (total_tokens, penalty, usage_penalty - 1)
-                return response, model_info
-
-            except ModelAttemptFailed as e:
-                last_exception = e.original_exception or e
-                logger.warning(f"模型 '{model_info.name}' 尝试失败，切换到下一个模型。原因: {e}")
-                total_tokens, penalty, usage_penalty = self.model_usage[model_info.name]
-                self.model_usage[model_info.name] = (total_tokens, penalty + 1, usage_penalty - 1)
-                failed_models_this_request.add(model_info.name)
-
-                if isinstance(last_exception, RespNotOkException) and last_exception.status_code == 400:
-                    logger.warning("收到客户端错误 (400)，跳过当前模型并继续尝试其他模型。")
+            )
+            attempts[task] = attempt
+
+        try:
+            while attempts or len(failed_models_this_request) < max_attempts:
+                if not attempts:
+                    start_attempt()
+                hedge_delay = None
+                if can_hedge and len(attempts) == 1 and len(failed_models_this_request) + 1 < max_attempts:
+                    primary_attempt = next(iter(attempts.values()))
+                    if primary_attempt.send_time is None:
+                        # 首选请求仍在调度器中排队，放行后才开始对冲计时
+                        admitted = asyncio.ensure_future(primary_attempt.admitted.wait())
+                        try:
+                            await asyncio.wait([*attempts, admitted], return_when=asyncio.FIRST_COMPLETED)
+                        finally:
+                            admitted.cancel()
+                    # 未被放行就已结束（如重试次数为0或放行前出错）时不对冲，直接按已完成的请求处理
+                    if primary_attempt.send_time is not None:
+                        hedge_delay = self._hedge_delay(primary_attempt)
+                done, _ = await asyncio.wait(attempts, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    can_hedge = False
+                    primary = next(iter(attempts.values())).model_info.name
+                    start_attempt()
+                    logger.info(f"模型 '{primary}' 超过P90耗时未返回，对冲请求到其他模型")
                     continue
+                for task in done:
+                    attempt = attempts.pop(task)
+                    model_health.release(attempt.lease)
+                    try:
+                        response = task.result()
+                    except ModelAttemptFailed as e:
+                        last_exception = e.original_exception or e
+                        logger.warning(f"模型 '{attempt.model_info.name}' 尝试失败，切换到下一个模型。原因: {e}")
+                        failed_models_this_request.add(attempt.model_info.name)
+                        if isinstance(last_exception, RespNotOkException) and last_exception.status_code == 400:
+                            logger.warning("收到客户端错误 (400)，跳过当前模型并继续尝试其他模型。")
+                        continue
+                    await self._cancel_hedge_losers(attempts)
+                    if content_relay is not None:
+                        content_relay.flush()
+                    return response, attempt.model_info
+        finally:
+            # 调用方取消或出现意外异常时，不留下仍在进行的请求
+            for task in attempts:
+                task.cancel()
+            if attempts:
+                await asyncio.gather(*attempts, return_exceptions=True)
+            for attempt in attempts.values():
+                model_health.release(attempt.lease)
 
         logger.error(f"所有 {max_attempts} 个模型均尝试失败。")
         if last_exception:
             raise last_exception
         raise RuntimeError("请求失败，所有可用模型均已尝试失败。")
 
+    def _hedge_delay(self, attempt: _ModelAttempt) -> Optional[float]:
+        """首选请求的对冲等待时长：模型在该任务上的P90耗时减去调度器放行后已经过的时间，样本不足时不对冲"""
+        p90 = model_health.latency_quantile(attempt.model_info.name, self.request_type, HEDGE_QUANTILE)
+        if p90 is None:
+            return None
+        return max(0.0, max(p90, HEDGE_MIN_DELAY) - (time.perf_counter() - attempt.send_time))
+
+    async def _cancel_hedge_losers(self, attempts: Dict[asyncio.Task, _ModelAttempt]) -> None:
+        """取消对冲中落败的请求并记录其用量：已完成的按实际用量记录，被取消的按估算的输入token数记录"""
+        losers = list(attempts.items())
+        attempts.clear()
+        for task, _ in losers:
+            task.cancel()
+        await asyncio.gather(*(task for task, _ in losers), return_exceptions=True)
+        for task, attempt in losers:
+            model_health.release(attempt.lease)
+            if task.cancelled():
+                usage, status = None, "cancelled"
+            elif task.exception() is not None:
+                # 自身已经失败的请求与普通失败一样不记录用量
+                continue
+            else:
+                usage, status = task.result().usage, "success"
+            if usage is None:
+                prompt_tokens = estimate_request_tokens(attempt.message_list)
+                usage = UsageRecord(
+                    attempt.model_info.name, attempt.model_info.api_provider, prompt_tokens, 0, prompt_tokens
+                )
+            llm_usage_recorder.record_usage_to_database(
+                model_info=attempt.model_info,
+                model_usage=usage,
+                user_id="system",
+                request_type=f"{self.request_type}.hedge",
+                endpoint="/chat/completions",
+                time_cost=time.time() - attempt.start_time,
+                status=status,
+            )
+
     def _build_tool_options(self, tools: Optional[List[Dict[str, Any]]]) -> Optional[List[ToolOption]]:
         # sourcery skip: extract-method
         """构建工具选项列表"""
@@ -5,6 +5,9 @@ from maim_message import MessageServer
 from src.common.remote import TelemetryHeartBeatTask
 from src.manager.async_task_manager import async_task_manager
 from src.chat.utils.statistic import OnlineTimeRecordTask, StatisticOutputTask
+from src.common.database.db_executor import EventLoopLagMonitorTask, db_executor
+from src.common.database.write_behind import write_behind_queue
+from src.common.database.database_model import LLMUsage, Messages
 from src.chat.emoji_system.emoji_manager import get_emoji_manager
 from src.chat.message_receive.chat_stream import get_chat_manager
 from src.config.config import global_config
@@ -59,6 +62,9 @@ class MainSystem:
         """初始化其他组件"""
         init_start_time = time.time()
 
+        # 预先查询批量写入队列的起始主键，避免首次写入时在事件循环上查询数据库
+        await write_behind_queue.seed_ids(Messages, LLMUsage)
+
         # 添加在线时间统计任务
         await async_task_manager.add_task(OnlineTimeRecordTask())
 
@@ -68,6 +74,9 @@ class MainSystem:
         # 添加遥测心跳任务
         await async_task_manager.add_task(TelemetryHeartBeatTask())
 
+        # 添加事件循环延迟监控任务
+        await async_task_manager.add_task(EventLoopLagMonitorTask())
+
         # 启动API服务器
         # start_api_server()
         # logger.info("API服务器启动成功")
@@ -117,6 +126,12 @@ class MainSystem:
             logger.error(f"启动大脑和外部世界失败: {e}")
             raise
 
+    def shutdown(self):
+        """关闭数据库相关资源：写入批量写入队列中的剩余记录，并等待数据库写线程完成"""
+        write_behind_queue.close()
+        db_executor.shutdown()
+        logger.info("数据库写入已全部完成")
+
     async def schedule_tasks(self):
         """调度定时任务"""
         while True:
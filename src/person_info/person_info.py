@@ -4,9 +4,11 @@ import json
 import time
 import random
 import math
+import threading
 
+from collections import OrderedDict
 from json_repair import repair_json
-from typing import Union, Optional
+from typing import Union, Optional, Dict, List, Iterable, Tuple
 
 from src.common.logger import get_logger
 from src.common.database.database import db
@@ -21,6 +23,10 @@ relation_selection_model = LLMRequest(
     model_set=model_config.model_task_config.utils_small, request_type="relation_selection"
 )
 
+# 用户记录缓存的容量与有效期（秒），缓存同时记录"不存在"的结果
+PERSON_RECORD_CACHE_SIZE = 2048
+PERSON_RECORD_CACHE_TTL = 300
+
 
 def get_person_id(platform: str, user_id: Union[int, str]) -> str:
     """获取唯一id"""
@@ -43,15 +49,15 @@ def get_person_id_by_person_name(person_name: str) -> str:
 
 def is_person_known(person_id: str = None, user_id: str = None, platform: str = None, person_name: str = None) -> bool:  # type: ignore
     if person_id:
-        person = PersonInfo.get_or_none(PersonInfo.person_id == person_id)
+        person = person_info_manager.get_person_record(person_id)
         return person.is_known if person else False
     elif user_id and platform:
         person_id = get_person_id(platform, user_id)
-        person = PersonInfo.get_or_none(PersonInfo.person_id == person_id)
+        person = person_info_manager.get_person_record(person_id)
         return person.is_known if person else False
     elif person_name:
         person_id = get_person_id_by_person_name(person_name)
-        person = PersonInfo.get_or_none(PersonInfo.person_id == person_id)
+        person = person_info_manager.get_person_record(person_id)
         return person.is_known if person else False
     else:
         return False
@@ -345,8 +351,8 @@ class Person:
     def load_from_database(self):
         """从数据库加载个人信息数据"""
         try:
-            # 查询数据库中的记录
-            record = PersonInfo.get_or_none(PersonInfo.person_id == self.person_id)
+            # 查询数据库中的记录（经由缓存）
+            record = person_info_manager.get_person_record(self.person_id)
 
             if record:
                 self.user_id = record.user_id or ""
@@ -422,6 +428,8 @@ class Person:
 
         except Exception as e:
             logger.error(f"同步用户 {self.person_id} 信息到数据库时出错: {e}")
+        finally:
+            person_info_manager.invalidate_person(self.person_id)
 
     async def build_relationship(self, chat_content: str = "", info_type=""):
         if not self.is_known:
@@ -504,6 +512,9 @@ class Person:
 class PersonInfoManager:
     def __init__(self):
         self.person_name_list = {}
+        # person_id -> (缓存时间, 记录)，记录为 None 表示数据库中不存在该用户
+        self._record_cache: OrderedDict[str, Tuple[float, Optional[PersonInfo]]] = OrderedDict()
+        self._record_cache_lock = threading.Lock()
         self.qv_name_llm = LLMRequest(model_set=model_config.model_task_config.utils, request_type="relation.qv_name")
         try:
             db.connect(reuse_if_open=True)
@@ -528,6 +539,74 @@ class PersonInfoManager:
         except Exception as e:
             logger.error(f"从 Peewee 加载 person_name_list 失败: {e}")
 
+    def _get_cached_record(self, person_id: str) -> Tuple[bool, Optional[PersonInfo]]:
+        """读取缓存，返回 (是否命中, 记录)"""
+        with self._record_cache_lock:
+            cached = self._record_cache.get(person_id)
+            if cached is None:
+                return False, None
+            cached_time, record = cached
+            if time.time() - cached_time > PERSON_RECORD_CACHE_TTL:
+                del self._record_cache[person_id]
+                return False, None
+            self._record_cache.move_to_end(person_id)
+            return True, record
+
+    def _set_cached_record(self, person_id: str, record: Optional[PersonInfo]) -> None:
+        with self._record_cache_lock:
+            self._record_cache[person_id] = (time.time(), record)
+            self._record_cache.move_to_end(person_id)
+            while len(self._record_cache) > PERSON_RECORD_CACHE_SIZE:
+                self._record_cache.popitem(last=False)
+
+    def invalidate_person(self, person_id: str) -> None:
+        """使某个用户的缓存记录失效，写入数据库后必须调用"""
+        with self._record_cache_lock:
+            self._record_cache.pop(person_id, None)
+
+    def get_person_record(self, person_id: str) -> Optional[PersonInfo]:
+        """获取用户的数据库记录，优先使用缓存
+
+        返回的记录仅供读取，修改用户信息请通过 Person.sync_to_database。
+        """
+        hit, record = self._get_cached_record(person_id)
+        if hit:
+            return record
+        record = PersonInfo.get_or_none(PersonInfo.person_id == person_id)
+        self._set_cached_record(person_id, record)
+        return record
+
+    def prefetch_person_records(self, person_ids: Iterable[str]) -> None:
+        """用一次 IN 查询批量加载未缓存的用户记录"""
+        missing_ids = [person_id for person_id in dict.fromkeys(person_ids) if not self._get_cached_record(person_id)[0]]
+        if not missing_ids:
+            return
+        try:
+            found: Dict[str, PersonInfo] = {}
+            # SQLite 对单条语句的参数数量有限制，分批查询
+            for i in range(0, len(missing_ids), 500):
+                batch = missing_ids[i : i + 500]
+                for record in PersonInfo.select().where(PersonInfo.person_id.in_(batch)):
+                    found[record.person_id] = record
+            for person_id in missing_ids:
+                self._set_cached_record(person_id, found.get(person_id))
+        except Exception as e:
+            logger.error(f"批量加载用户信息失败: {e}")
+
+    def get_persons(self, platform: str, user_ids: Iterable[str]) -> Dict[str, Person]:
+        """批量获取同一平台下多个用户的 Person 实例
+
+        Args:
+            platform: 平台名称
+            user_ids: 用户ID列表
+
+        Returns:
+            Dict[str, Person]: user_id -> Person
+        """
+        unique_user_ids: List[str] = [user_id for user_id in dict.fromkeys(user_ids) if user_id]
+        self.prefetch_person_records(get_person_id(platform, user_id) for user_id in unique_user_ids)
+        return {user_id: Person(platform=platform, user_id=user_id) for user_id in unique_user_ids}
+
     @staticmethod
     def _extract_json_from_text(text: str) -> dict:
         """从文本中提取JSON数据的高容错方法"""
@@ -12,6 +12,7 @@ import time
 import json
 from typing import Dict, List, Any, Union, Type, Optional
 from src.common.logger import get_logger
+from src.common.database.db_executor import db_read, db_write
 from peewee import Model, DoesNotExist
 
 logger = get_logger("database_api")
@@ -21,6 +22,92 @@ logger = get_logger("database_api")
 # =============================================================================
 
 
+def _db_query_sync(
+    model_class: Type[Model],
+    data: Optional[Dict[str, Any]],
+    query_type: Optional[str],
+    filters: Optional[Dict[str, Any]],
+    limit: Optional[int],
+    order_by: Optional[List[str]],
+    single_result: Optional[bool],
+) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+    """db_query 的同步实现，在数据库执行器线程中运行"""
+    try:
+        if query_type not in ["get", "create", "update", "delete", "count"]:
+            raise ValueError("query_type must be 'get' or 'create' or 'update' or 'delete' or 'count'")
+        # 构建基本查询
+        if query_type in ["get", "update", "delete", "count"]:
+            query = model_class.select()
+
+            # 应用过滤条件
+            if filters:
+                for field, value in filters.items():
+                    query = query.where(getattr(model_class, field) == value)
+
+        # 执行查询
+        if query_type == "get":
+            # 应用排序
+            if order_by:
+                for field in order_by:
+                    if field.startswith("-"):
+                        query = query.order_by(getattr(model_class, field[1:]).desc())
+                    else:
+                        query = query.order_by(getattr(model_class, field))
+
+            # 应用限制
+            if limit:
+                query = query.limit(limit)
+
+            # 执行查询
+            results = list(query.dicts())
+
+            # 返回结果
+            if single_result:
+                return results[0] if results else None
+            return results
+
+        elif query_type == "create":
+            if not data:
+                raise ValueError("创建记录需要提供data参数")
+
+            # 创建记录
+            record = model_class.create(**data)
+            # 返回创建的记录
+            return model_class.select().where(model_class.id == record.id).dicts().get()  # type: ignore
+
+        elif query_type == "update":
+            if not data:
+                raise ValueError("更新记录需要提供data参数")
+
+            # 更新记录
+            return query.update(**data).execute()
+
+        elif query_type == "delete":
+            # 删除记录
+            return query.delete().execute()
+
+        elif query_type == "count":
+            # 计数
+            return query.count()
+
+        else:
+            raise ValueError(f"不支持的查询类型: {query_type}")
+
+    except DoesNotExist:
+        # 记录不存在
+        return None if query_type == "get" and single_result else []
+    except Exception as e:
+        logger.error(f"[DatabaseAPI] 数据库操作出错: {e}")
+        traceback.print_exc()
+
+        # 根据查询类型返回合适的默认值
+        if query_type == "get":
+            return None if single_result else []
+        elif query_type in ["create", "update", "delete", "count"]:
+            return None
+        return None
+
+
 async def db_query(
     model_class: Type[Model],
     data: Optional[Dict[str, Any]] = None,
@@ -91,79 +178,51 @@ async def db_query(
             filters={"chat_id": chat_stream.stream_id}
         )
     """
+    # 查询与计数进入读线程池，其余操作进入单写线程
+    executor = db_read if query_type in ("get", "count") else db_write
+    return await executor(
+        _db_query_sync,
+        model_class,
+        data,
+        query_type,
+        filters,
+        limit,
+        order_by,
+        single_result,
+        call_site=f"database_api.db_query:{model_class.__name__}",
+    )
+
+
+def _db_save_sync(
+    model_class: Type[Model], data: Dict[str, Any], key_field: Optional[str], key_value: Optional[Any]
+) -> Optional[Dict[str, Any]]:
+    """db_save 的同步实现，在数据库执行器线程中运行"""
     try:
-        if query_type not in ["get", "create", "update", "delete", "count"]:
-            raise ValueError("query_type must be 'get' or 'create' or 'update' or 'delete' or 'count'")
-        # 构建基本查询
-        if query_type in ["get", "update", "delete", "count"]:
-            query = model_class.select()
-
-            # 应用过滤条件
-            if filters:
-                for field, value in filters.items():
-                    query = query.where(getattr(model_class, field) == value)
-
-        # 执行查询
-        if query_type == "get":
-            # 应用排序
-            if order_by:
-                for field in order_by:
-                    if field.startswith("-"):
-                        query = query.order_by(getattr(model_class, field[1:]).desc())
-                    else:
-                        query = query.order_by(getattr(model_class, field))
-
-            # 应用限制
-            if limit:
-                query = query.limit(limit)
-
-            # 执行查询
-            results = list(query.dicts())
-
-            # 返回结果
-            if single_result:
-                return results[0] if results else None
-            return results
-
-        elif query_type == "create":
-            if not data:
-                raise ValueError("创建记录需要提供data参数")
-
-            # 创建记录
-            record = model_class.create(**data)
-            # 返回创建的记录
-            return model_class.select().where(model_class.id == record.id).dicts().get()  # type: ignore
-
-        elif query_type == "update":
-            if not data:
-                raise ValueError("更新记录需要提供data参数")
-
-            # 更新记录
-            return query.update(**data).execute()
+        # 如果提供了key_field和key_value，尝试更新现有记录
+        if key_field and key_value is not None:
+            if existing_records := list(
+                model_class.select().where(getattr(model_class, key_field) == key_value).limit(1)
+            ):
+                # 更新现有记录
+                existing_record = existing_records[0]
+                for field, value in data.items():
+                    setattr(existing_record, field, value)
+                existing_record.save()
 
-        elif query_type == "delete":
-            # 删除记录
-            return query.delete().execute()
+                # 返回更新后的记录
+                updated_record = model_class.select().where(model_class.id == existing_record.id).dicts().get()  # type: ignore
+                return updated_record
 
-        elif query_type == "count":
-            # 计数
-            return query.count()
+        # 如果没有找到现有记录或未提供key_field和key_value，创建新记录
+        new_record = model_class.create(**data)
 
-        else:
-            raise ValueError(f"不支持的查询类型: {query_type}")
+        # 返回创建的记录
+        created_record = model_class.select().where(model_class.id == new_record.id).dicts().get()  # type: ignore
+        return created_record
 
-    except DoesNotExist:
-        # 记录不存在
-        return None if query_type == "get" and single_result else []
     except Exception as e:
-        logger.error(f"[DatabaseAPI] 数据库操作出错: {e}")
+        logger.error(f"[DatabaseAPI] 保存数据库记录出错: {e}")
         traceback.print_exc()
-
-        # 根据查询类型返回合适的默认值
-        if query_type == "get":
-            return None if single_result else []
-        elif query_type in ["create", "update", "delete", "count"]:
-            return None
         return None
 
 
@@ -200,33 +259,51 @@ async def db_save(
             key_value="123"
         )
     """
+    return await db_write(
+        _db_save_sync, model_class, data, key_field, key_value, call_site=f"database_api.db_save:{model_class.__name__}"
+    )
+
+
+def _db_get_sync(
+    model_class: Type[Model],
+    filters: Optional[Dict[str, Any]],
+    limit: Optional[int],
+    order_by: Optional[str],
+    single_result: Optional[bool],
+) -> Union[List[Dict[str, Any]], Dict[str, Any], None]:
+    """db_get 的同步实现，在数据库执行器线程中运行"""
     try:
-        # 如果提供了key_field和key_value，尝试更新现有记录
-        if key_field and key_value is not None:
-            if existing_records := list(
-                model_class.select().where(getattr(model_class, key_field) == key_value).limit(1)
-            ):
-                # 更新现有记录
-                existing_record = existing_records[0]
-                for field, value in data.items():
-                    setattr(existing_record, field, value)
-                existing_record.save()
+        # 构建查询
+        query = model_class.select()
 
-                # 返回更新后的记录
-                updated_record = model_class.select().where(model_class.id == existing_record.id).dicts().get()  # type: ignore
-                return updated_record
+        # 应用过滤条件
+        if filters:
+            for field, value in filters.items():
+                query = query.where(getattr(model_class, field) == value)
 
-        # 如果没有找到现有记录或未提供key_field和key_value，创建新记录
-        new_record = model_class.create(**data)
+        # 应用排序
+        if order_by:
+            if order_by.startswith("-"):
+                query = query.order_by(getattr(model_class, order_by[1:]).desc())
+            else:
+                query = query.order_by(getattr(model_class, order_by))
 
-        # 返回创建的记录
-        created_record = model_class.select().where(model_class.id == new_record.id).dicts().get()  # type: ignore
-        return created_record
+        # 应用限制
+        if limit:
+            query = query.limit(limit)
+
+        # 执行查询
+        results = list(query.dicts())
+
+        # 返回结果
+        if single_result:
+            return results[0] if results else None
+        return results
 
     except Exception as e:
-        logger.error(f"[DatabaseAPI] 保存数据库记录出错: {e}")
+        logger.error(f"[DatabaseAPI] 获取数据库记录出错: {e}")
         traceback.print_exc()
-        return None
+        return None if single_result else []
 
 
 async def db_get(
@@ -267,38 +344,15 @@ async def db_get(
             order_by="-time",
         )
     """
-    try:
-        # 构建查询
-        query = model_class.select()
-
-        # 应用过滤条件
-        if filters:
-            for field, value in filters.items():
-                query = query.where(getattr(model_class, field) == value)
-
-        # 应用排序
-        if order_by:
-            if order_by.startswith("-"):
-                query = query.order_by(getattr(model_class, order_by[1:]).desc())
-            else:
-                query = query.order_by(getattr(model_class, order_by))
-
-        # 应用限制
-        if limit:
-            query = query.limit(limit)
-
-        # 执行查询
-        results = list(query.dicts())
-
-        # 返回结果
-        if single_result:
-            return results[0] if results else None
-        return results
-
-    except Exception as e:
-        logger.error(f"[DatabaseAPI] 获取数据库记录出错: {e}")
-        traceback.print_exc()
-        return None if single_result else []
+    return await db_read(
+        _db_get_sync,
+        model_class,
+        filters,
+        limit,
+        order_by,
+        single_result,
+        call_site=f"database_api.db_get:{model_class.__name__}",
+    )
 
 
 async def store_action_info(
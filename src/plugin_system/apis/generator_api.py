@@ -9,14 +9,14 @@
 """
 
 import traceback
-from typing import Tuple, Any, Dict, List, Optional, TYPE_CHECKING
+from typing import Callable, Tuple, Any, Dict, List, Optional, TYPE_CHECKING
 from rich.traceback import install
 from src.common.logger import get_logger
 from src.common.data_models.message_data_model import ReplySetModel
 from src.chat.replyer.group_generator import DefaultReplyer
 from src.chat.replyer.private_generator import PrivateReplyer
 from src.chat.message_receive.chat_stream import ChatStream
-from src.chat.utils.utils import process_llm_response
+from src.chat.utils.utils import StreamingResponseSplitter, process_llm_response
 from src.chat.replyer.replyer_manager import replyer_manager
 from src.plugin_system.base.component_types import ActionInfo
 
@@ -91,6 +91,7 @@ async def generate_reply(
     request_type: str = "generator_api",
     from_plugin: bool = True,
     reply_time_point: Optional[float] = None,
+    reply_segment_callback: Optional[Callable[[str], None]] = None,
 ) -> Tuple[bool, Optional["LLMGenerationDataModel"]]:
     """生成回复
 
@@ -111,6 +112,9 @@ async def generate_reply(
         request_type: 请求类型（可选，记录LLM使用）
         from_plugin: 是否来自插件
         reply_time_point: 回复时间点
+        reply_segment_callback: 流式回复回调（可选）。提供时以流式请求模型，每生成完一句就按消息分割器的规则处理，
+            并以处理后的每条消息调用一次回调，不必等待整段回复生成完毕；返回的 reply_set 为已回调的消息。
+            生成在部分消息回调之后失败时同样返回失败，但已回调的消息仍保留在返回的 reply_set 中
     Returns:
         Tuple[bool, List[Tuple[str, Any]], Optional[str]]: (是否成功, 回复集合, 提示词)
     """
@@ -128,6 +132,15 @@ async def generate_reply(
         if not reply_reason and action_data:
             reply_reason = action_data.get("reason", "")
 
+        splitter: Optional[StreamingResponseSplitter] = None
+        content_callback: Optional[Callable[[str], None]] = None
+        if reply_segment_callback:
+            splitter = StreamingResponseSplitter(enable_splitter, enable_chinese_typo)
+
+            def content_callback(delta: str) -> None:
+                for segment in splitter.feed(delta):
+                    reply_segment_callback(segment)
+
         # 调用回复器生成回复
         success, llm_response = await replyer.generate_reply_with_context(
             extra_info=extra_info,
@@ -139,12 +152,22 @@ async def generate_reply(
             from_plugin=from_plugin,
             stream_id=chat_stream.stream_id if chat_stream else chat_id,
             reply_time_point=reply_time_point,
+            content_callback=content_callback,
         )
+        if splitter and reply_segment_callback and success:
+            # 最后一句没有句末标点，生成结束后才能发出
+            for segment in splitter.flush():
+                reply_segment_callback(segment)
         if not success:
             logger.warning("[GeneratorAPI] 回复生成失败")
+            if splitter and splitter.segments:
+                llm_response.reply_set = _build_text_reply_set(splitter.segments)
+                return False, llm_response
             return False, None
         reply_set: Optional[ReplySetModel] = None
-        if content := llm_response.content:
+        if splitter:
+            reply_set = _build_text_reply_set(splitter.segments) if splitter.segments else None
+        elif content := llm_response.content:
             reply_set = process_human_text(content, enable_splitter, enable_chinese_typo)
         llm_response.reply_set = reply_set
         logger.debug(f"[GeneratorAPI] 回复生成成功，生成了 {len(reply_set) if reply_set else 0} 个回复项")
@@ -232,6 +255,13 @@ async def rewrite_reply(
         return False, None
 
 
+def _build_text_reply_set(texts: List[str]) -> ReplySetModel:
+    reply_set = ReplySetModel()
+    for text in texts:
+        reply_set.add_text_content(text)
+    return reply_set
+
+
 def process_human_text(content: str, enable_splitter: bool, enable_chinese_typo: bool) -> Optional[ReplySetModel]:
     """将文本处理为更拟人化的文本
 
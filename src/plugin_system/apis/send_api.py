@@ -53,6 +53,7 @@ async def _send_to_target(
     storage_message: bool = True,
     show_log: bool = True,
     selected_expressions: Optional[List[int]] = None,
+    typing_since: Optional[float] = None,
 ) -> bool:
     """向指定目标发送消息的内部实现
 
@@ -61,6 +62,7 @@ async def _send_to_target(
         stream_id: 目标流ID
         display_message: 显示消息
         typing: 是否模拟打字等待。
+        typing_since: 开始模拟打字的时间戳，已经过去的时间从打字等待中扣除
         reply_to: 回复消息，格式为"发送者:消息内容"
         storage_message: 是否存储消息到数据库
         show_log: 发送是否显示日志
@@ -131,6 +133,7 @@ async def _send_to_target(
             set_reply=set_reply,
             storage_message=storage_message,
             show_log=show_log,
+            typing_since=typing_since,
         )
 
         if sent_msg:
@@ -206,6 +209,7 @@ async def text_to_stream(
     reply_message: Optional["DatabaseMessages"] = None,
     storage_message: bool = True,
     selected_expressions: Optional[List[int]] = None,
+    typing_since: Optional[float] = None,
 ) -> bool:
     """向指定流发送文本消息
 
@@ -213,6 +217,7 @@ async def text_to_stream(
         text: 要发送的文本内容
         stream_id: 聊天流ID
         typing: 是否显示正在输入
+        typing_since: 开始模拟打字的时间戳（可选），已经过去的时间从打字等待中扣除
         reply_to: 回复消息，格式为"发送者:消息内容"
         storage_message: 是否存储消息到数据库
 
@@ -228,6 +233,7 @@ async def text_to_stream(
         reply_message=reply_message,
         storage_message=storage_message,
         selected_expressions=selected_expressions,
+        typing_since=typing_since,
     )
 
 